@@ -1,4 +1,5 @@
-from ._base import BaseAbstractMqttDevice, BaseDevice
+from ._base import BaseAbstractMqttDevice, BaseDevice, DeviceState
 from .helpers import DeviceLoader
 from .pump import Pump
 from .thermostat import Thermostat
+from .thermostat_bank import ThermostatBank
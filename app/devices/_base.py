@@ -9,6 +9,15 @@ from messages.events import MqttMessageReceived, MqttMessageSend
 logger = logging.getLogger(__name__)
 
 
+class DeviceState(typing.NamedTuple):
+    """device state for restore after restart, times by time.time"""
+
+    turned_on: bool
+    last_sensor_value: typing.Optional[float] = None
+    last_sensor_time: typing.Optional[float] = None
+    last_dependencies_turned_on_time: typing.Optional[float] = None
+
+
 class AbstractDevice(abc.ABC):
     """
     Base class for all devices
@@ -54,6 +63,9 @@ class BaseAbstractMqttDevice(AbstractDevice, abc.ABC):
     _cmd_turn_on = '1'
     _cmd_turn_off = '0'
 
+    # payload codec of sensor topic (see plugins._codecs), decoded value is in MqttMessageReceived.value
+    sensor_codec = None
+
     def __init__(self, hardware_topic: str, sensor_topic: str = None):
         self._hardware_topic = hardware_topic
         self._sensor_topic = sensor_topic
@@ -61,6 +73,9 @@ class BaseAbstractMqttDevice(AbstractDevice, abc.ABC):
         self._turned_on = False
         self.last_sensor_time = time.time()
 
+        # events are immutable, one instance reused for every same command
+        self._messages_by_payload = dict()
+
     @property
     def turned_on(self):
         return self._turned_on
@@ -69,7 +84,16 @@ class BaseAbstractMqttDevice(AbstractDevice, abc.ABC):
     def turned_on(self, value: bool):
         if value and not self.enabled:
             raise errors.DeviceDisabledError(f'Device {self} is disabled, can not turn on')
-        self._turned_on = value
+        if value != self._turned_on:
+            self._turned_on = value
+            self._on_turned_on_changed(value)
+
+    def _on_turned_on_changed(self, turned_on: bool) -> None:
+        pass
+
+    @property
+    def sensor_topic(self):
+        return self._sensor_topic
 
     def turn_on(self) -> typing.List[MqttMessageSend]:
         if self.turned_on:
@@ -90,17 +114,27 @@ class BaseAbstractMqttDevice(AbstractDevice, abc.ABC):
     def __call__(self, *args, **kwargs) -> typing.List[MqttMessageSend]:
         return []
 
-    def get_topics_subscriptions(self):
-        if not self._sensor_topic:
-            return []
-        return [(self._sensor_topic, self.on_sensor_data_receive)]
+    @staticmethod
+    def parse_sensor_value(event: MqttMessageReceived):
+        # parsed once for all devices of sensor with same parser, result is passed to on_sensor_value
+        return event.value
 
-    def on_sensor_data_receive(self, event: MqttMessageReceived) -> [MqttMessageSend]:
+    def on_sensor_value(self, value) -> [MqttMessageSend]:
         self.last_sensor_time = time.time()
         return []
 
     def _build_messages_for_mqtt_send(self, payload: str) -> typing.List[MqttMessageSend]:
-        return [MqttMessageSend(topic=self._hardware_topic, payload=payload)]
+        try:
+            message = self._messages_by_payload[payload]
+        except KeyError:
+            message = self._messages_by_payload[payload] = MqttMessageSend(topic=self._hardware_topic, payload=payload)
+        return [message]
+
+    def build_state_messages(self) -> typing.List[MqttMessageSend]:
+        # command of current state, for hardware in unknown state
+        if self.turned_on:
+            return self._build_messages_turn_on()
+        return self._build_messages_turn_off()
 
     def _build_messages_turn_on(self) -> typing.List[MqttMessageSend]:
         return self._build_messages_for_mqtt_send(self._cmd_turn_on)
@@ -123,7 +157,23 @@ class BaseDevice(BaseAbstractMqttDevice):
         self._enabled = False
         self.state_changed_timeout = state_changed_timeout
 
-        self._last_dependencies_turned_on_time = time.time()
+        # clock of state_changed_timeout run-on and next_evaluation_time, plugin sets clock of its timers
+        self.clock: typing.Callable[[], float] = time.time
+
+        # None - dependencies were not turned on, there is no state_changed_timeout run-on after start
+        self._last_dependencies_turned_on_time: typing.Optional[float] = None
+
+        # called with device, when first dependency turned on or last turned off
+        self.on_dependencies_changed: typing.Optional[typing.Callable[['BaseDevice'], None]] = None
+
+        # reverse edges: turned_on change of device is pushed to dependents, they count turned on dependencies
+        self._dependents: typing.List['BaseDevice'] = []
+        self._turned_on_dependencies_count = 0
+        for dependency in self._dependencies:
+            dependency._dependents.append(self)
+            if dependency.turned_on:
+                self._turned_on_dependencies_count += 1
+                self._last_dependencies_turned_on_time = self.clock()
 
     @property
     def enabled(self):
@@ -150,7 +200,9 @@ class BaseDevice(BaseAbstractMqttDevice):
             return True
 
         if not self.dependencies_turned_on:
-            if time.time() - self._last_dependencies_turned_on_time < self.state_changed_timeout:
+            last_turned_on_time = self._last_dependencies_turned_on_time
+            # same deadline as next_evaluation_time: device evaluated on its timer is not need work
+            if last_turned_on_time is not None and self.clock() < last_turned_on_time + self.state_changed_timeout:
                 return True
             return False
 
@@ -158,10 +210,51 @@ class BaseDevice(BaseAbstractMqttDevice):
 
     @property
     def dependencies_turned_on(self):
-        is_dependencies_turned_on = any((d.turned_on for d in self._dependencies))
-        if is_dependencies_turned_on:
-            self._last_dependencies_turned_on_time = time.time()
-        return is_dependencies_turned_on
+        return self._turned_on_dependencies_count > 0
+
+    def _on_turned_on_changed(self, turned_on: bool) -> None:
+        for dependent in self._dependents:
+            dependent._on_dependency_turned_on_changed(turned_on)
+
+    def _on_dependency_turned_on_changed(self, turned_on: bool) -> None:
+        was_turned_on = self.dependencies_turned_on
+        self._turned_on_dependencies_count += 1 if turned_on else -1
+
+        if was_turned_on != self.dependencies_turned_on:
+            # state_changed_timeout is counted from last dependency turn off
+            self._last_dependencies_turned_on_time = self.clock()
+            if self.on_dependencies_changed is not None:
+                self.on_dependencies_changed(self)
+
+    def get_state(self) -> DeviceState:
+        last_turned_on_time = self._last_dependencies_turned_on_time
+        if last_turned_on_time is not None:
+            # state times are by time.time: device clock (monotonic of plugin) is not same after restart
+            last_turned_on_time += time.time() - self.clock()
+        return DeviceState(self._turned_on, last_dependencies_turned_on_time=last_turned_on_time)
+
+    def restore_state(self, state: DeviceState) -> None:
+        # device state is restored without commands: relay keeps state while controller restarts,
+        # dependents of changed device are notified as on turn on/off
+        self.turned_on = state.turned_on
+        if not self.dependencies_turned_on and state.last_dependencies_turned_on_time is not None:
+            self._last_dependencies_turned_on_time = state.last_dependencies_turned_on_time + self.clock() - time.time()
+
+    def evaluate(self) -> typing.List[MqttMessageSend]:
+        # drive device by dependencies, device with sensor is turned on by sensor readings
+        if not self.is_need_work:
+            return self.turn_off()
+        if self._sensor_topic is None:
+            return self.turn_on()
+        return []
+
+    def next_evaluation_time(self) -> typing.Optional[float]:
+        # end of state_changed_timeout after dependencies turned off, device must be evaluated again
+        if not self._enabled or self.dependencies_turned_on or self._last_dependencies_turned_on_time is None:
+            return None
+
+        deadline = self._last_dependencies_turned_on_time + self.state_changed_timeout
+        return deadline if deadline > self.clock() else None
 
     def __str__(self):
         return f'{self.__class__.__name__}[{self.name}]'
@@ -1,4 +1,8 @@
 import logging
+import time
+import types
+import typing
+from collections import deque
 
 import common
 
@@ -7,36 +11,124 @@ from ._base import BaseDevice
 logger = logging.getLogger(__name__)
 
 
+class DeviceParams(typing.NamedTuple):
+    """validated device settings, params are read only mapping of device class init kwargs"""
+
+    spec: str
+    name: str
+    dependencies: typing.Tuple[str, ...]
+    params: types.MappingProxyType
+
+    @classmethod
+    def from_settings(cls, device_spec: str, device_settings: dict) -> 'DeviceParams':
+        params = dict(device_settings)
+        name = params.pop('name', None)
+        if not isinstance(name, str):
+            raise ValueError(f'Device name is required, not found in {device_spec} params {device_settings}')
+
+        dependencies = params.pop('dependencies', None) or ()
+        if isinstance(dependencies, str) or not all(isinstance(d, str) for d in dependencies):
+            raise ValueError(f'Dependencies of device "{name}" must be list of device names')
+
+        return cls(device_spec, name, tuple(dependencies), types.MappingProxyType(params))
+
+
 class DeviceLoader:
+    """
+    Load stages: validate params, resolve classes (once per spec), order devices by dependencies
+    (iterative topological sort, dependencies first) and build. Time of every stage is in stage_timings
+    """
+
     def __init__(self, devices_params: dict):
-        self._devices_params_by_device_name = {
-            device_params['name']: (device_spec, device_params)
-            for device_spec, devices_list_param in devices_params.items()
-            for device_params in devices_list_param
-        }
-        self._devices_by_name = dict()
+        self._devices_params = devices_params
+        self._devices_by_name: typing.Dict[str, BaseDevice] = dict()
+        self.stage_timings: typing.Dict[str, float] = dict()
 
     def load_devices(self) -> [BaseDevice]:
-        return [self._load_device(*params) for params in self._devices_params_by_device_name.values()]
+        params_by_name = self._timed('validate', self._validate_params)
+        classes_by_spec = self._timed('resolve_classes', self._resolve_classes, params_by_name)
+        load_order = self._timed('order', self._order_by_dependencies, params_by_name)
+        self._timed('build', self._build_devices, load_order, params_by_name, classes_by_spec)
+
+        logger.info('Loaded %s devices, stages time %s', len(self._devices_by_name), self.stage_timings)
+        # in order of settings
+        return [self._devices_by_name[name] for name in params_by_name]
+
+    def _timed(self, stage: str, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        self.stage_timings[stage] = time.perf_counter() - started
+        return result
+
+    def _validate_params(self) -> typing.Dict[str, DeviceParams]:
+        params_by_name = dict()
+        for device_spec, devices_list_param in self._devices_params.items():
+            for device_settings in devices_list_param:
+                device_params = DeviceParams.from_settings(device_spec, device_settings)
+                if device_params.name in params_by_name:
+                    raise ValueError(f'Device name "{device_params.name}" is not unique')
+                params_by_name[device_params.name] = device_params
+        return params_by_name
+
+    @staticmethod
+    def _resolve_classes(params_by_name: typing.Dict[str, DeviceParams]) -> typing.Dict[str, type]:
+        classes_by_spec = dict()
+        for device_params in params_by_name.values():
+            if device_params.spec not in classes_by_spec:
+                classes_by_spec[device_params.spec] = common.load_module(device_params.spec)
+        return classes_by_spec
+
+    @staticmethod
+    def _order_by_dependencies(params_by_name: typing.Dict[str, DeviceParams]) -> typing.List[str]:
+        # Kahn algorithm: device is ready, when all its dependencies are loaded
+        not_loaded_dependencies_count = dict()
+        dependents_by_name = {name: [] for name in params_by_name}
+        for name, device_params in params_by_name.items():
+            for dependency_name in device_params.dependencies:
+                if dependency_name not in params_by_name:
+                    raise ValueError(f'Not found device name "{dependency_name}" in devices, for load as dependency')
+                dependents_by_name[dependency_name].append(name)
+            not_loaded_dependencies_count[name] = len(device_params.dependencies)
+
+        ready = deque(name for name, count in not_loaded_dependencies_count.items() if count == 0)
+        load_order = []
+        while ready:
+            name = ready.popleft()
+            load_order.append(name)
+            for dependent_name in dependents_by_name[name]:
+                not_loaded_dependencies_count[dependent_name] -= 1
+                if not not_loaded_dependencies_count[dependent_name]:
+                    ready.append(dependent_name)
 
-    def _load_device(self, device_spec, device_params):
-        device_name = device_params['name']
-        if device_name in self._devices_by_name:
-            return self._devices_by_name[device_name]
+        if len(load_order) != len(params_by_name):
+            raise ValueError(f'Devices dependencies cycle: {" -> ".join(_find_cycle(params_by_name, load_order))}')
+        return load_order
 
-        device_dependency = [self._resolve_dependency(name) for name in device_params.get('dependencies', [])]
-        device_params['dependencies'] = device_dependency
-        device_class = common.load_module(device_spec)
-        device: BaseDevice = device_class(**device_params)
+    def _build_devices(
+        self,
+        load_order: typing.List[str],
+        params_by_name: typing.Dict[str, DeviceParams],
+        classes_by_spec: typing.Dict[str, type],
+    ) -> None:
+        devices_by_name = self._devices_by_name
+        for name in load_order:
+            device_params = params_by_name[name]
+            dependencies = [devices_by_name[dependency_name] for dependency_name in device_params.dependencies]
+            device: BaseDevice = classes_by_spec[device_params.spec](
+                name=name, dependencies=dependencies, **device_params.params
+            )
 
-        self._devices_by_name[device.name] = device
-        logger.info('Device %s loaded', device)
-        return device
+            devices_by_name[name] = device
+            logger.debug('Device %s loaded', device)
 
-    def _resolve_dependency(self, device_name):
-        try:
-            params_for_load_device = self._devices_params_by_device_name[device_name]
-        except KeyError as ex:
-            raise ValueError(f'Not found device name "{device_name}" in devices, for load as dependency') from None
 
-        return self._load_device(*params_for_load_device)
+def _find_cycle(params_by_name: typing.Dict[str, DeviceParams], loaded: typing.List[str]) -> typing.List[str]:
+    # every not loaded device has not loaded dependency, walk by them until device repeat
+    loaded = set(loaded)
+    name = next(name for name in params_by_name if name not in loaded)
+    path, index_in_path = [], dict()
+    while name not in index_in_path:
+        index_in_path[name] = len(path)
+        path.append(name)
+        name = next(d for d in params_by_name[name].dependencies if d not in loaded)
+    return path[index_in_path[name] :] + [name]
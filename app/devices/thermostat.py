@@ -5,12 +5,14 @@ import errors
 import helpers
 from messages.events import MqttMessageReceived, MqttMessageSend
 
-from ._base import BaseDevice
+from ._base import BaseDevice, DeviceState
 
 logger = logging.getLogger(__name__)
 
 
 class Thermostat(BaseDevice):
+    sensor_codec = 'float'
+
     def __init__(self, target_temperature: float, hysteresis: float = 1, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -55,10 +57,36 @@ class Thermostat(BaseDevice):
 
         return result
 
-    def on_sensor_data_receive(self, event: MqttMessageReceived) -> [MqttMessageSend]:
-        inner_messages = super(Thermostat, self).on_sensor_data_receive(event)
-
-        current_temp = float(event.payload)
+    def get_state(self) -> DeviceState:
+        last_temperature = self._last_temperature
+        if isinstance(last_temperature, helpers.AlwaysReturnZeroOnSubtraction):
+            return super(Thermostat, self).get_state()
+        return (
+            super(Thermostat, self)
+            .get_state()
+            ._replace(last_sensor_value=last_temperature, last_sensor_time=self._last_temp_time)
+        )
+
+    def restore_state(self, state: DeviceState) -> None:
+        super(Thermostat, self).restore_state(state)
+        # first reading after restart is compared with last one before
+        if state.last_sensor_value is not None and state.last_sensor_time is not None:
+            self.set_last_temperature(state.last_sensor_value, state.last_sensor_time)
+
+    def set_last_temperature(self, temperature: float, temp_time: float) -> None:
+        # next reading is compared with it, for thermostat evaluated outside (see ThermostatBank)
+        self._last_temperature = temperature
+        self._last_temp_time = temp_time
+
+    @staticmethod
+    def parse_sensor_value(event: MqttMessageReceived) -> float:
+        # value is decoded once by MqttPlugin for all thermostats of sensor
+        if isinstance(event.value, float):
+            return event.value
+        return float(event.payload)
+
+    def on_sensor_value(self, current_temp: float) -> [MqttMessageSend]:
+        inner_messages = super(Thermostat, self).on_sensor_value(current_temp)
         logger.info('%s handle temp %s', self, current_temp)
 
         if not self.is_need_work:
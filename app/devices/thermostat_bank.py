@@ -0,0 +1,99 @@
+import logging
+import math
+import time
+from array import array
+from typing import Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ThermostatBank:
+    """
+    State of many thermostats in contiguous arrays (index of thermostat is returned by add),
+    rules are same as Thermostat.handle_temperature_sensor_val.
+    evaluate handles batch of readings and returns only changes of turned on state,
+    readings of disabled thermostats are ignored, dependencies are checked by caller.
+    UnderFloorHeatingMixerPlugin evaluates Thermostat devices of sensor topic by bank (see its docstring)
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self._index_by_name: Dict[str, int] = dict()
+
+        self.target_temperature = array('d')
+        self.hysteresis = array('d')
+        self.last_temperature = array('d')  # nan before first reading
+        self.last_temp_time = array('d')
+        self.turned_on = array('b')
+        self.enabled = array('b')
+
+    def add(self, name: str, target_temperature: float, hysteresis: float = 1, now: float = None) -> int:
+        if name in self._index_by_name:
+            raise ValueError(f'Thermostat {name} already in bank')
+
+        index = self._index_by_name[name] = len(self.names)
+        self.names.append(name)
+        self.target_temperature.append(target_temperature)
+        self.hysteresis.append(hysteresis)
+        self.last_temperature.append(math.nan)
+        self.last_temp_time.append(time.time() if now is None else now)
+        self.turned_on.append(False)
+        self.enabled.append(True)
+        return index
+
+    def index(self, name: str) -> int:
+        return self._index_by_name[name]
+
+    def __len__(self):
+        return len(self.names)
+
+    def enable(self, index: int) -> None:
+        self.enabled[index] = True
+
+    def disable(self, index: int) -> List[Tuple[int, bool]]:
+        self.enabled[index] = False
+        if not self.turned_on[index]:
+            return []
+        self.turned_on[index] = False
+        return [(index, False)]
+
+    def evaluate(self, readings: Iterable[Tuple[int, float]], now: float = None) -> List[Tuple[int, bool]]:
+        """
+        readings - (thermostat index, temperature) received at now, returns (thermostat index, turned on)
+        in order of change, thermostat changed twice in batch is in result twice
+        """
+        if now is None:
+            now = time.time()
+
+        target_temperature, hysteresis = self.target_temperature, self.hysteresis
+        last_temperature, last_temp_time = self.last_temperature, self.last_temp_time
+        turned_on, enabled = self.turned_on, self.enabled
+
+        changes = []
+        for i, current_temperature in readings:
+            if not enabled[i]:
+                continue
+
+            # nan compares False: first reading is not rise
+            last = last_temperature[i]
+            elapsed = now - last_temp_time[i]
+            last_temperature[i] = current_temperature
+            last_temp_time[i] = now
+
+            target = target_temperature[i]
+            hyst = hysteresis[i]
+            is_temp_rises = last < current_temperature
+
+            if is_temp_rises and (elapsed <= 0 or (current_temperature - last) / elapsed >= 0.5 * hyst):
+                logger.warning('Very quick temp get up of %s', self.names[i])
+                state = False
+            elif target <= current_temperature <= target + hyst:
+                state = not is_temp_rises
+            else:
+                state = current_temperature < target
+
+            if state != turned_on[i]:
+                turned_on[i] = state
+                changes.append((i, state))
+
+        return changes
@@ -1,18 +1,12 @@
+import asyncio
 import logging
 import pathlib
 
-from plugins import PluginRunManager
+from plugins import AsyncPluginRunManager, PluginRunManager
 from settings import load_settings
 
-if __name__ == '__main__':
-    # todo: move logging config to settings
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    )
-
-    app_settings = load_settings(pathlib.Path('settings.yaml'))
 
+def run_threads(app_settings):
     program_manager = PluginRunManager(
         plugins=app_settings['plugins_for_run'],
         plugins_settings=app_settings['plugins'],
@@ -23,3 +17,35 @@ if __name__ == '__main__':
         program_manager.run()
     except (Exception, KeyboardInterrupt):
         program_manager.stop()
+
+
+async def run_asyncio(app_settings):
+    # asyncio objects of manager must be created in running loop
+    program_manager = AsyncPluginRunManager(
+        plugins=app_settings['plugins_for_run'],
+        plugins_settings=app_settings['plugins'],
+    )
+    program_manager.start()
+
+    try:
+        await program_manager.run()
+    finally:
+        await program_manager.stop()
+
+
+if __name__ == '__main__':
+    # todo: move logging config to settings
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    )
+
+    app_settings = load_settings(pathlib.Path('settings.yaml'))
+
+    if app_settings.get('runtime') == 'asyncio':
+        try:
+            asyncio.run(run_asyncio(app_settings))
+        except KeyboardInterrupt:
+            pass
+    else:
+        run_threads(app_settings)
@@ -1,33 +1,131 @@
+from operator import itemgetter
+
+
 class BaseEvent:
-    pass
+    __slots__ = ()
+
+    # events with same type and not None coalesce_key can be replaced by newest in queue
+    coalesce_key = None
+
+
+class MqttEvents(BaseEvent, tuple):
+    """
+    Immutable events stored as tuple of fields: cheap to create, without __dict__,
+    one instance can be shared between all consumers.
+    Subclass defines __new__ and properties for fields
+    """
 
+    __slots__ = ()
 
-class MqttEvents(BaseEvent):
-    pass
+    def __eq__(self, other):
+        return type(self) is type(other) and tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = tuple.__hash__
+
+    def __getnewargs__(self):
+        return tuple(self)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({", ".join(map(str, self))})'
 
 
 class MqttSubscribe(MqttEvents):
-    def __init__(self, topic, qos=0, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    """
+    codec - name of payload codec of topic messages (str, float, int, bool, json),
+    MqttMessageReceived.value is decoded by it once for all consumers
+    """
 
-        self.topic = topic
-        self.qos = qos
+    __slots__ = ()
+
+    def __new__(cls, topic, qos=0, codec=None):
+        return tuple.__new__(cls, (topic, qos, codec))
+
+    topic = property(itemgetter(0))
+    qos = property(itemgetter(1))
+    codec = property(itemgetter(2))
+
+
+class MqttUnsubscribe(MqttEvents):
+    __slots__ = ()
+
+    def __new__(cls, topic):
+        return tuple.__new__(cls, (topic,))
+
+    topic = property(itemgetter(0))
 
 
 class MqttMessageReceived(MqttEvents):
-    def __init__(self, topic, payload, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    """
+    payload - raw bytes from mqtt (was decoded str before payload codecs, str consumers subscribe with "str" codec
+    and use value), value - payload decoded by codec of topic subscription (None without codec)
+    """
 
-        self.topic = topic
-        self.payload = payload
+    __slots__ = ()
 
-    def __repr__(self):
-        return f'{self.__class__.__name__}({self.topic}, {self.payload})'
+    def __new__(cls, topic, payload, value=None):
+        return tuple.__new__(cls, (topic, payload, value))
+
+    topic = property(itemgetter(0))
+    payload = property(itemgetter(1))
+    value = property(itemgetter(2))
+
+    # consumers need only latest value of sensor
+    coalesce_key = topic
 
 
 class MqttMessageSend(MqttEvents):
-    def __init__(self, topic, payload, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    __slots__ = ()
+
+    def __new__(cls, topic, payload):
+        return tuple.__new__(cls, (topic, payload))
+
+    topic = property(itemgetter(0))
+    payload = property(itemgetter(1))
+
+
+class MqttConnected(MqttEvents):
+    """
+    connection - name of connected MqttPlugin connection
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, connection=None):
+        return tuple.__new__(cls, (connection,))
+
+    connection = property(itemgetter(0))
+
+
+class MqttDisconnected(MqttEvents):
+    __slots__ = ()
+
+    def __new__(cls, rc=0, connection=None):
+        return tuple.__new__(cls, (rc, connection))
+
+    rc = property(itemgetter(0))
+    connection = property(itemgetter(1))
+
+
+class SensorStale(MqttEvents):
+    """
+    sensor topic is silent for sensor_timeout seconds of UnderFloorHeatingMixerPlugin
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, topic):
+        return tuple.__new__(cls, (topic,))
+
+    topic = property(itemgetter(0))
+
+
+class SensorRecovered(MqttEvents):
+    __slots__ = ()
+
+    def __new__(cls, topic):
+        return tuple.__new__(cls, (topic,))
 
-        self.topic = topic
-        self.payload = payload
+    topic = property(itemgetter(0))
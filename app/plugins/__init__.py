@@ -1,4 +1,7 @@
+from ._async_base import AsyncBaseEventPlugin, AsyncEventExchange
 from ._base import BaseEventPlugin, BasePlugin, EventExchange, handle_event
+from .async_mqtt import AsyncMqttPlugin
+from .async_plugin_manager import AsyncPluginRunManager
 from .mqtt import MqttPlugin
 from .plugin_manager import PluginRunManager
 from .underfloor_heating_mixer import UnderFloorHeatingMixerPlugin
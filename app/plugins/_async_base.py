@@ -0,0 +1,230 @@
+import asyncio
+import logging
+from abc import ABC
+from queue import Empty, Queue
+from typing import Callable, FrozenSet, List, Optional, Type
+
+from messages import BaseEvent
+
+from ._base import BaseEventPlugin, EventExchange, EventHandlingMixin
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncEventExchange:
+    """
+    EventExchange for plugins, running as coroutines on one event loop.
+    send_message/put can be called from loop thread only
+    """
+
+    def __init__(self):
+        self.incoming_message_queue = asyncio.Queue()
+        self.outgoing_message_queue = asyncio.Queue()
+
+    async def receive_message(self, timeout: float = None) -> Optional[BaseEvent]:
+        # consumer method, return None on timeout
+        if timeout is None:
+            return await self.incoming_message_queue.get()
+
+        try:
+            return await asyncio.wait_for(self.incoming_message_queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def receive_message_nowait(self) -> BaseEvent:
+        # consumer method
+        try:
+            return self.incoming_message_queue.get_nowait()
+        except asyncio.QueueEmpty:
+            raise Empty from None
+
+    def send_message(self, event: BaseEvent):
+        # consumer method
+        return self.outgoing_message_queue.put_nowait(event)
+
+    def send_batch(self, events: List[BaseEvent]) -> None:
+        # consumer method
+        for event in events:
+            self.outgoing_message_queue.put_nowait(event)
+
+    def put(self, event: BaseEvent):
+        # to exchange
+        return self.incoming_message_queue.put_nowait(event)
+
+    async def get(self) -> BaseEvent:
+        # from exchange
+        return await self.outgoing_message_queue.get()
+
+    def get_nowait(self) -> BaseEvent:
+        # from exchange
+        try:
+            return self.outgoing_message_queue.get_nowait()
+        except asyncio.QueueEmpty:
+            raise Empty from None
+
+    def __repr__(self):
+        return (
+            f'{self.__class__.__name__} '
+            f'[{self.incoming_message_queue.qsize()} / '
+            f'{self.outgoing_message_queue.qsize()}]'
+        )
+
+
+class AsyncBaseEventPlugin(EventHandlingMixin, ABC):
+    """
+    Plugin as coroutine, wakes up only on incoming event or after tick_timeout (if set).
+    start/stop must be called from running event loop
+    """
+
+    def __init__(self, event_exchange: AsyncEventExchange, settings=None, tick_timeout: float = None):
+        self.tick_timeout = tick_timeout
+        self.is_running = True
+        self._task: Optional[asyncio.Task] = None
+
+        self._init_event_handling(event_exchange, settings)
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def run(self) -> None:
+        while self.is_running:
+            event = await self.event_exchange.receive_message(timeout=self.tick_timeout)
+            if event is not None:
+                self.handle_events([event] + self._receive_events())
+
+            try:
+                await self.tick()
+            except Exception as err:
+                logger.exception('On run tick: %s', err)
+
+    async def tick(self) -> None:
+        pass
+
+    def _receive_events(self) -> List[BaseEvent]:
+        events = []
+        while True:
+            try:
+                events.append(self.event_exchange.receive_message_nowait())
+            except Empty:
+                return events
+
+    def stop(self) -> None:
+        logger.info('Stoping plugin %s', self)
+        # handle messages before stop
+        events = self._receive_events()
+        if events:
+            self.handle_events(events)
+
+        self.is_running = False
+        if self._task is not None:
+            self._task.cancel()
+
+    async def join(self) -> None:
+        if self._task is None:
+            return
+
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}>'
+
+
+class _LoopCallbackWakeup:
+    """
+    threading.Event like wakeup for EventExchange: set() from any thread schedules callback on event loop
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, callback: Callable[[], None]):
+        self._loop = loop
+        self._callback = callback
+
+    def set(self) -> None:
+        if not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._callback)
+
+
+class SyncPluginAdapter:
+    """
+    Run thread based BaseEventPlugin on event loop: plugin thread is not started,
+    plugin tick runs on start, on incoming event, on plugin timer deadline or after plugin tick_timeout.
+    Events sent by plugin outside of tick (on init or from own threads) are forwarded on send.
+    Plugin tick must not block, else it stops all loop. Must be created in running event loop
+    """
+
+    def __init__(self, plugin_class: Type[BaseEventPlugin], event_exchange: AsyncEventExchange, settings=None):
+        self.event_exchange = event_exchange
+        self.plugin = plugin_class(
+            event_exchange=EventExchange(
+                incoming_message_queue=Queue(),
+                outgoing_message_queue=Queue(),
+                outgoing_wakeup=_LoopCallbackWakeup(asyncio.get_running_loop(), self._forward_outgoing_events),
+            ),
+            settings=settings,
+        )
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def consumed_event_types(self) -> FrozenSet[Type[BaseEvent]]:
+        return self.plugin.consumed_event_types
+
+    @property
+    def on_consumed_event_types_changed(self) -> Optional[Callable[[], None]]:
+        return self.plugin.on_consumed_event_types_changed
+
+    @on_consumed_event_types_changed.setter
+    def on_consumed_event_types_changed(self, callback: Optional[Callable[[], None]]) -> None:
+        self.plugin.on_consumed_event_types_changed = callback
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def run(self) -> None:
+        # first tick without waiting: plugin can have no timers and no tick_timeout
+        self.plugin.run_tick()
+        self._forward_outgoing_events()
+
+        while self.plugin.is_running:
+            event = await self.event_exchange.receive_message(timeout=self.plugin._next_tick_timeout())
+            if event is not None:
+                self.plugin.event_exchange.put(event)
+                self._forward_incoming_events()
+
+            self.plugin.run_tick()
+            self._forward_outgoing_events()
+
+    def _forward_incoming_events(self) -> None:
+        while True:
+            try:
+                self.plugin.event_exchange.put(self.event_exchange.receive_message_nowait())
+            except Empty:
+                break
+
+    def _forward_outgoing_events(self) -> None:
+        while True:
+            try:
+                self.event_exchange.send_message(self.plugin.event_exchange.get())
+            except Empty:
+                break
+
+    def stop(self) -> None:
+        self._forward_incoming_events()
+        self.plugin.stop()
+        self._forward_outgoing_events()
+
+        if self._task is not None:
+            self._task.cancel()
+
+    async def join(self) -> None:
+        if self._task is None:
+            return
+
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}[{self.plugin}]>'
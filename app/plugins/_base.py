@@ -2,36 +2,115 @@ import logging
 import time
 from abc import ABC
 from collections import defaultdict
-from queue import Empty, Queue
-from threading import Thread
-from typing import Callable, List, Type
+from queue import Queue
+from threading import Event, Thread, current_thread
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple, Type
 
 from messages import BaseEvent
 
+from ._queues import get_batch, put_batch
+from ._timers import Timer, TimerHeap
+
 logger = logging.getLogger(__name__)
 
+# wait timeout, when consumer can't be woken by event (polling mode) and has not deadline
+POLL_TIMEOUT = 0.1
+
 
 class EventExchange:
-    def __init__(self, incoming_message_queue: Queue, outgoing_message_queue: Queue):
+    """
+    incoming_wakeup/outgoing_wakeup - optional events, set after every put to the queue,
+    allow consumer sleep until a new message instead of polling with fixed timeout
+    """
+
+    def __init__(
+        self,
+        incoming_message_queue: Queue,
+        outgoing_message_queue: Queue,
+        incoming_wakeup: Event = None,
+        outgoing_wakeup: Event = None,
+    ):
         self.incoming_message_queue = incoming_message_queue
         self.outgoing_message_queue = outgoing_message_queue
 
+        self.incoming_wakeup = incoming_wakeup
+        self.outgoing_wakeup = outgoing_wakeup
+
     def receive_message(self, timeout=None):
         # consumer method
         return self.incoming_message_queue.get(timeout=timeout, block=False)
 
+    def receive_batch(self, max_n: int) -> List[BaseEvent]:
+        # consumer method, empty list if not messages
+        return get_batch(self.incoming_message_queue, max_n)
+
     def send_message(self, event: BaseEvent, timeout=None):
         # consumer method
-        return self.outgoing_message_queue.put(event, timeout=timeout, block=False)
+        result = self.outgoing_message_queue.put(event, timeout=timeout, block=False)
+        if self.outgoing_wakeup is not None:
+            self.outgoing_wakeup.set()
+        return result
+
+    def send_batch(self, events: List[BaseEvent]) -> None:
+        # consumer method
+        if not events:
+            return
+        put_batch(self.outgoing_message_queue, events)
+        if self.outgoing_wakeup is not None:
+            self.outgoing_wakeup.set()
+
+    def wait_incoming(self, timeout: Optional[float]) -> None:
+        # consumer method, returns on new incoming message or after timeout (None - wait message only)
+        if self.incoming_wakeup is None:
+            # polling: incoming messages are checked every POLL_TIMEOUT, distant timer deadline must not delay them
+            time.sleep(POLL_TIMEOUT if timeout is None else min(timeout, POLL_TIMEOUT))
+            return
+
+        self.incoming_wakeup.wait(timeout)
+        # message put before set wakeup, so it will be received after clear
+        self.incoming_wakeup.clear()
+
+    def wake_incoming(self) -> None:
+        if self.incoming_wakeup is not None:
+            self.incoming_wakeup.set()
 
     def put(self, event: BaseEvent, timeout=None):
         # to exchange
-        return self.incoming_message_queue.put(event, timeout=timeout, block=False)
+        result = self.incoming_message_queue.put(event, timeout=timeout, block=False)
+        if self.incoming_wakeup is not None:
+            self.incoming_wakeup.set()
+        return result
+
+    def put_batch(self, events: List[BaseEvent]) -> None:
+        # to exchange
+        if not events:
+            return
+        put_batch(self.incoming_message_queue, events)
+        if self.incoming_wakeup is not None:
+            self.incoming_wakeup.set()
 
     def get(self, timeout=None):
         # from exchange
         return self.outgoing_message_queue.get(timeout=timeout, block=False)
 
+    def get_batch(self, max_n: int) -> List[BaseEvent]:
+        # from exchange, empty list if not messages
+        return get_batch(self.outgoing_message_queue, max_n)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'incoming': self._queue_stats(self.incoming_message_queue),
+            'outgoing': self._queue_stats(self.outgoing_message_queue),
+        }
+
+    @staticmethod
+    def _queue_stats(message_queue: Queue) -> dict:
+        stats = getattr(message_queue, 'stats', None)
+        if stats is not None:
+            return stats
+        return {'size': message_queue.qsize(), 'dropped': 0, 'coalesced': 0}
+
     def __repr__(self):
         return (
             f'{self.__class__.__name__} '
@@ -41,39 +120,90 @@ class EventExchange:
 
 
 class BasePlugin(Thread):
+    """
+    Plugin thread wakes up after tick_timeout, on nearest timer deadline (see call_later/call_at)
+    or on incoming event (BaseEventPlugin). tick_timeout=None - wake up on timers and events only.
+    Timers must be set from plugin thread (or before start and after stop), callbacks run in plugin thread before tick
+    """
+
     def __init__(self, tick_timeout=0.1, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.tick_timeout = tick_timeout
+        self.timers = TimerHeap()
 
         self.is_running = True
 
+        # wake up counter for detect busy plugins, see wakeups_per_second
+        self.wakeups = 0
+        self._started_at = None
+
+    def call_later(self, delay: float, callback: Callable, *args) -> Timer:
+        return self.timers.call_later(delay, callback, *args)
+
+    def call_at(self, deadline: float, callback: Callable, *args) -> Timer:
+        # deadline by time.monotonic
+        return self.timers.call_at(deadline, callback, *args)
+
+    @property
+    def wakeups_per_second(self) -> float:
+        if self._started_at is None:
+            return 0.0
+        return self.wakeups / max(time.monotonic() - self._started_at, 1e-9)
+
     def run(self) -> None:
+        self._started_at = time.monotonic()
         while self.is_running:
-            try:
-                self._before_tick()
-            except Exception as err:
-                logger.exception('On run _before_tick: %s', err)
+            self.run_tick()
+            self._wait_next_tick()
 
-            try:
-                self.tick()
-            except Exception as err:
-                logger.exception('On run tick: %s', err)
+    def run_tick(self) -> None:
+        self.wakeups += 1
 
-            try:
-                self._after_tick()
-            except Exception as err:
-                logger.exception('On run _after_tick: %s', err)
+        try:
+            self._before_tick()
+        except Exception as err:
+            logger.exception('On run _before_tick: %s', err)
+
+        self._run_due_timers()
 
-            time.sleep(self.tick_timeout)
+        try:
+            self.tick()
+        except Exception as err:
+            logger.exception('On run tick: %s', err)
+
+        try:
+            self._after_tick()
+        except Exception as err:
+            logger.exception('On run _after_tick: %s', err)
 
     def stop(self):
         logger.info('Stoping plugin %s', self)
         self.is_running = False
 
     def join(self, *args, **kwargs) -> None:
-        self.stop()
+        if self.is_running:
+            self.stop()
         super().join(*args, **kwargs)
 
+    def _run_due_timers(self) -> None:
+        for timer in self.timers.pop_due():
+            try:
+                timer.callback(*timer.args)
+            except Exception as err:
+                logger.exception('On run timer %s: %s', timer, err)
+
+    def _next_tick_timeout(self) -> Optional[float]:
+        deadline = self.timers.next_deadline()
+        if deadline is None:
+            return self.tick_timeout
+
+        timeout = max(deadline - self.timers.clock(), 0.0)
+        return timeout if self.tick_timeout is None else min(timeout, self.tick_timeout)
+
+    def _wait_next_tick(self) -> None:
+        timeout = self._next_tick_timeout()
+        time.sleep(POLL_TIMEOUT if timeout is None else min(timeout, POLL_TIMEOUT))
+
     def _before_tick(self) -> None:
         pass
 
@@ -84,59 +214,119 @@ class BasePlugin(Thread):
         pass
 
 
+def find_plugin_settings(plugin_class: Type, all_plugins_settings: dict) -> Optional[dict]:
+    for plugin_spec in all_plugins_settings.keys():
+        _, plugin_class_name = plugin_spec.rsplit('.', 1)
+        if plugin_class_name == plugin_class.__name__:
+            return all_plugins_settings[plugin_spec]
+    return None
+
+
 def handle_event(event_class: Type[BaseEvent]):
-    # fixme: not work it!
-    def inner(handler: Callable):
-        d = dir(handler)
-        dct = handler.__dict__
-        cls = handler.__class__
-        if not getattr(cls, 'event_handlers', None):
-            raise TypeError(f'{cls} not have required special object "event_handlers"')
+    """
+    Mark plugin method as handler of event_class (and its subclasses),
+    handlers are collected on plugin class creation and bound on plugin init
+    """
 
-        cls.event_handlers[event_class].append(handler)
+    def inner(handler: Callable):
+        handler._handled_event_types = getattr(handler, '_handled_event_types', ()) + (event_class,)
         return handler
 
     return inner
 
 
-class BaseEventPlugin(BasePlugin, ABC):
-    def __init__(self, event_exchange: EventExchange, *args, settings=None, **kwargs):
-        super().__init__(*args, **kwargs)
-
+class EventHandlingMixin:
+    """
+    Event handlers registry and dispatching, common for thread and asyncio plugins.
+    Handler of event type handle events of its subclasses too,
+    handlers for every event type are resolved by event type MRO once and cached
+    """
+
+    # event type -> names of methods, marked by handle_event decorator
+    _class_event_handlers: Dict[Type[BaseEvent], Tuple[str, ...]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        handled_event_types_by_name = dict()
+        for klass in reversed(cls.__mro__):
+            for name, attr in vars(klass).items():
+                handled_event_types = getattr(attr, '_handled_event_types', None)
+                if handled_event_types is not None:
+                    handled_event_types_by_name[name] = handled_event_types
+                else:
+                    # overridden without decorator
+                    handled_event_types_by_name.pop(name, None)
+
+        class_event_handlers = defaultdict(tuple)
+        for name, handled_event_types in handled_event_types_by_name.items():
+            for event_type in handled_event_types:
+                class_event_handlers[event_type] += (name,)
+        cls._class_event_handlers = dict(class_event_handlers)
+
+    def _init_event_handling(self, event_exchange, settings) -> None:
         self.event_exchange = event_exchange
-        self.event_handlers = defaultdict(list)
+        self.event_handlers = dict()
+        self._event_handlers_by_event_type = dict()
+        # replaced on new event type, not built from event_handlers: read by manager thread, while plugin adds handler
+        self._consumed_event_types: FrozenSet[Type[BaseEvent]] = frozenset()
+        # called when handler for new event type added, consumed_event_types are changed
+        self.on_consumed_event_types_changed: Optional[Callable[[], None]] = None
 
         self.settings = self._find_plugin_settings(settings)
 
+        for event_type, handler_names in self._class_event_handlers.items():
+            for name in handler_names:
+                self.add_event_handler(event_type, getattr(self, name))
+
     def _find_plugin_settings(self, all_plugins_settings):
         if not all_plugins_settings:
             return {}
 
-        for plugin_spec in all_plugins_settings.keys():
-            _, plugin_class_name = plugin_spec.rsplit('.', 1)
-            if plugin_class_name == self.__class__.__name__:
-                return all_plugins_settings[plugin_spec]
-
-        logger.error('Not found settings for plugin %s', self)
-
-    def _before_tick(self) -> None:
-        while True:
-            try:
-                event = self.event_exchange.receive_message()
-            except Empty:
-                break
-            else:
-                self.handle_event(event)
+        plugin_settings = find_plugin_settings(self.__class__, all_plugins_settings)
+        if plugin_settings is None:
+            logger.error('Not found settings for plugin %s', self)
+        return plugin_settings
 
-        super()._before_tick()
+    @property
+    def consumed_event_types(self) -> FrozenSet[Type[BaseEvent]]:
+        return self._consumed_event_types
 
     def add_event_handler(self, event_type, handler: Callable):
-        self.event_handlers[event_type].append(handler)
+        is_new_event_type = event_type not in self.event_handlers
+        self.event_handlers.setdefault(event_type, []).append(handler)
+        self._event_handlers_by_event_type.clear()
         logger.info('Added handler %s for event type %s', handler, event_type)
 
+        if is_new_event_type:
+            self._consumed_event_types = self._consumed_event_types | {event_type}
+            if self.on_consumed_event_types_changed is not None:
+                self.on_consumed_event_types_changed()
+
+    def get_event_handlers(self, event_type: Type[BaseEvent]) -> Tuple[Callable, ...]:
+        try:
+            return self._event_handlers_by_event_type[event_type]
+        except KeyError:
+            pass
+
+        # most specific event type handlers first
+        event_handlers = tuple(
+            handler for base_type in event_type.__mro__ for handler in self.event_handlers.get(base_type, ())
+        )
+        self._event_handlers_by_event_type[event_type] = event_handlers
+        return event_handlers
+
     def handle_event(self, event: BaseEvent):
         logger.debug('Handle event %s', event)
-        event_handlers = self.event_handlers[type(event)]
+        self._dispatch_event(event)
+
+    def handle_events(self, events: List[BaseEvent]):
+        logger.debug('Handle %s events', len(events))
+        for event in events:
+            self._dispatch_event(event)
+
+    def _dispatch_event(self, event: BaseEvent):
+        event_handlers = self.get_event_handlers(type(event))
         if not event_handlers:
             logger.info('Not found handler for event %s', event)
             return
@@ -151,13 +341,49 @@ class BaseEventPlugin(BasePlugin, ABC):
         return self.event_exchange.send_message(event)
 
     def send_events(self, events: List[BaseEvent]):
-        result = []
-        for ev in events:
-            result.append(self.send_event(ev))
-        return result
+        return self.event_exchange.send_batch(events)
+
+
+class BaseEventPlugin(BasePlugin, EventHandlingMixin, ABC):
+    """
+    stop is idempotent: overridden stop with side effects must return, if plugin is not running.
+    Plugin thread is joined up to stop_timeout seconds on stop
+    """
+
+    receive_batch_size = 100
+    stop_timeout = 5
+
+    def __init__(self, event_exchange: EventExchange, *args, settings=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self._init_event_handling(event_exchange, settings)
+
+    def _before_tick(self) -> None:
+        while True:
+            events = self.event_exchange.receive_batch(self.receive_batch_size)
+            if not events:
+                break
+            self.handle_events(events)
+
+        super()._before_tick()
+
+    def _wait_next_tick(self) -> None:
+        self.event_exchange.wait_incoming(self._next_tick_timeout())
 
     def stop(self):
-        # handle messages before stop
-        self._before_tick()
+        if not self.is_running:
+            return
 
         super().stop()
+        self.event_exchange.wake_incoming()
+        # plugin thread is stopped before caller handles rest of messages: timers and devices are not shared
+        if self.is_alive() and current_thread() is not self:
+            Thread.join(self, self.stop_timeout)
+            if self.is_alive():
+                logger.error(
+                    'Plugin %s thread not stopped in %s seconds, rest of events not handled', self, self.stop_timeout
+                )
+                return
+
+        # handle messages before stop
+        self._before_tick()
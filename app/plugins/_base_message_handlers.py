@@ -1,10 +1,10 @@
 import logging
 from abc import ABC
-from collections import defaultdict
 
 import messages
 
 from ._base import BaseEventPlugin
+from ._topic_trie import TopicTrie
 
 logger = logging.getLogger(__name__)
 
@@ -13,17 +13,22 @@ class BaseMqttMessagePlugin(BaseEventPlugin, ABC):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self._mqtt_message_router_map = defaultdict(list)
+        self._mqtt_message_router = TopicTrie()
         self.add_event_handler(messages.events.MqttMessageReceived, self._mqtt_message_router_event_handler)
 
     def _mqtt_message_router_event_handler(self, event: messages.events.MqttMessageReceived):
         logger.debug('Handle event %s', event)
-        for event_handler in self._mqtt_message_router_map[event.topic]:
+        for event_handler in self._mqtt_message_router.match(event.topic):
             try:
                 event_handler(event)
             except Exception as ex:
                 logger.error('On handle event %s error %s', event, ex)
 
-    def subscribe_to_topic(self, topic: str, message_handler):
-        self._mqtt_message_router_map[topic].append(message_handler)
-        self.event_exchange.send_message(messages.events.MqttSubscribe(topic, 1))
+    def subscribe_to_topic(self, topic: str, message_handler, codec: str = None):
+        # topic can be filter with + and # wildcards, codec of first subscription to topic is used
+        if self._mqtt_message_router.add(topic, message_handler):
+            self.event_exchange.send_message(messages.events.MqttSubscribe(topic, 1, codec))
+
+    def unsubscribe_from_topic(self, topic: str, message_handler):
+        if self._mqtt_message_router.remove(topic, message_handler):
+            self.event_exchange.send_message(messages.events.MqttUnsubscribe(topic))
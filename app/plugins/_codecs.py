@@ -0,0 +1,94 @@
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from ._topic_trie import TopicTrie
+
+logger = logging.getLogger(__name__)
+
+
+def _decode_bool(payload: bytes) -> bool:
+    return payload.strip().lower() in (b'1', b'true', b'on')
+
+
+# payload codec name -> decoder of raw bytes payload, float/int/json parse bytes without str copy
+DECODERS: Dict[str, Callable[[bytes], Any]] = {
+    'str': bytes.decode,
+    'float': float,
+    'int': int,
+    'bool': _decode_bool,
+    'json': json.loads,
+}
+
+
+def get_decoder(codec: Optional[str]) -> Optional[Callable[[bytes], Any]]:
+    if codec is None:
+        return None
+    try:
+        return DECODERS[codec]
+    except KeyError:
+        raise ValueError(f'Unknown payload codec "{codec}", expected one of {tuple(DECODERS)}') from None
+
+
+class PayloadDecoders:
+    """
+    Payload codecs of subscribed topic filters, payload of message is decoded once by codec of matched filter.
+    Filter has one codec: other codec of subscribed filter is rejected by ValueError. Topic matched by filters
+    with different codecs is not decoded (value is None), error is logged.
+    Decoder of topic is cached, codecs are changed by plugin thread, decode is called by network
+    """
+
+    _NOT_CACHED = object()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._codecs = TopicTrie()
+        self._codecs_by_filter: Dict[str, str] = dict()
+        self._decoders_by_topic: Dict[str, Optional[Callable]] = dict()
+
+    def add(self, topic_filter: str, codec: str) -> None:
+        get_decoder(codec)  # validate
+
+        with self._lock:
+            filter_codec = self._codecs_by_filter.get(topic_filter)
+            if filter_codec == codec:
+                return
+            if filter_codec is not None:
+                raise ValueError(f'Topic filter "{topic_filter}" has codec "{filter_codec}", codec "{codec}" conflicts')
+
+            self._codecs.add(topic_filter, codec)
+            self._codecs_by_filter[topic_filter] = codec
+            self._decoders_by_topic = dict()
+
+    def remove(self, topic_filter: str) -> None:
+        with self._lock:
+            codec = self._codecs_by_filter.pop(topic_filter, None)
+            if codec is not None:
+                self._codecs.remove(topic_filter, codec)
+            self._decoders_by_topic = dict()
+
+    def decode(self, topic: str, payload: bytes):
+        # returns None, if topic without codec or payload is broken
+        decoder = self._decoders_by_topic.get(topic, self._NOT_CACHED)
+        if decoder is self._NOT_CACHED:
+            decoder = self._find_decoder(topic)
+        if decoder is None:
+            return None
+
+        try:
+            return decoder(payload)
+        except ValueError as err:  # UnicodeDecodeError and JSONDecodeError too
+            logger.warning('Payload %r of topic "%s" not decoded: %s', payload, topic, err)
+            return None
+
+    def _find_decoder(self, topic: str) -> Optional[Callable]:
+        with self._lock:
+            codecs = set(self._codecs.match(topic))
+            if len(codecs) > 1:
+                logger.error('Topic "%s" matched by filters with different codecs %s, not decoded', topic, codecs)
+                decoder = None
+            else:
+                decoder = get_decoder(codecs.pop()) if codecs else None
+            self._decoders_by_topic[topic] = decoder
+        return decoder
@@ -0,0 +1,178 @@
+import logging
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+import paho.mqtt.client
+
+logger = logging.getLogger(__name__)
+
+STATE_DISCONNECTED = 'disconnected'
+STATE_CONNECTING = 'connecting'
+STATE_CONNECTED = 'connected'
+STATE_STOPPED = 'stopped'
+
+
+class MqttConnection:
+    """
+    Keep paho client connected from own network thread:
+        disconnected -> connecting (tcp connect and CONNECT sent) -> connected (CONNACK accepted)
+        connecting/connected -> disconnected on error, next attempt after exponential backoff with jitter
+
+    First connect is lazy: init and start never block on broker.
+    Client on_connect/on_disconnect are used by connection, pass own callbacks to init (same signature).
+    stats - reconnects count, connect time after last disconnect and total time spent disconnected
+    """
+
+    def __init__(
+        self,
+        client: paho.mqtt.client.Client,
+        host: str,
+        port: int = 1883,
+        keepalive: int = 10,
+        min_backoff: float = 1,
+        max_backoff: float = 60,
+        on_connect: Callable = None,
+        on_disconnect: Callable = None,
+    ):
+        self.client = client
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+
+        self.state = STATE_DISCONNECTED
+        self._failed_attempts = 0
+        self._next_attempt_at = 0.0
+
+        self.reconnects = 0
+        self.connect_attempts = 0
+        self.last_time_to_reconnect: Optional[float] = None
+        self._disconnected_at = time.monotonic()
+        self._disconnected_time = 0.0
+        self._was_connected = False
+
+        client.on_connect = self._on_client_connect
+        client.on_disconnect = self._on_client_disconnect
+        # packets are written only by network thread: without it paho writes from publish caller thread and calls
+        # on_publish there, so lock of caller and paho callback lock are taken in different order by threads
+        client.on_socket_register_write = self._on_socket_register_write
+        # only store connect params
+        client.connect_async(host, port, keepalive=keepalive)
+
+        self._stop_requested = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'{self.__class__.__name__}[{host}]', daemon=True)
+
+    @property
+    def is_connected(self) -> bool:
+        return self.state == STATE_CONNECTED
+
+    @property
+    def disconnected_time(self) -> float:
+        # total, including current disconnect
+        if self.state == STATE_CONNECTED:
+            return self._disconnected_time
+        return self._disconnected_time + time.monotonic() - self._disconnected_at
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'state': self.state,
+            'connect_attempts': self.connect_attempts,
+            'reconnects': self.reconnects,
+            'last_time_to_reconnect': self.last_time_to_reconnect,
+            'disconnected_time': self.disconnected_time,
+        }
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        self._stop_requested.set()
+        # DISCONNECT is written by network thread, it stops after socket closed
+        self.client.disconnect()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        self.state = STATE_STOPPED
+
+    def backoff_delay(self, failed_attempts: int) -> float:
+        # exponential with "equal jitter": clients don't reconnect at same time after broker restart
+        delay = min(self.max_backoff, self.min_backoff * 2 ** min(failed_attempts, 32))
+        return random.uniform(delay / 2, delay)
+
+    def _run(self) -> None:
+        while True:
+            if self.client.socket() is not None:
+                # returns on socket activity, publish from other thread or after timeout (keepalive ping)
+                try:
+                    self.client.loop(timeout=1)
+                except Exception as err:
+                    # paho re-raises callbacks exceptions, thread must not die. Callbacks handle local errors,
+                    # network errors are returned by loop, so connection is kept
+                    logger.exception('Mqtt client loop error: %s', err)
+                continue
+
+            if self._stop_requested.is_set():
+                break
+
+            if self.state != STATE_DISCONNECTED:
+                # socket closed without on_disconnect, as connect failed on CONNACK
+                self._set_disconnected()
+
+            delay = self._next_attempt_at - time.monotonic()
+            if delay > 0:
+                self._stop_requested.wait(delay)
+                continue
+
+            self._connect()
+
+    def _connect(self) -> None:
+        self.connect_attempts += 1
+        self.state = STATE_CONNECTING
+        try:
+            self.client.reconnect()
+        except OSError as err:
+            logger.warning('Mqtt client not connected: %s', err)
+            self._set_disconnected()
+
+    def _set_disconnected(self) -> None:
+        if self.state == STATE_CONNECTED:
+            self._disconnected_at = time.monotonic()
+
+        self.state = STATE_DISCONNECTED
+        delay = self.backoff_delay(self._failed_attempts)
+        self._failed_attempts += 1
+        self._next_attempt_at = time.monotonic() + delay
+        logger.info('Mqtt reconnect in %.1f seconds', delay)
+
+    def _on_client_connect(self, client, userdata, flags, rc):
+        if rc == paho.mqtt.client.CONNACK_ACCEPTED:
+            now = time.monotonic()
+            self.state = STATE_CONNECTED
+            self._failed_attempts = 0
+
+            disconnected_for = now - self._disconnected_at
+            self._disconnected_time += disconnected_for
+            if self._was_connected:
+                self.reconnects += 1
+                self.last_time_to_reconnect = disconnected_for
+            self._was_connected = True
+
+        if self.on_connect is not None:
+            self.on_connect(client, userdata, flags, rc)
+
+    def _on_client_disconnect(self, client, userdata, rc):
+        if self.state != STATE_DISCONNECTED and not self._stop_requested.is_set():
+            self._set_disconnected()
+
+        if self.on_disconnect is not None:
+            self.on_disconnect(client, userdata, rc)
+
+    @staticmethod
+    def _on_socket_register_write(client, userdata, sock):
+        # network thread is woken by paho sockpair and selects socket for write
+        pass
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}[{self.state}]>'
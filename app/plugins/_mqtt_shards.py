@@ -0,0 +1,246 @@
+import logging
+import threading
+import time
+import zlib
+from queue import Full
+from typing import Dict, List, Sequence, Tuple
+
+import messages
+import paho.mqtt.client
+
+from ._codecs import PayloadDecoders
+from ._mqtt_connection import MqttConnection
+from ._spool import MessageSpool
+from ._subscriptions import SubscriptionRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class MqttShard:
+    """
+    One broker connection of MqttPlugin with its subscriptions, messages sent while disconnected
+    and publish confirmations. Called by plugin thread and by connection network thread (callbacks),
+    shared state is under lock. Callbacks do not raise: event not placed to full exchange is dropped (counted
+    in dropped), spool read error is logged, connection is not dropped by local errors
+    """
+
+    def __init__(self, name: str, settings: dict, event_exchange, payload_decoders: PayloadDecoders):
+        self.name = name
+        self.event_exchange = event_exchange
+        self._payload_decoders = payload_decoders
+
+        self._lock = threading.Lock()
+        self._client_connected = False
+        self._subscriptions = SubscriptionRegistry()
+        self._need_send_messages: Dict[str, str] = dict()
+        self._spool = None
+        if settings.get('spool_path'):
+            self._spool = MessageSpool(settings['spool_path'], settings.get('spool_size', 64 * 1024))
+        self._publishing: Dict[int, Tuple[str, str]] = dict()  # mid -> topic, payload
+        self._published_payloads: Dict[str, Tuple[str, bool]] = dict()  # topic -> last payload, is confirmed
+
+        self.published = 0
+        self.coalesced = 0
+        self.skipped = 0
+        self.received = 0
+        self.dropped = 0
+        self._started_at = time.monotonic()
+
+        self.mqtt_client = paho.mqtt.client.Client()
+        self.mqtt_client.on_message = self.on_message_receive
+        self.mqtt_client.on_publish = self.on_publish_callback
+        self.connection = MqttConnection(
+            self.mqtt_client,
+            settings['mqtt_host'],
+            settings.get('mqtt_port', 1883),
+            min_backoff=settings.get('reconnect_min_timeout', 1),
+            max_backoff=settings.get('reconnect_timeout', 10),
+            on_connect=self.on_connect_callback,
+            on_disconnect=self.on_disconnect_callback,
+        )
+
+    @property
+    def stats(self) -> dict:
+        elapsed = max(time.monotonic() - self._started_at, 1e-9)
+        with self._lock:
+            return dict(
+                self.connection.stats,
+                published=self.published,
+                skipped=self.skipped,
+                received=self.received,
+                dropped=self.dropped,
+                published_per_second=self.published / elapsed,
+                received_per_second=self.received / elapsed,
+                # not confirmed publishes and messages waiting connect
+                in_flight=len(self._publishing),
+                offline_queue=len(self._need_send_messages) + (len(self._spool) if self._spool is not None else 0),
+            )
+
+    @property
+    def has_spool(self) -> bool:
+        return self._spool is not None
+
+    def start(self) -> None:
+        self.connection.start()
+
+    def stop(self) -> None:
+        self.connection.stop()
+        logger.info('Mqtt connection %s stats %s', self.name, self.stats)
+
+        if self._spool is not None:
+            self._spool.close()
+
+    def subscribe(self, topic: str, qos: int) -> bool:
+        # returns True, if flush_subscriptions is needed
+        with self._lock:
+            return self._subscriptions.add(topic, qos)
+
+    def unsubscribe(self, topic: str) -> bool:
+        with self._lock:
+            return self._subscriptions.remove(topic)
+
+    def flush_subscriptions(self) -> None:
+        with self._lock:
+            need_subscribe, need_unsubscribe = self._subscriptions.pop_changes()
+            # on connect subscribe to all topics
+            if not self._client_connected:
+                return
+
+            if need_subscribe:
+                logger.info('Subscribe to %s mqtt topics by %s', len(need_subscribe), self.name)
+                self.mqtt_client.subscribe(need_subscribe)
+            if need_unsubscribe:
+                logger.info('Unsubscribe from %s mqtt topics by %s', len(need_unsubscribe), self.name)
+                self.mqtt_client.unsubscribe(need_unsubscribe)
+
+    def publish(self, topic: str, payload: str) -> bool:
+        # returns True, if message is stored to spool and spool flush is needed
+        with self._lock:
+            if self._published_payloads.get(topic) == (payload, True):
+                logger.debug('Skip already published to mqtt topic "%s" message "%s"', topic, payload)
+                self.skipped += 1
+            elif self._client_connected:
+                self._publish(topic, payload)
+            elif self._spool is not None:
+                self._spool.append(topic, payload)
+                return True
+            else:
+                if topic in self._need_send_messages:
+                    self.coalesced += 1
+                self._need_send_messages[topic] = payload
+        return False
+
+    def flush_spool(self) -> None:
+        with self._lock:
+            self._spool.flush()
+
+    def _publish(self, topic: str, payload: str):
+        # under lock: on_publish must find mid in _publishing
+        logger.debug('Send to mqtt topic "%s" message "%s"', topic, payload)
+        # paho client is thread safe, packet is written by network thread
+        message_info = self.mqtt_client.publish(topic, payload.encode())
+
+        self._publishing[message_info.mid] = (topic, payload)
+        self._published_payloads[topic] = (payload, False)
+        self.published += 1
+
+    def on_connect_callback(self, client, userdata, flags, rc):
+        logger.info('Connected %s with result code %s', self.name, rc)
+        if rc != paho.mqtt.client.CONNACK_ACCEPTED:
+            return
+        self._send_event(messages.events.MqttConnected(self.name))
+
+        with self._lock:
+            self._client_connected = True
+            subscribed_to_topics = self._subscriptions.pop_all_topics()
+            if subscribed_to_topics:
+                logger.info('Subscribe to %s mqtt topics by %s', len(subscribed_to_topics), self.name)
+                self.mqtt_client.subscribe(subscribed_to_topics)
+
+            need_send_messages, self._need_send_messages = self._need_send_messages, dict()
+            if self._spool is not None and len(self._spool):
+                try:
+                    # superseded messages in spool are skipped
+                    spooled_messages = self._spool.messages()
+                    self._spool.clear()
+                except OSError as err:
+                    logger.error('On replay spool of %s: %s', self.name, err)
+                else:
+                    logger.info('Replay %s messages from spool', len(spooled_messages))
+                    need_send_messages = {**spooled_messages, **need_send_messages}
+
+            for topic, payload in need_send_messages.items():
+                self._publish(topic, payload)
+
+    def on_disconnect_callback(self, client, userdata, rc):
+        logger.error('Mqtt %s disconnected!', self.name)
+        with self._lock:
+            was_connected, self._client_connected = self._client_connected, False
+            # relays can be changed while disconnected
+            self._publishing.clear()
+            self._published_payloads.clear()
+
+        if was_connected:
+            self._send_event(messages.events.MqttDisconnected(rc, self.name))
+
+    def on_publish_callback(self, client, userdata, mid):
+        with self._lock:
+            topic_with_payload = self._publishing.pop(mid, None)
+            if topic_with_payload is None:
+                return
+
+            topic, payload = topic_with_payload
+            # not confirm, if newer payload published
+            if self._published_payloads.get(topic) == (payload, False):
+                self._published_payloads[topic] = (payload, True)
+
+    def on_message_receive(self, client, userdata, msg):
+        topic, payload = msg.topic, msg.payload
+        logger.debug('Received message %r from topic "%s"', payload, topic)
+        self.received += 1
+        value = self._payload_decoders.decode(topic, payload)
+        self._send_event(messages.events.MqttMessageReceived(topic, payload, value))
+
+    def _send_event(self, event: messages.BaseEvent) -> None:
+        # called by network thread: full exchange is local backpressure, not connection error
+        try:
+            self.event_exchange.send_message(event)
+        except Full:
+            with self._lock:
+                self.dropped += 1
+            logger.warning('Exchange is full, event %s of %s dropped', event, self.name)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}[{self.name}, {self.connection.state}]>'
+
+
+class TopicSharding:
+    """
+    Topic (or subscription filter) -> shard: by longest matched topic prefix of shard,
+    else by crc32 hash of topic among shards without prefixes (all shards, if every shard has prefixes).
+    Topic is always assigned to same shard, so messages of topic keep order of one connection
+    """
+
+    def __init__(self, shards: Sequence[Tuple[MqttShard, Sequence[str]]]):
+        self._shards_by_prefix: List[Tuple[str, MqttShard]] = sorted(
+            ((prefix, shard) for shard, prefixes in shards for prefix in prefixes),
+            key=lambda prefix_with_shard: len(prefix_with_shard[0]),
+            reverse=True,
+        )
+        self._hashed_shards = [shard for shard, prefixes in shards if not prefixes] or [shard for shard, _ in shards]
+        self._shard_by_topic: Dict[str, MqttShard] = dict()
+
+    def shard(self, topic: str) -> MqttShard:
+        try:
+            return self._shard_by_topic[topic]
+        except KeyError:
+            pass
+
+        for prefix, shard in self._shards_by_prefix:
+            if topic.startswith(prefix):
+                break
+        else:
+            shard = self._hashed_shards[zlib.crc32(topic.encode()) % len(self._hashed_shards)]
+
+        self._shard_by_topic[topic] = shard
+        return shard
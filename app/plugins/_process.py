@@ -0,0 +1,315 @@
+import logging
+import multiprocessing
+import pickle
+import signal
+import threading
+from collections import deque
+from queue import Empty
+from typing import Callable, FrozenSet, List, Optional, Type
+
+from messages import BaseEvent
+
+from ._base import POLL_TIMEOUT, BaseEventPlugin, EventExchange
+from ._queues import build_event_queue, get_batch, put_batch
+
+logger = logging.getLogger(__name__)
+
+# pipe message: one byte of kind + pickled object
+_KIND_EVENT = 0
+_KIND_READY = 1
+_KIND_STOP = 2
+_KIND_STOPPED = 3
+_KIND_EVENTS = 4  # list of events
+_KIND_EVENT_TYPES = 5  # consumed event types changed
+
+
+def _dumps(kind: int, obj=None) -> bytes:
+    return bytes((kind,)) + pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _loads(data: bytes):
+    return data[0], pickle.loads(data[1:])
+
+
+class _PipeSender:
+    def __init__(self, connection):
+        self._connection = connection
+        self._send_lock = threading.Lock()
+
+    def _send(self, kind: int, obj=None) -> None:
+        data = _dumps(kind, obj)
+        with self._send_lock:
+            self._connection.send_bytes(data)
+
+
+class PipeEventExchange(_PipeSender):
+    """
+    Worker process side of EventExchange, events are received from and sent to manager over pipe
+    """
+
+    def __init__(self, connection):
+        super().__init__(connection)
+        self.stop_requested = False
+
+        self._received_events = deque()
+
+    def receive_message(self, timeout=None):
+        # consumer method
+        if not self._received_events:
+            self._receive_pipe_message()
+        try:
+            return self._received_events.popleft()
+        except IndexError:
+            raise Empty from None
+
+    def receive_batch(self, max_n: int) -> List[BaseEvent]:
+        # consumer method
+        while len(self._received_events) < max_n and self._receive_pipe_message():
+            pass
+
+        count = min(max_n, len(self._received_events))
+        return [self._received_events.popleft() for _ in range(count)]
+
+    def _receive_pipe_message(self) -> bool:
+        if self.stop_requested or not self._connection.poll():
+            return False
+
+        kind, obj = _loads(self._connection.recv_bytes())
+        if kind == _KIND_STOP:
+            self.stop_requested = True
+            return False
+
+        if kind == _KIND_EVENTS:
+            self._received_events.extend(obj)
+        else:
+            self._received_events.append(obj)
+        return True
+
+    def send_message(self, event: BaseEvent, timeout=None):
+        # consumer method
+        self._send(_KIND_EVENT, event)
+
+    def send_batch(self, events: List[BaseEvent]) -> None:
+        # consumer method
+        if events:
+            self._send(_KIND_EVENTS, list(events))
+
+    def wait_incoming(self, timeout: float) -> None:
+        # consumer method
+        if not self.stop_requested:
+            self._connection.poll(timeout)
+
+    def wake_incoming(self) -> None:
+        pass
+
+    def send_ready(self, consumed_event_types) -> None:
+        self._send(_KIND_READY, consumed_event_types)
+
+    def send_consumed_event_types(self, consumed_event_types) -> None:
+        self._send(_KIND_EVENT_TYPES, consumed_event_types)
+
+    def send_stopped(self) -> None:
+        self._send(_KIND_STOPPED)
+
+
+class ProcessEventExchange(_PipeSender):
+    """
+    Manager side of EventExchange for plugin in worker process, events from worker are read by separate thread.
+    Events to worker are put to queue (with overflow policy of exchange settings, see plugins._queues)
+    and sent by sender thread: slow worker does not block routing of manager
+    """
+
+    send_batch_size = 100
+
+    def __init__(self, connection, outgoing_wakeup: threading.Event = None, exchange_settings: dict = None):
+        super().__init__(connection)
+
+        exchange_settings = exchange_settings or {}
+        self.incoming_message_queue = build_event_queue(**exchange_settings)
+        self.outgoing_message_queue = build_event_queue(**exchange_settings)
+        self.outgoing_wakeup = outgoing_wakeup
+
+        self.consumed_event_types = None
+        self.on_consumed_event_types_changed: Optional[Callable[[], None]] = None
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+        self._stop_requested = threading.Event()
+        self._reader = threading.Thread(target=self._read_worker_messages, daemon=True)
+        self._sender = threading.Thread(target=self._send_worker_messages, daemon=True)
+
+    def start(self) -> None:
+        self._reader.start()
+        self._sender.start()
+
+    def put(self, event: BaseEvent, timeout=None):
+        # to exchange
+        if self.stopped.is_set():
+            logger.debug('Worker stopped, event %s dropped', event)
+            return
+        self.incoming_message_queue.put(event, block=False)
+
+    def put_batch(self, events: List[BaseEvent]) -> None:
+        # to exchange
+        if self.stopped.is_set():
+            logger.debug('Worker stopped, %s events dropped', len(events))
+            return
+        put_batch(self.incoming_message_queue, events)
+
+    def get(self, timeout=None):
+        # from exchange
+        return self.outgoing_message_queue.get(block=False)
+
+    def get_batch(self, max_n: int) -> List[BaseEvent]:
+        # from exchange
+        return get_batch(self.outgoing_message_queue, max_n)
+
+    def send_stop(self) -> None:
+        # stop is sent by sender thread after queued events
+        self._stop_requested.set()
+
+    def _send_worker_messages(self) -> None:
+        while True:
+            try:
+                events = [self.incoming_message_queue.get(timeout=POLL_TIMEOUT)]
+            except Empty:
+                if self._stop_requested.is_set():
+                    break
+                continue
+
+            events.extend(get_batch(self.incoming_message_queue, self.send_batch_size - 1))
+            try:
+                self._send(_KIND_EVENTS, events)
+            except OSError:
+                logger.error('Worker pipe closed, %s events dropped', len(events))
+                return
+
+        try:
+            self._send(_KIND_STOP)
+        except OSError:
+            logger.warning('Worker pipe closed before stop')
+
+    def _read_worker_messages(self) -> None:
+        while True:
+            try:
+                kind, obj = _loads(self._connection.recv_bytes())
+            except (EOFError, OSError):
+                logger.error('Worker pipe closed')
+                break
+
+            if kind in (_KIND_EVENT, _KIND_EVENTS):
+                put_batch(self.outgoing_message_queue, obj if kind == _KIND_EVENTS else (obj,))
+                if self.outgoing_wakeup is not None:
+                    self.outgoing_wakeup.set()
+            elif kind == _KIND_READY:
+                self.consumed_event_types = obj
+                self.ready.set()
+            elif kind == _KIND_EVENT_TYPES:
+                self.consumed_event_types = obj
+                if self.on_consumed_event_types_changed is not None:
+                    self.on_consumed_event_types_changed()
+            elif kind == _KIND_STOPPED:
+                break
+
+        self.stopped.set()
+        # unblock start() if worker failed on init
+        self.ready.set()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'incoming': EventExchange._queue_stats(self.incoming_message_queue),
+            'outgoing': EventExchange._queue_stats(self.outgoing_message_queue),
+        }
+
+    def __repr__(self):
+        return (
+            f'{self.__class__.__name__} '
+            f'[{self.incoming_message_queue.qsize()} / '
+            f'{self.outgoing_message_queue.qsize()}]'
+        )
+
+
+def _run_plugin_process(plugin_class: Type[BaseEventPlugin], settings, connection) -> None:
+    # manager process handle KeyboardInterrupt and stop worker
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    event_exchange = PipeEventExchange(connection)
+    plugin = plugin_class(event_exchange=event_exchange, settings=settings)
+    event_exchange.send_ready(plugin.consumed_event_types)
+    plugin.on_consumed_event_types_changed = lambda: event_exchange.send_consumed_event_types(
+        plugin.consumed_event_types
+    )
+
+    # plugin thread is not started, plugin runs in process main thread
+    while plugin.is_running and not event_exchange.stop_requested:
+        plugin.run_tick()
+        plugin._wait_next_tick()
+
+    plugin.stop()
+    event_exchange.send_stopped()
+    connection.close()
+
+
+class ProcessPlugin:
+    """
+    Run plugin in worker process, manager side proxy of it.
+    Plugin created in worker on start(), start waits for it ready.
+    Worker is spawned, not forked: manager threads can hold logging and queue locks at fork,
+    so plugin class and settings must be picklable
+    """
+
+    def __init__(
+        self,
+        plugin_class: Type[BaseEventPlugin],
+        settings=None,
+        outgoing_wakeup: threading.Event = None,
+        timeout: float = 10,
+        exchange_settings: dict = None,
+    ):
+        self.plugin_class = plugin_class
+        self.timeout = timeout
+
+        context = multiprocessing.get_context('spawn')
+        manager_connection, self._worker_connection = context.Pipe()
+        self.event_exchange = ProcessEventExchange(
+            manager_connection, outgoing_wakeup=outgoing_wakeup, exchange_settings=exchange_settings
+        )
+        self._process = context.Process(
+            target=_run_plugin_process,
+            args=(plugin_class, settings, self._worker_connection),
+            name=plugin_class.__name__,
+            daemon=True,
+        )
+
+    @property
+    def consumed_event_types(self) -> Optional[FrozenSet[Type[BaseEvent]]]:
+        return self.event_exchange.consumed_event_types
+
+    @property
+    def on_consumed_event_types_changed(self) -> Optional[Callable[[], None]]:
+        return self.event_exchange.on_consumed_event_types_changed
+
+    @on_consumed_event_types_changed.setter
+    def on_consumed_event_types_changed(self, callback: Optional[Callable[[], None]]) -> None:
+        self.event_exchange.on_consumed_event_types_changed = callback
+
+    def start(self) -> None:
+        self._process.start()
+        # worker end used only by worker, else pipe is not closed on worker exit
+        self._worker_connection.close()
+        self.event_exchange.start()
+
+        if not self.event_exchange.ready.wait(self.timeout) or self.event_exchange.stopped.is_set():
+            raise RuntimeError(f'Plugin {self} not started in worker process')
+
+    def stop(self) -> None:
+        logger.info('Stoping plugin %s', self)
+        self.event_exchange.send_stop()
+
+        if not self.event_exchange.stopped.wait(self.timeout):
+            logger.error('Plugin %s not stopped in %s seconds, terminate it', self, self.timeout)
+            self._process.terminate()
+        self._process.join(self.timeout)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}[{self.plugin_class.__name__}, pid {self._process.pid}]>'
@@ -0,0 +1,189 @@
+import logging
+import time
+from collections import deque
+from queue import Full, Queue
+from typing import Iterable, List
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+OVERFLOW_COALESCE = 'coalesce'
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE)
+
+
+class BoundedEventQueue(Queue):
+    """
+    Event queue with limited capacity (maxsize) and overflow policy:
+        block - producer wait free place up to put_timeout, after it event is dropped and raise queue.Full,
+            put_batch waits up to put_timeout for whole batch, all not placed events are dropped
+        drop_oldest - drop oldest event for free place
+        coalesce - keep only newest event with same coalesce key (event.coalesce_key), drop oldest if still full
+
+    put ignore block/timeout arguments, waiting is defined by policy.
+    dropped/coalesced - counters for detect slow consumer
+    """
+
+    def __init__(self, maxsize: int = 0, overflow: str = OVERFLOW_BLOCK, put_timeout: float = None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'Unknown overflow policy "{overflow}", expected one of {OVERFLOW_POLICIES}')
+
+        self.overflow = overflow
+        self.put_timeout = put_timeout
+        self._is_coalesce = overflow == OVERFLOW_COALESCE
+
+        self.dropped = 0
+        self.coalesced = 0
+
+        super().__init__(maxsize)
+
+    def put(self, item, block=True, timeout=None):
+        if self.overflow == OVERFLOW_BLOCK:
+            try:
+                return super().put(item, block=True, timeout=self.put_timeout)
+            except Full:
+                with self.mutex:
+                    self.dropped += 1
+                raise
+
+        with self.not_full:
+            self._put_with_policy(item)
+            self.not_empty.notify()
+
+    def put_batch(self, items: Iterable) -> None:
+        if self.overflow == OVERFLOW_BLOCK:
+            return self._put_batch_blocking(items)
+
+        with self.not_full:
+            count = 0
+            for item in items:
+                self._put_with_policy(item)
+                count += 1
+            self.not_empty.notify(count)
+
+    def _put_batch_blocking(self, items: Iterable) -> None:
+        deadline = None if self.put_timeout is None else time.monotonic() + self.put_timeout
+        dropped = 0
+        with self.not_full:
+            for item in items:
+                while 0 < self.maxsize <= self._qsize():
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self.not_full.wait(remaining)
+                else:
+                    self._put(item)
+                    self.unfinished_tasks += 1
+                    self.not_empty.notify()
+                    continue
+
+                dropped += 1
+            self.dropped += dropped
+
+        if dropped:
+            raise Full
+
+    def _put_with_policy(self, item) -> None:
+        # called under mutex
+        if self._is_coalesce and self._replace_same_key(item):
+            return
+
+        if 0 < self.maxsize <= self._qsize():
+            self._get()
+            self.unfinished_tasks -= 1
+            self.dropped += 1
+
+        self._put(item)
+        self.unfinished_tasks += 1
+
+    @property
+    def stats(self) -> dict:
+        with self.mutex:
+            return {'size': self._qsize(), 'dropped': self.dropped, 'coalesced': self.coalesced}
+
+    @staticmethod
+    def _coalesce_key(item):
+        key = getattr(item, 'coalesce_key', None)
+        if key is None:
+            return None
+        return type(item), key
+
+    def _replace_same_key(self, item) -> bool:
+        key = self._coalesce_key(item)
+        slot = self._slots_by_key.get(key) if key is not None else None
+        if slot is None:
+            return False
+
+        slot[0] = item
+        self.coalesced += 1
+        return True
+
+    # queue.Queue storage methods, called under mutex
+
+    def _init(self, maxsize):
+        self.queue = deque()
+        self._slots_by_key = dict()
+
+    def _qsize(self):
+        return len(self.queue)
+
+    def _put(self, item):
+        if not self._is_coalesce:
+            self.queue.append(item)
+            return
+
+        key = self._coalesce_key(item)
+        slot = [item, key]
+        self.queue.append(slot)
+        if key is not None:
+            self._slots_by_key[key] = slot
+
+    def _get(self):
+        if not self._is_coalesce:
+            return self.queue.popleft()
+
+        item, key = slot = self.queue.popleft()
+        if key is not None and self._slots_by_key.get(key) is slot:
+            del self._slots_by_key[key]
+        return item
+
+
+def build_event_queue(capacity: int = 0, overflow: str = OVERFLOW_BLOCK, put_timeout: float = 1) -> Queue:
+    if not capacity and overflow == OVERFLOW_BLOCK:
+        return Queue()
+    return BoundedEventQueue(maxsize=capacity, overflow=overflow, put_timeout=put_timeout)
+
+
+def get_batch(message_queue: Queue, max_n: int) -> List:
+    """
+    non blocking get up to max_n items, with one lock acquire
+    """
+    with message_queue.mutex:
+        count = min(max_n, message_queue._qsize())
+        items = [message_queue._get() for _ in range(count)]
+        if count:
+            message_queue.not_full.notify(count)
+    return items
+
+
+def put_batch(message_queue: Queue, items: Iterable) -> None:
+    """
+    non blocking put items, with one lock acquire for unbounded queue
+    """
+    queue_put_batch = getattr(message_queue, 'put_batch', None)
+    if queue_put_batch is not None:
+        return queue_put_batch(items)
+
+    if message_queue.maxsize > 0:
+        for item in items:
+            message_queue.put(item, block=False)
+        return
+
+    with message_queue.mutex:
+        count = 0
+        for item in items:
+            message_queue._put(item)
+            count += 1
+        message_queue.unfinished_tasks += count
+        if count:
+            message_queue.not_empty.notify(count)
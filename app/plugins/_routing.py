@@ -0,0 +1,43 @@
+from typing import Dict, Iterable, Tuple, Type
+
+from messages import BaseEvent
+
+
+class EventSubscriptions:
+    """
+    index event type -> plugins, which consume it (have handler for the type or any of its base types)
+    plugin without consumed_event_types receive all events
+
+    index built lazy for every event type, it is invalidated by plugin on_consumed_event_types_changed callback,
+    when plugin adds handler after start (from own thread), call invalidate() for other changes
+    """
+
+    def __init__(self, plugins: Iterable):
+        self._plugins = list(plugins)
+        self._subscribers_by_event_type: Dict[Type[BaseEvent], Tuple] = dict()
+
+        for plugin in self._plugins:
+            if hasattr(plugin, 'on_consumed_event_types_changed'):
+                plugin.on_consumed_event_types_changed = self.invalidate
+
+    def subscribers(self, event_type: Type[BaseEvent]) -> Tuple:
+        subscribers_by_event_type = self._subscribers_by_event_type
+        try:
+            return subscribers_by_event_type[event_type]
+        except KeyError:
+            pass
+
+        subscribers = tuple(p for p in self._plugins if self._is_consume(p, event_type))
+        subscribers_by_event_type[event_type] = subscribers
+        return subscribers
+
+    def invalidate(self) -> None:
+        # new dict, not clear: subscribers of old types, read concurrently, are stored to dropped dict
+        self._subscribers_by_event_type = dict()
+
+    @staticmethod
+    def _is_consume(plugin, event_type: Type[BaseEvent]) -> bool:
+        consumed_event_types = getattr(plugin, 'consumed_event_types', None)
+        if consumed_event_types is None:
+            return True
+        return any(t in consumed_event_types for t in event_type.__mro__)
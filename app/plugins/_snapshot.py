@@ -0,0 +1,91 @@
+import logging
+import math
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import Dict, Optional
+
+from devices import DeviceState
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b'HDS1'
+# magic, crc32 of records, write time, records count
+_FILE_HEADER = struct.Struct('<4sIdI')
+# name length, turned on, last sensor value, last sensor time, last dependencies turned on time (nan - None)
+_RECORD = struct.Struct('<H?ddd')
+
+
+def _to_float(value: Optional[float]) -> float:
+    return math.nan if value is None else value
+
+
+def _from_float(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+class DeviceStateSnapshot:
+    """
+    Device states by device name in binary file, written as new file and atomic replace
+    (file is whole old or whole new snapshot), read by mmap and checked by crc32
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, states: Dict[str, DeviceState], now: float = None) -> None:
+        records = bytearray()
+        for name, state in states.items():
+            name_bytes = name.encode()
+            records += _RECORD.pack(
+                len(name_bytes),
+                state.turned_on,
+                _to_float(state.last_sensor_value),
+                _to_float(state.last_sensor_time),
+                _to_float(state.last_dependencies_turned_on_time),
+            )
+            records += name_bytes
+
+        header = _FILE_HEADER.pack(_MAGIC, zlib.crc32(records), time.time() if now is None else now, len(states))
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            f.write(records)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def read(self, max_age: float = None) -> Dict[str, DeviceState]:
+        # empty, if snapshot not found, broken or older than max_age seconds
+        try:
+            with open(self.path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size < _FILE_HEADER.size:
+                    logger.warning('Snapshot %s is broken', self.path)
+                    return {}
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                    return self._read_states(buffer, max_age)
+        except FileNotFoundError:
+            return {}
+
+    def _read_states(self, buffer: mmap.mmap, max_age: Optional[float]) -> Dict[str, DeviceState]:
+        magic, crc, written_at, count = _FILE_HEADER.unpack_from(buffer)
+        if magic != _MAGIC or zlib.crc32(buffer[_FILE_HEADER.size :]) != crc:
+            logger.warning('Snapshot %s is broken', self.path)
+            return {}
+        if max_age is not None and time.time() - written_at > max_age:
+            logger.info('Snapshot %s is older than %s seconds, not used', self.path, max_age)
+            return {}
+
+        states = dict()
+        offset = _FILE_HEADER.size
+        for _ in range(count):
+            name_length, turned_on, value, sensor_time, dependencies_time = _RECORD.unpack_from(buffer, offset)
+            offset += _RECORD.size
+            name = buffer[offset : offset + name_length].decode()
+            offset += name_length
+            states[name] = DeviceState(
+                turned_on, _from_float(value), _from_float(sensor_time), _from_float(dependencies_time)
+            )
+        return states
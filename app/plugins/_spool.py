@@ -0,0 +1,141 @@
+import logging
+import mmap
+import os
+import struct
+import zlib
+from typing import Dict, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b'HSP1'
+# magic, generation
+_FILE_HEADER = struct.Struct('<4sI')
+# crc32 of rest record, generation, topic length, payload length
+_RECORD_HEADER = struct.Struct('<IIHI')
+
+
+class MessageSpool:
+    """
+    Append-only memory mapped file of (topic, payload) messages, bounded by file size.
+
+    Records are appended sequentially and written to disk by flush (msync), so caller batches disk writes.
+    Every record has crc32 and generation of file: on open records are read up to first broken record,
+    clear() only increases generation in file header, old records are not rewritten.
+    When file is full, it is compacted to last message of every topic (by new file and atomic replace)
+    """
+
+    def __init__(self, path: str, size: int = 64 * 1024):
+        self.path = path
+        self.size = size
+        self.dropped = 0
+
+        self._open()
+
+    def _open(self) -> None:
+        with open(self.path, 'a+b') as f:
+            if os.fstat(f.fileno()).st_size < self.size:
+                f.truncate(self.size)
+            self._mmap = mmap.mmap(f.fileno(), 0)
+
+        magic, self._generation = _FILE_HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC:
+            self._generation = 0
+            _FILE_HEADER.pack_into(self._mmap, 0, _MAGIC, self._generation)
+
+        self._offset = _FILE_HEADER.size
+        self._count = 0
+        for _ in self._read_records():
+            self._count += 1
+        self._is_dirty = False
+
+    def _read_records(self) -> Iterator[Tuple[str, str]]:
+        # moves self._offset to end of valid records
+        self._offset = offset = _FILE_HEADER.size
+        buffer = self._mmap
+        while offset + _RECORD_HEADER.size <= len(buffer):
+            crc, generation, topic_length, payload_length = _RECORD_HEADER.unpack_from(buffer, offset)
+            end = offset + _RECORD_HEADER.size + topic_length + payload_length
+            if generation != self._generation or end > len(buffer):
+                return
+            if zlib.crc32(buffer[offset + 4 : end]) != crc:
+                return
+
+            data_start = offset + _RECORD_HEADER.size
+            topic = buffer[data_start : data_start + topic_length].decode()
+            payload = buffer[data_start + topic_length : end].decode()
+            self._offset = offset = end
+            yield topic, payload
+
+    def _encode_record(self, topic: str, payload: str) -> bytes:
+        topic_bytes, payload_bytes = topic.encode(), payload.encode()
+        body = (
+            _RECORD_HEADER.pack(0, self._generation, len(topic_bytes), len(payload_bytes))[4:]
+            + topic_bytes
+            + payload_bytes
+        )
+        return struct.pack('<I', zlib.crc32(body)) + body
+
+    def append(self, topic: str, payload: str) -> bool:
+        # returns False, if message dropped: file is full even after compact
+        record = self._encode_record(topic, payload)
+        if self._offset + len(record) > len(self._mmap):
+            self.compact()
+            if self._offset + len(record) > len(self._mmap):
+                logger.warning('Spool %s is full, message to topic "%s" dropped', self.path, topic)
+                self.dropped += 1
+                return False
+
+        self._mmap[self._offset : self._offset + len(record)] = record
+        self._offset += len(record)
+        self._count += 1
+        self._is_dirty = True
+        return True
+
+    def messages(self) -> Dict[str, str]:
+        # last payload of every topic, in order of last append
+        messages = dict()
+        for topic, payload in self._read_records():
+            messages.pop(topic, None)
+            messages[topic] = payload
+        return messages
+
+    def compact(self) -> None:
+        messages = self.messages()
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_FILE_HEADER.pack(_MAGIC, self._generation))
+            for topic, payload in messages.items():
+                f.write(self._encode_record(topic, payload))
+            f.truncate(max(self.size, f.tell()))
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._mmap.close()
+        os.replace(tmp_path, self.path)
+        self._open()
+        logger.info('Spool %s compacted to %s messages', self.path, self._count)
+
+    def clear(self) -> None:
+        # written to disk at once: replayed messages must not be replayed again after restart
+        self._generation = (self._generation + 1) & 0xFFFFFFFF
+        _FILE_HEADER.pack_into(self._mmap, 0, _MAGIC, self._generation)
+        self._offset = _FILE_HEADER.size
+        self._count = 0
+        self._is_dirty = True
+        self.flush()
+
+    def flush(self) -> None:
+        if self._is_dirty:
+            self._mmap.flush()
+            self._is_dirty = False
+
+    def close(self) -> None:
+        self.flush()
+        self._mmap.close()
+
+    def __len__(self):
+        # count of records, not topics
+        return self._count
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}[{self.path}, {self._count} records, {self._offset}/{len(self._mmap)}]>'
@@ -0,0 +1,72 @@
+from typing import Dict, List, Set, Tuple
+
+
+class SubscriptionRegistry:
+    """
+    Mqtt topic filters subscribed by all plugins, reference counted: broker subscription is needed
+    only on first subscribe of topic (or with greater qos) and unsubscribe only on last unsubscribe.
+    Changes are collected until pop_changes, for send them in one SUBSCRIBE and one UNSUBSCRIBE packet.
+    Topics of popped subscribe changes are subscribed by broker, they are unsubscribed on last remove
+    even if greater qos subscribe of topic is still pending
+    """
+
+    def __init__(self):
+        self._ref_counts: Dict[str, int] = dict()
+        self._qos: Dict[str, int] = dict()
+        self._broker_subscribed: Set[str] = set()
+
+        self._need_subscribe: Dict[str, int] = dict()
+        self._need_unsubscribe: Dict[str, None] = dict()  # ordered set
+
+    def add(self, topic: str, qos: int = 0) -> bool:
+        # returns True, if broker subscription is needed
+        ref_count = self._ref_counts.get(topic, 0)
+        self._ref_counts[topic] = ref_count + 1
+        if ref_count and qos <= self._qos[topic]:
+            return False
+
+        self._qos[topic] = qos
+        self._need_subscribe[topic] = qos
+        self._need_unsubscribe.pop(topic, None)
+        return True
+
+    def remove(self, topic: str) -> bool:
+        # returns True on last remove of topic
+        ref_count = self._ref_counts.get(topic, 0)
+        if ref_count > 1:
+            self._ref_counts[topic] = ref_count - 1
+            return False
+        if not ref_count:
+            return False
+
+        del self._ref_counts[topic]
+        del self._qos[topic]
+        self._need_subscribe.pop(topic, None)
+        if topic in self._broker_subscribed:
+            self._need_unsubscribe[topic] = None
+        return True
+
+    def pop_changes(self) -> Tuple[List[Tuple[str, int]], List[str]]:
+        # topics with qos to subscribe, topics to unsubscribe
+        need_subscribe, self._need_subscribe = self._need_subscribe, dict()
+        need_unsubscribe, self._need_unsubscribe = self._need_unsubscribe, dict()
+        self._broker_subscribed.update(need_subscribe)
+        self._broker_subscribed.difference_update(need_unsubscribe)
+        return list(need_subscribe.items()), list(need_unsubscribe)
+
+    def pop_all_topics(self) -> List[Tuple[str, int]]:
+        # all topics with qos, for subscribe on connect: broker has no subscriptions, pending changes are dropped
+        self._need_subscribe.clear()
+        self._need_unsubscribe.clear()
+        self._broker_subscribed = set(self._qos)
+        return self.topics()
+
+    def topics(self) -> List[Tuple[str, int]]:
+        # all topics with qos, for subscribe on connect
+        return list(self._qos.items())
+
+    def __contains__(self, topic: str) -> bool:
+        return topic in self._ref_counts
+
+    def __len__(self):
+        return len(self._ref_counts)
@@ -0,0 +1,63 @@
+import heapq
+import itertools
+import time
+from typing import Callable, List, Optional
+
+
+class Timer:
+    __slots__ = ('deadline', 'callback', 'args', 'cancelled')
+
+    def __init__(self, deadline: float, callback: Callable, args: tuple):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        # timer stays in heap, it is skipped when due
+        self.cancelled = True
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}[{self.callback}, at {self.deadline}]>'
+
+
+class TimerHeap:
+    """
+    Plugin timers ordered by deadline (time.monotonic), not thread safe: used only by plugin thread.
+    Push and pop are O(log n), cancel is O(1): cancelled timer is dropped when it reaches heap top
+    """
+
+    def __init__(self, clock: Callable[[], float] = None):
+        self.clock = clock or time.monotonic
+
+        self._heap = []
+        self._counter = itertools.count()  # same deadlines are popped in push order
+
+    def call_at(self, deadline: float, callback: Callable, *args) -> Timer:
+        timer = Timer(deadline, callback, args)
+        heapq.heappush(self._heap, (deadline, next(self._counter), timer))
+        return timer
+
+    def call_later(self, delay: float, callback: Callable, *args) -> Timer:
+        return self.call_at(self.clock() + delay, callback, *args)
+
+    def next_deadline(self) -> Optional[float]:
+        heap = self._heap
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_due(self, now: float = None) -> List[Timer]:
+        if now is None:
+            now = self.clock()
+
+        heap = self._heap
+        due_timers = []
+        while heap and heap[0][0] <= now:
+            timer = heapq.heappop(heap)[2]
+            if not timer.cancelled:
+                due_timers.append(timer)
+        return due_timers
+
+    def __len__(self):
+        return len(self._heap)
@@ -0,0 +1,101 @@
+from typing import Any, Dict, List
+
+SEPARATOR = '/'
+SINGLE_LEVEL_WILDCARD = '+'
+MULTI_LEVEL_WILDCARD = '#'
+
+
+class _Node:
+    __slots__ = ('children', 'values')
+
+    def __init__(self):
+        self.children: Dict[str, '_Node'] = dict()
+        self.values: List[Any] = []
+
+
+def validate_topic_filter(topic_filter: str) -> None:
+    levels = topic_filter.split(SEPARATOR)
+    for i, level in enumerate(levels):
+        if MULTI_LEVEL_WILDCARD in level and (level != MULTI_LEVEL_WILDCARD or i != len(levels) - 1):
+            raise ValueError(f'Invalid topic filter "{topic_filter}": "#" must be last level')
+        if SINGLE_LEVEL_WILDCARD in level and level != SINGLE_LEVEL_WILDCARD:
+            raise ValueError(f'Invalid topic filter "{topic_filter}": "+" must occupy entire level')
+
+
+class TopicTrie:
+    """
+    MQTT topic filters (with + and # wildcards) -> values.
+    Match topic walks trie level by level, time is proportional to topic depth, not to filters count.
+    Wildcards on first level do not match topics started with "$" (as broker does)
+    """
+
+    def __init__(self):
+        self._root = _Node()
+
+    def add(self, topic_filter: str, value) -> bool:
+        # returns True, if topic filter added first time
+        validate_topic_filter(topic_filter)
+
+        node = self._root
+        for level in topic_filter.split(SEPARATOR):
+            node = node.children.setdefault(level, _Node())
+
+        is_new = not node.values
+        node.values.append(value)
+        return is_new
+
+    def remove(self, topic_filter: str, value) -> bool:
+        # returns True, if it was last value of topic filter
+        path = [self._root]
+        for level in topic_filter.split(SEPARATOR):
+            node = path[-1].children.get(level)
+            if node is None:
+                raise KeyError(topic_filter)
+            path.append(node)
+
+        path[-1].values.remove(value)
+        if path[-1].values:
+            return False
+
+        # drop empty branch
+        for level, node, parent in zip(reversed(topic_filter.split(SEPARATOR)), reversed(path), reversed(path[:-1])):
+            if node.values or node.children:
+                break
+            del parent.children[level]
+        return True
+
+    def match(self, topic: str) -> List:
+        result = []
+        nodes = [self._root]
+
+        for i, level in enumerate(topic.split(SEPARATOR)):
+            is_wildcard_allowed = i > 0 or not level.startswith('$')
+            next_nodes = []
+
+            for node in nodes:
+                children = node.children
+                if is_wildcard_allowed:
+                    multi_level = children.get(MULTI_LEVEL_WILDCARD)
+                    if multi_level is not None:
+                        result.extend(multi_level.values)
+
+                    single_level = children.get(SINGLE_LEVEL_WILDCARD)
+                    if single_level is not None:
+                        next_nodes.append(single_level)
+
+                child = children.get(level)
+                if child is not None:
+                    next_nodes.append(child)
+
+            nodes = next_nodes
+            if not nodes:
+                return result
+
+        for node in nodes:
+            result.extend(node.values)
+            # "a/#" matches "a" too
+            multi_level = node.children.get(MULTI_LEVEL_WILDCARD)
+            if multi_level is not None:
+                result.extend(multi_level.values)
+
+        return result
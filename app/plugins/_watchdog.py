@@ -0,0 +1,56 @@
+import logging
+from typing import Callable, Dict, Set
+
+from ._timers import TimerHeap
+
+logger = logging.getLogger(__name__)
+
+
+class SensorWatchdog:
+    """
+    Sensor is stale, if it is silent for timeout seconds. Every sensor has one timer in plugin TimerHeap,
+    feed only saves reading time: on timer deadline sensor is stale or timer is moved to last reading + timeout.
+    So reading is O(1), stale sensor is found not later than timeout after last reading, without scan of sensors.
+    Callbacks are called with sensor topic, on_recovered - on first reading of stale sensor
+    """
+
+    def __init__(
+        self,
+        timers: TimerHeap,
+        timeout: float,
+        on_stale: Callable[[str], None],
+        on_recovered: Callable[[str], None],
+    ):
+        self.timers = timers
+        self.timeout = timeout
+        self.on_stale = on_stale
+        self.on_recovered = on_recovered
+
+        self._last_seen: Dict[str, float] = dict()
+        self.stale: Set[str] = set()
+
+    def watch(self, topic: str) -> None:
+        # sensor must send first reading in timeout after watch start
+        if topic in self._last_seen:
+            return
+        self._last_seen[topic] = self.timers.clock()
+        self.timers.call_at(self._last_seen[topic] + self.timeout, self._check, topic)
+
+    def feed(self, topic: str) -> None:
+        self._last_seen[topic] = self.timers.clock()
+        if topic in self.stale:
+            self.stale.discard(topic)
+            self.timers.call_at(self._last_seen[topic] + self.timeout, self._check, topic)
+            logger.info('Sensor %s recovered', topic)
+            self.on_recovered(topic)
+
+    def _check(self, topic: str) -> None:
+        deadline = self._last_seen[topic] + self.timeout
+        if deadline > self.timers.clock():
+            self.timers.call_at(deadline, self._check, topic)
+            return
+
+        # timer is set again by feed
+        self.stale.add(topic)
+        logger.warning('Sensor %s is silent for %s seconds', topic, self.timeout)
+        self.on_stale(topic)
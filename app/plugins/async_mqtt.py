@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import socket
+from typing import Optional
+
+import messages
+import paho.mqtt.client
+
+from ._async_base import AsyncBaseEventPlugin
+from ._codecs import PayloadDecoders
+from ._subscriptions import SubscriptionRegistry
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE = 10
+CONNECT_TIMEOUT = 10
+
+
+class _LoopConnectedClient(paho.mqtt.client.Client):
+    """
+    paho client taking tcp connection established by event loop (connected_socket),
+    instead of blocking connect in reconnect
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connected_socket: Optional[socket.socket] = None
+
+    def _create_socket_connection(self):
+        sock, self.connected_socket = self.connected_socket, None
+        if sock is None:
+            return super()._create_socket_connection()
+        return sock
+
+    def keepalive_delay(self) -> float:
+        # seconds to next loop_misc work: ping send or ping response check
+        with self._msgtime_mutex:
+            last_message_time = min(self._last_msg_in, self._last_msg_out)
+        return max(0.0, last_message_time + self._keepalive - paho.mqtt.client.time_func())
+
+
+class AsyncMqttPlugin(AsyncBaseEventPlugin):
+    """
+    MqttPlugin for asyncio runtime: paho socket is served by event loop readers/writers,
+    messages are published as soon as event handled, without polling loop.
+    Connect is lazy, not blocks event loop and retried every reconnect_timeout seconds (plugin setting),
+    keepalive ping is sent by keepalive deadline
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self._subscriptions = SubscriptionRegistry()
+        self._payload_decoders = PayloadDecoders()
+        self.add_event_handler(messages.events.MqttSubscribe, self._subscribe_event_handler)
+        self.add_event_handler(messages.events.MqttUnsubscribe, self._unsubscribe_event_handler)
+
+        self._need_send_messages = []
+        self.add_event_handler(messages.events.MqttMessageSend, self._send_message_event_handler)
+
+        self.mqtt_client = _LoopConnectedClient()
+        self.mqtt_client.on_connect = self.on_connect_callback
+        self.mqtt_client.on_disconnect = self.on_disconnect_callback
+        self.mqtt_client.on_message = self.on_message_receive
+        self.mqtt_client.on_socket_open = self.on_socket_open
+        self.mqtt_client.on_socket_close = self.on_socket_close
+        self.mqtt_client.on_socket_register_write = self.on_socket_register_write
+        self.mqtt_client.on_socket_unregister_write = self.on_socket_unregister_write
+
+        self._client_connected = False
+        self._connection_lost = asyncio.Event()
+        self._reconnect_timeout = self.settings.get('reconnect_timeout', 10)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._connection_task: Optional[asyncio.Task] = None
+
+    def _subscribe_event_handler(self, event: messages.events.MqttSubscribe):
+        if event.codec is not None:
+            self._payload_decoders.add(event.topic, event.codec)
+
+        if self._subscriptions.add(event.topic, event.qos) and self._client_connected:
+            self._loop.call_soon(self.client_subscribe)
+
+    def _unsubscribe_event_handler(self, event: messages.events.MqttUnsubscribe):
+        if not self._subscriptions.remove(event.topic):
+            return
+
+        self._payload_decoders.remove(event.topic)
+        if self._client_connected:
+            self._loop.call_soon(self.client_subscribe)
+
+    def _send_message_event_handler(self, event: messages.events.MqttMessageSend):
+        self._need_send_messages.append((event.topic, event.payload))
+        if self._client_connected:
+            self.send_messages()
+
+    def start(self) -> None:
+        super().start()
+
+        self._loop = asyncio.get_running_loop()
+        self._connection_task = self._loop.create_task(self._keep_connection())
+
+    async def _keep_connection(self):
+        while self.is_running:
+            try:
+                await self._connect()
+            except OSError as err:
+                logger.warning('Mqtt client not connected: %s', err)
+                await asyncio.sleep(self._reconnect_timeout)
+                continue
+
+            # keepalive pings by deadline, returns error when connection lost
+            self._connection_lost.clear()
+            while self.mqtt_client.loop_misc() == paho.mqtt.client.MQTT_ERR_SUCCESS:
+                try:
+                    await asyncio.wait_for(self._connection_lost.wait(), self.mqtt_client.keepalive_delay())
+                except asyncio.TimeoutError:
+                    pass
+
+            await asyncio.sleep(self._reconnect_timeout)
+
+    async def _connect(self):
+        host, port = self.settings['mqtt_host'], self.settings.get('mqtt_port', 1883)
+        family, sock_type, proto, _, address = (await self._loop.getaddrinfo(host, port, type=socket.SOCK_STREAM))[0]
+
+        sock = socket.socket(family, sock_type, proto)
+        sock.setblocking(False)
+        try:
+            await asyncio.wait_for(self._loop.sock_connect(sock, address), CONNECT_TIMEOUT)
+        except (OSError, asyncio.TimeoutError):
+            sock.close()
+            raise
+
+        self.mqtt_client.connect_async(host, port, keepalive=KEEPALIVE)
+        self.mqtt_client.connected_socket = sock
+        # CONNECT packet is written by loop writer
+        self.mqtt_client.reconnect()
+
+    def on_socket_open(self, client, userdata, sock):
+        self._loop.add_reader(sock, client.loop_read)
+
+    def on_socket_close(self, client, userdata, sock):
+        self._loop.remove_reader(sock)
+
+    def on_socket_register_write(self, client, userdata, sock):
+        self._loop.add_writer(sock, client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self._loop.remove_writer(sock)
+
+    def on_connect_callback(self, client, userdata, flags, rc):
+        logger.info('Connected with result code %s', rc)
+        self._client_connected = True
+
+        subscribed_to_topics = self._subscriptions.pop_all_topics()
+        if subscribed_to_topics:
+            logger.info('Subscribe to %s mqtt topics', len(subscribed_to_topics))
+            self.mqtt_client.subscribe(subscribed_to_topics)
+        self.send_messages()
+
+    def on_disconnect_callback(self, client, userdata, rc):
+        logger.error('Mqtt disconnected!')
+        self._client_connected = False
+        self._connection_lost.set()
+
+    def on_message_receive(self, client, userdata, msg):
+        topic, payload = msg.topic, msg.payload
+        logger.debug('Received message %r from topic "%s"', payload, topic)
+        value = self._payload_decoders.decode(topic, payload)
+        self.event_exchange.send_message(messages.events.MqttMessageReceived(topic, payload, value))
+
+    def client_subscribe(self):
+        # subscription changes of handled events batch in one packet
+        need_subscribe, need_unsubscribe = self._subscriptions.pop_changes()
+        if not self._client_connected:
+            return
+
+        if need_subscribe:
+            logger.info('Subscribe to %s mqtt topics', len(need_subscribe))
+            self.mqtt_client.subscribe(need_subscribe)
+        if need_unsubscribe:
+            logger.info('Unsubscribe from %s mqtt topics', len(need_unsubscribe))
+            self.mqtt_client.unsubscribe(need_unsubscribe)
+
+    def send_messages(self):
+        need_send_messages, self._need_send_messages = self._need_send_messages, []
+        for topic, payload in need_send_messages:
+            logger.info('Send to mqtt topic "%s" message "%s"', topic, payload)
+
+            self.mqtt_client.publish(topic, payload.encode())
+
+    def stop(self) -> None:
+        super().stop()
+
+        if self._connection_task is not None:
+            self._connection_task.cancel()
+        self.mqtt_client.disconnect()
+
+    async def join(self) -> None:
+        await super().join()
+
+        if self._connection_task is None:
+            return
+
+        try:
+            await self._connection_task
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+from queue import Empty
+from typing import List, Type, Union
+
+from plugins import AsyncBaseEventPlugin, AsyncEventExchange
+from plugins._async_base import SyncPluginAdapter
+from plugins._base import BaseEventPlugin
+from plugins._routing import EventSubscriptions
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncPluginRunManager:
+    """
+    Run all plugins as coroutines on one event loop, thread plugins are wrapped to SyncPluginAdapter.
+    Must be created in running event loop.
+
+    plugins order very important: start in forward order, stops in reverse.
+    """
+
+    def __init__(
+        self,
+        plugins: List[Type[Union[AsyncBaseEventPlugin, BaseEventPlugin]]],
+        plugins_settings,
+    ):
+        self._plugins = [self._build_plugin(p, plugins_settings) for p in plugins]
+        self._subscriptions = EventSubscriptions(self._plugins)
+
+        self._routing_tasks: List[asyncio.Task] = []
+        self._stopped = asyncio.Event()
+
+    @property
+    def plugins(self) -> List[Union[AsyncBaseEventPlugin, SyncPluginAdapter]]:
+        return list(self._plugins)
+
+    @staticmethod
+    def _build_plugin(plugin_class, plugins_settings):
+        event_exchange = AsyncEventExchange()
+        if issubclass(plugin_class, AsyncBaseEventPlugin):
+            return plugin_class(event_exchange=event_exchange, settings=plugins_settings)
+        return SyncPluginAdapter(plugin_class, event_exchange=event_exchange, settings=plugins_settings)
+
+    def start(self):
+        # plugins add event handlers on init, rebuild index after it
+        self._subscriptions.invalidate()
+
+        loop = asyncio.get_running_loop()
+        for plugin in self._plugins:
+            plugin.start()
+            self._routing_tasks.append(loop.create_task(self._route_plugin_events(plugin)))
+
+    async def run(self):
+        await self._stopped.wait()
+
+    async def stop(self):
+        for task in self._routing_tasks:
+            task.cancel()
+        self._routing_tasks.clear()
+
+        # WARNING! very important keep this behavior!
+        # first plugin mast bi start earlier and stop
+        for plugin in self._plugins[::-1]:
+            plugin.stop()
+            self.send_out_plugin_events(plugin)
+
+        for plugin in self._plugins[::-1]:
+            await plugin.join()
+
+        self._stopped.set()
+
+    async def _route_plugin_events(self, plugin):
+        while True:
+            event = await plugin.event_exchange.get()
+            self._send_out(plugin, event)
+
+    def send_out_plugin_events(self, plugin):
+        while True:
+            try:
+                event = plugin.event_exchange.get_nowait()
+            except Empty:
+                break
+
+            self._send_out(plugin, event)
+
+    def _send_out(self, plugin, event):
+        for p in self._subscriptions.subscribers(type(event)):
+            if p is plugin:
+                continue
+
+            p.event_exchange.put(event)
@@ -1,139 +1,171 @@
-"""
-todo: add special event on connect and disconnect
-todo: whether it is necessary to save messages for sending while the client is disconnected?
-todo: can work without connect to mqtt on __init__
-"""
-import datetime
 import logging
-import time
+from typing import Dict, List
 
 import messages
-import paho.mqtt.client
 
 from ._base import BaseEventPlugin
+from ._codecs import PayloadDecoders
+from ._mqtt_shards import MqttShard, TopicSharding
 
 logger = logging.getLogger(__name__)
 
 
 class MqttPlugin(BaseEventPlugin):
+    """
+    Mqtt network I/O runs in MqttConnection network threads, plugin thread only handles events:
+    message is published to socket as soon as MqttMessageSend handled,
+    received messages, MqttConnected and MqttDisconnected events are sent out from network thread.
+
+    Connect is lazy, reconnect delay grows from reconnect_min_timeout to reconnect_timeout seconds (plugin settings).
+    Subscriptions of all plugins are reference counted (MqttSubscribe/MqttUnsubscribe), changes of handled events batch
+    are sent in one SUBSCRIBE/UNSUBSCRIBE packet, all subscriptions are restored in one packet on every connect.
+    Messages sent while disconnected are published on connect.
+
+    Outgoing messages are collected for publish_window seconds (plugin setting, 0 - until handled events batch end),
+    only last payload for topic is published and not published if it is equal to last confirmed (on_publish)
+    payload of topic. Saved publishes are counted in publish_stats
+
+    With spool_path setting messages sent while disconnected are stored in file (see MessageSpool)
+    and survive restart, spool is written to disk every spool_flush_interval seconds:
+        spool_path: /var/lib/heating/mqtt.spool
+        spool_size: 65536  # bytes
+        spool_flush_interval: 5
+
+    Plugin can use pool of connections, possibly to different brokers. Subscriptions and publishes are assigned
+    to connection by topic prefix, other topics by topic hash to connections without prefixes (see TopicSharding),
+    so messages of one topic keep order. Connection settings override plugin settings,
+    spool file of connection is spool_path with connection name suffix:
+        connections:
+          - name: boiler_room
+            mqtt_host: 192.168.1.201
+            prefixes: [/devices/boiler/]
+          - name: main
+          - name: main_2
+    Stats of every connection are in connections_stats
+    """
+
     def __init__(self, *args, **kwargs):
+        # plugin has nothing to do by time
+        kwargs.setdefault('tick_timeout', None)
         super().__init__(*args, **kwargs)
 
-        self._subscribed_to_topics = []
-        self._need_subscribe_to = []
-        self.add_event_handler(messages.events.MqttSubscribe, self._subscribe_event_handler)
+        self._publish_window = self.settings.get('publish_window', 0)
+        self._pending_publishes: Dict[str, str] = dict()  # topic -> last payload
+        self._flush_timer = None
+        self._coalesced = 0
 
-        self._need_send_messages = []
-        self.add_event_handler(messages.events.MqttMessageSend, self._send_message_event_handler)
+        self._payload_decoders = PayloadDecoders()
+        self._subscriptions_timer = None
+        self._spool_flush_interval = self.settings.get('spool_flush_interval', 5)
+        self._spool_flush_timer = None
 
-        self.mqtt_client = paho.mqtt.client.Client()
-        self.mqtt_client.on_connect = self.on_connect_callback
-        self.mqtt_client.on_disconnect = self.on_disconnect_callback
-        self.mqtt_client.on_message = self.on_message_receive
-        self.mqtt_client.connect(self.settings['mqtt_host'], keepalive=10)
-        self.mqtt_client.loop()
+        self.add_event_handler(messages.events.MqttSubscribe, self._subscribe_event_handler)
+        self.add_event_handler(messages.events.MqttUnsubscribe, self._unsubscribe_event_handler)
+        self.add_event_handler(messages.events.MqttMessageSend, self._send_message_event_handler)
 
-        self._client_connected = True
-        self._client_last_reconnect_dt = self.get_time()
-        self._reconnect_timeout = datetime.timedelta(seconds=10)
-        self._loop_need_count = 1
+        shards_with_prefixes = [
+            (MqttShard(name, shard_settings, self.event_exchange, self._payload_decoders), prefixes)
+            for name, shard_settings, prefixes in self._connections_settings()
+        ]
+        self.shards: List[MqttShard] = [shard for shard, _ in shards_with_prefixes]
+        self._sharding = TopicSharding(shards_with_prefixes)
+        # network thread works in worker process and asyncio runtime, where plugin thread is not started
+        for shard in self.shards:
+            shard.start()
+
+    def _connections_settings(self):
+        connections = self.settings.get('connections')
+        if not connections:
+            return [('default', self.settings, ())]
+
+        connections_settings = []
+        for i, connection in enumerate(connections):
+            name = connection.get('name', str(i))
+            shard_settings = {**self.settings, **connection}
+            if self.settings.get('spool_path') and 'spool_path' not in connection:
+                shard_settings['spool_path'] = f'{self.settings["spool_path"]}.{name}'
+            connections_settings.append((name, shard_settings, tuple(connection.get('prefixes', ()))))
+        return connections_settings
+
+    @property
+    def publish_stats(self) -> dict:
+        return {
+            'published': sum(shard.published for shard in self.shards),
+            'coalesced': self._coalesced + sum(shard.coalesced for shard in self.shards),
+            'skipped': sum(shard.skipped for shard in self.shards),
+        }
+
+    @property
+    def connections_stats(self) -> Dict[str, dict]:
+        return {shard.name: shard.stats for shard in self.shards}
 
     def _subscribe_event_handler(self, event: messages.events.MqttSubscribe):
-        self._need_subscribe_to.append((event.topic, event.qos))
-
-    def _send_message_event_handler(self, event: messages.events.MqttMessageSend):
-        self._need_send_messages.append((event.topic, event.payload))
-
-    @staticmethod
-    def get_time():
-        return datetime.datetime.utcnow()
+        if event.codec is not None:
+            self._payload_decoders.add(event.topic, event.codec)
 
-    def on_connect_callback(self, client, userdata, flags, rc):
-        logger.info('Connected with result code %s', rc)
-        self._client_connected = True
+        if self._sharding.shard(event.topic).subscribe(event.topic, event.qos):
+            self._schedule_subscriptions_flush()
 
-        self.client_subscribe()
+    def _unsubscribe_event_handler(self, event: messages.events.MqttUnsubscribe):
+        if self._sharding.shard(event.topic).unsubscribe(event.topic):
+            self._payload_decoders.remove(event.topic)
+            self._schedule_subscriptions_flush()
 
-    def on_disconnect_callback(self, client, userdata, rc):
-        logger.error('Mqtt disconnected!')
-        self._client_connected = False
+    def _schedule_subscriptions_flush(self):
+        # after handled events batch
+        if self._subscriptions_timer is None:
+            self._subscriptions_timer = self.call_later(0, self.flush_subscriptions)
 
-        self._need_subscribe_to = self._subscribed_to_topics.copy()
-        self._subscribed_to_topics.clear()
-
-    def on_message_receive(self, client, userdata, msg):
-        topic, payload = msg.topic, msg.payload.decode()
-        logger.info('Received message "%s" from topic "%s"', payload, topic)
-        self.event_exchange.send_message(messages.events.MqttMessageReceived(topic, payload))
-        self._loop_need_count += 1
-
-    def client_subscribe(self):
-        while self._need_subscribe_to:
-            topic_with_param = self._need_subscribe_to.pop(0)
-            logger.info('Subscribe to mqtt topic %s', topic_with_param)
-
-            self.mqtt_client.subscribe(topic_with_param)
-            self._subscribed_to_topics.append(topic_with_param)
-
-    def send_messages(self):
-        while self._need_send_messages:
-            topic, payload = self._need_send_messages.pop(0)
-            logger.info('Send to mqtt topic "%s" message "%s"', topic, payload)
-
-            self.mqtt_client.publish(topic, payload.encode())
-
-    def reconnect(self):
-        if self.get_time() - self._client_last_reconnect_dt < self._reconnect_timeout:
-            return
+    def flush_subscriptions(self):
+        self._subscriptions_timer = None
+        for shard in self.shards:
+            shard.flush_subscriptions()
 
-        self._client_last_reconnect_dt = self.get_time()
-        logger.info('Mqtt client disconnected. Reconnect')
-        try:
-            self.mqtt_client.reconnect()
-        except ConnectionRefusedError:
-            logger.warning('Mqtt client not reconnected')
-            return
+    def _send_message_event_handler(self, event: messages.events.MqttMessageSend):
+        if event.topic in self._pending_publishes:
+            self._coalesced += 1
+        self._pending_publishes[event.topic] = event.payload
 
-        time.sleep(1)
-        self.mqtt_client.loop()
+        if self._flush_timer is None:
+            self._flush_timer = self.call_later(self._publish_window, self.flush_publishes)
 
-    def tick(self) -> None:
-        if not self._client_connected:
-            self.reconnect()
+    def flush_publishes(self):
+        self._flush_timer = None
+        pending_publishes, self._pending_publishes = self._pending_publishes, dict()
+        if not pending_publishes:
             return
 
-        self.client_subscribe()
-        self.send_messages()
+        logger.info('Send %s messages to mqtt', len(pending_publishes))
+        for topic, payload in pending_publishes.items():
+            if self._sharding.shard(topic).publish(topic, payload):
+                self._schedule_spool_flush()
 
-        self._mqtt_loop()
+    def _schedule_spool_flush(self):
+        # one disk write for all messages in flush interval
+        if self._spool_flush_timer is None:
+            self._spool_flush_timer = self.call_later(self._spool_flush_interval, self._flush_spools)
 
-    def _mqtt_loop(self):
-        while self._loop_need_count > 0:
-            self.mqtt_client.loop(timeout=0.1)
-            self._loop_need_count -= 1
+    def _flush_spools(self):
+        self._spool_flush_timer = None
+        for shard in self.shards:
+            if shard.has_spool:
+                shard.flush_spool()
 
-        self._loop_need_count += 1
+    def tick(self) -> None:
+        pass
 
     def stop(self):
-        # todo: disconnect
-        super(MqttPlugin, self).stop()
-
-        self.send_messages()
-
-
-"""
-from plugins.mqtt import MqttPlugin
-from plugins import BaseEventPlugin, EventExchange
-from queue import Queue
-import logging
-import messages
-
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',)
-event_exchange = EventExchange(incoming_message_queue=Queue(), outgoing_message_queue=Queue())
-pl = MqttPlugin('127.0.0.1', event_exchange)
-pl.start()
-
-event_exchange.put(messages.events.MqttSubscribe("home/lights/sitting_room", 1))
+        if not self.is_running:
+            return
 
-event_exchange.put(messages.events.MqttMessageSend("home/lights/sitting_room", '1'))
-"""
+        # publish messages from handled before stop events
+        super(MqttPlugin, self).stop()
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+        self.flush_publishes()
+        logger.info('Mqtt publish stats %s', self.publish_stats)
+
+        if self._spool_flush_timer is not None:
+            self._spool_flush_timer.cancel()
+        for shard in self.shards:
+            shard.stop()
@@ -1,26 +1,86 @@
+import logging
 import time
-from queue import Empty, Queue
+from collections import defaultdict
+from queue import Full
+from threading import Event
 from typing import List, Type
 
 from plugins import EventExchange
+from plugins._base import find_plugin_settings
+from plugins._process import ProcessPlugin
+from plugins._queues import build_event_queue
+from plugins._routing import EventSubscriptions
 from plugins.mqtt import BaseEventPlugin
 
+logger = logging.getLogger(__name__)
+
 
 class PluginRunManager:
     """
     plugins order very important: start in forward order, stops in reverse.
+
+    event_driven - plugins and manager wake up on new event, instead of polling every step_timeout
+    events are sent out only to plugins, which consume its type (see BaseEventPlugin.consumed_event_types)
+
+    plugin event exchange can be limited in plugin settings, see plugins._queues.BoundedEventQueue:
+        exchange:
+          capacity: 1000
+          overflow: coalesce  # block, drop_oldest or coalesce
+          put_timeout: 1  # for block policy
+
+    plugin with setting "process: true" runs in worker process (see plugins._process.ProcessPlugin),
+    its events are pickled over pipe by sender thread from exchange queue, exchange setting limits the queue
     """
 
-    def __init__(self, plugins: List[Type[BaseEventPlugin]], plugins_settings):
-        self._plugins = [
-            p(
-                event_exchange=EventExchange(incoming_message_queue=Queue(), outgoing_message_queue=Queue()),
+    def __init__(
+        self,
+        plugins: List[Type[BaseEventPlugin]],
+        plugins_settings,
+        event_driven: bool = True,
+        step_timeout: float = 0.1,
+        batch_size: int = 100,
+    ):
+        self.event_driven = event_driven
+        self.step_timeout = step_timeout
+        self.batch_size = batch_size
+        self._wakeup = Event() if event_driven else None
+
+        self._plugins = [self._build_plugin(p, plugins_settings) for p in plugins]
+        self._subscriptions = EventSubscriptions(self._plugins)
+
+        self.is_running = True
+
+    @property
+    def plugins(self) -> List[BaseEventPlugin]:
+        return list(self._plugins)
+
+    def _build_plugin(self, plugin_class: Type[BaseEventPlugin], plugins_settings):
+        plugin_settings = find_plugin_settings(plugin_class, plugins_settings or {}) or {}
+        if plugin_settings.get('process'):
+            return ProcessPlugin(
+                plugin_class,
                 settings=plugins_settings,
+                outgoing_wakeup=self._wakeup,
+                exchange_settings=plugin_settings.get('exchange', {}),
             )
-            for p in plugins
-        ]
+
+        return plugin_class(
+            event_exchange=self._build_event_exchange(plugin_settings.get('exchange', {})),
+            settings=plugins_settings,
+        )
+
+    def _build_event_exchange(self, exchange_settings: dict) -> EventExchange:
+        return EventExchange(
+            incoming_message_queue=build_event_queue(**exchange_settings),
+            outgoing_message_queue=build_event_queue(**exchange_settings),
+            incoming_wakeup=Event() if self.event_driven else None,
+            outgoing_wakeup=self._wakeup,
+        )
 
     def start(self):
+        # plugins add event handlers on init, rebuild index after it
+        self._subscriptions.invalidate()
+
         for plugin in self._plugins:
             plugin.start()
 
@@ -29,11 +89,24 @@ class PluginRunManager:
             self.send_out_plugin_events(plugin)
 
     def run(self):
-        while True:
+        while self.is_running:
             self.step()
-            time.sleep(0.1)
+            self._wait_events()
+
+    def _wait_events(self):
+        if self._wakeup is None:
+            time.sleep(self.step_timeout)
+            return
+
+        self._wakeup.wait()
+        # event put before set wakeup, so it will be sent out on next step
+        self._wakeup.clear()
 
     def stop(self):
+        self.is_running = False
+        if self._wakeup is not None:
+            self._wakeup.set()
+
         # WARNING! very important keep this behavior!
         # first plugin mast bi start earlier and stop
         for plugin in self._plugins[::-1]:
@@ -42,13 +115,20 @@ class PluginRunManager:
 
     def send_out_plugin_events(self, plugin):
         while True:
-            try:
-                event = plugin.event_exchange.get()
-            except Empty:
+            events = plugin.event_exchange.get_batch(self.batch_size)
+            if not events:
                 break
 
-            for p in self._plugins:
-                if p is plugin:
-                    continue
+            # keep events order for every plugin
+            events_by_plugin = defaultdict(list)
+            for event in events:
+                for p in self._subscriptions.subscribers(type(event)):
+                    if p is plugin:
+                        continue
+                    events_by_plugin[p].append(event)
 
-                p.event_exchange.put(event)
+            for p, plugin_events in events_by_plugin.items():
+                try:
+                    p.event_exchange.put_batch(plugin_events)
+                except Full:
+                    logger.warning('Plugin %s exchange is full, events dropped', p)
@@ -1,44 +1,250 @@
 import logging
+import time
 from collections import defaultdict
+from typing import Dict
 
 import devices
 import messages
 
 from ._base_message_handlers import BaseMqttMessagePlugin
+from ._snapshot import DeviceStateSnapshot
+from ._watchdog import SensorWatchdog
 
 logger = logging.getLogger(__name__)
 
 
 class UnderFloorHeatingMixerPlugin(BaseMqttMessagePlugin):
+    """
+    Devices react on sensor messages. Devices with changed dependencies (see BaseDevice.on_dependencies_changed)
+    or with expired state_changed_timeout are marked dirty and evaluated on tick, so devices without sensor
+    (Pump) are driven in same wake up. Timeout expirations are timers of plugin deadline heap.
+    evaluation_stats - evaluated devices, sent commands and latency from dirty mark to command
+
+    Thermostat devices (exact type, subclasses can change rules) of sensor reading are evaluated in one
+    ThermostatBank call, turned on changes are applied to devices: dependents, snapshot and stale sensor
+    handling work with devices as before
+
+    Sensor silent for sensor_timeout seconds (plugin setting, no watchdog without it) is stale: SensorStale event
+    is sent and devices of sensor are turned off (stale_sensor_action: turn_off) or keep state (hold).
+    SensorRecovered is sent on next reading of sensor
+
+    With snapshot_path setting devices state is written to file every snapshot_interval seconds and on stop,
+    it is restored on start without commands, if snapshot is not older than snapshot_max_age seconds,
+    else off command is sent to not restored devices. Devices are turned off on stop, with keep_state_on_stop
+    (opt-in, needs snapshot_path) relays are not turned off: heating stays on while controller is down,
+    until restart. If snapshot is not written on stop, devices are turned off anyway:
+        snapshot_path: /var/lib/heating/devices.snapshot
+        snapshot_interval: 60
+        snapshot_max_age: 600
+        keep_state_on_stop: false
+    """
+
+    STALE_SENSOR_ACTIONS = ('turn_off', 'hold')
+
     # todo: validate and wrap to struct plugins settings
 
     def __init__(self, *args, **kwargs):
+        # devices react on sensor messages and dirty devices timers, nothing to do by time
+        kwargs.setdefault('tick_timeout', None)
         super().__init__(*args, **kwargs)
 
         self._plugin_devices = devices.DeviceLoader(self.settings['devices']).load_devices()
 
-        # subscribe devices to sensors
-        self._topics_to_handler_map = defaultdict(list)
-        topic_subscribed = set()  # dont duplicate device subscribe
+        self._dirty_devices: Dict[devices.BaseDevice, float] = dict()  # device -> time marked, in mark order
+        self._evaluation_timers = dict()  # device -> timer of state_changed_timeout end
+        self.evaluation_stats = {'evaluated': 0, 'commands': 0, 'last_latency': None, 'max_latency': 0.0}
+        for device in self._plugin_devices:
+            # run-on deadlines of devices are timers deadlines
+            device.clock = self.timers.clock
+            device.on_dependencies_changed = self._mark_dirty
+            self.send_events(device.enable())
+            self._mark_dirty(device)
+
+        self._snapshot = None
+        if self.settings.get('snapshot_path'):
+            self._snapshot = DeviceStateSnapshot(self.settings['snapshot_path'])
+            self._snapshot_interval = self.settings.get('snapshot_interval', 60)
+            self._restore_snapshot(self.settings.get('snapshot_max_age', 600))
+            self.call_later(self._snapshot_interval, self._write_snapshot_periodically)
+
+        self._keep_state_on_stop = self.settings.get('keep_state_on_stop', False)
+        if self._keep_state_on_stop and self._snapshot is None:
+            raise ValueError('keep_state_on_stop needs snapshot_path')
+
+        # subscribe devices to sensors, devices of sensor are grouped by value parser: reading parsed once per group
+        self._topics_to_devices_map = defaultdict(lambda: defaultdict(list))
+        self._thermostat_bank = devices.ThermostatBank()
+        self._bank_devices = []  # bank index -> device
+        self._bank_indexes = dict()  # device -> bank index
 
         for device in self._plugin_devices:
-            for topic, cb in device.get_topics_subscriptions():
-                self._topics_to_handler_map[topic].append(cb)
+            topic = device.sensor_topic
+            if not topic:
+                continue
 
-                if topic not in topic_subscribed:
-                    self.subscribe_to_topic(topic, self.device_message_handler)
-                    topic_subscribed.add(topic)
+            if topic not in self._topics_to_devices_map:
+                self.subscribe_to_topic(topic, self.device_message_handler, codec=device.sensor_codec)
+            self._topics_to_devices_map[topic][type(device).parse_sensor_value].append(device)
+            if type(device) is devices.Thermostat:
+                self._add_to_thermostat_bank(device)
+
+        self._stale_sensor_action = self.settings.get('stale_sensor_action', 'turn_off')
+        if self._stale_sensor_action not in self.STALE_SENSOR_ACTIONS:
+            raise ValueError(f'Unknown stale_sensor_action {self._stale_sensor_action}')
+
+        self._sensor_watchdog = None
+        if self.settings.get('sensor_timeout'):
+            self._sensor_watchdog = SensorWatchdog(
+                self.timers, self.settings['sensor_timeout'], self._on_sensor_stale, self._on_sensor_recovered
+            )
+            for topic in self._topics_to_devices_map:
+                self._sensor_watchdog.watch(topic)
 
     def device_message_handler(self, event: messages.events.MqttMessageReceived):
-        for cb in self._topics_to_handler_map[event.topic]:
-            self.send_events(cb(event))
+        if self._sensor_watchdog is not None:
+            self._sensor_watchdog.feed(event.topic)
+
+        now = time.time()
+        inner_messages = []
+        bank_readings = []
+        for parse_sensor_value, topic_devices in self._topics_to_devices_map[event.topic].items():
+            value = parse_sensor_value(event)
+            for device in topic_devices:
+                bank_index = self._bank_indexes.get(device)
+                if bank_index is None:
+                    inner_messages.extend(device.on_sensor_value(value))
+                    continue
+
+                device.last_sensor_time = now
+                if device.is_need_work:
+                    # device is turned off by dependencies, stale sensor and stop too
+                    self._thermostat_bank.turned_on[bank_index] = device.turned_on
+                    bank_readings.append((bank_index, value))
+
+        if bank_readings:
+            inner_messages.extend(self._evaluate_thermostat_bank(bank_readings, now))
+
+        # commands of all devices of sensor in one batch
+        self.send_events(inner_messages)
+
+    def _add_to_thermostat_bank(self, device: devices.Thermostat) -> None:
+        # after snapshot restore: first reading is compared with restored one
+        state = device.get_state()
+        bank = self._thermostat_bank
+        index = bank.add(device.name, device.target_temperature, device.hysteresis, now=state.last_sensor_time)
+        if state.last_sensor_value is not None:
+            bank.last_temperature[index] = state.last_sensor_value
+        self._bank_devices.append(device)
+        self._bank_indexes[device] = index
+
+    def _evaluate_thermostat_bank(self, readings, now: float) -> list:
+        bank = self._thermostat_bank
+        changes = bank.evaluate(readings, now)
+        for index, _ in readings:
+            self._bank_devices[index].set_last_temperature(bank.last_temperature[index], now)
+
+        inner_messages = []
+        for index, turned_on in changes:
+            device = self._bank_devices[index]
+            inner_messages.extend(device.turn_on() if turned_on else device.turn_off())
+        return inner_messages
+
+    def _restore_snapshot(self, max_age: float) -> None:
+        states = self._snapshot.read(max_age)
+        restored = 0
+        inner_messages = []
+        for device in self._plugin_devices:
+            state = states.get(device.name)
+            if state is not None:
+                device.restore_state(state)
+                restored += 1
+            else:
+                # relay can be left on by previous run (devices keep state on stop), real state is unknown
+                inner_messages.extend(device.build_state_messages())
+        logger.info('Restored state of %s devices from snapshot', restored)
+        self.send_events(inner_messages)
+
+    def write_snapshot(self) -> None:
+        self._snapshot.write({device.name: device.get_state() for device in self._plugin_devices})
+
+    def _write_snapshot_periodically(self) -> None:
+        try:
+            self.write_snapshot()
+        except OSError as err:
+            logger.error('On write devices snapshot: %s', err)
+        self.call_later(self._snapshot_interval, self._write_snapshot_periodically)
+
+    def _write_snapshot_on_stop(self) -> bool:
+        try:
+            self.write_snapshot()
+        except OSError as err:
+            logger.error('On write devices snapshot on stop: %s', err)
+            return False
+        return True
+
+    def _disable_devices(self) -> None:
+        for dv in self._plugin_devices:
+            self.send_events(dv.disable())
+
+    def _on_sensor_stale(self, topic: str) -> None:
+        inner_messages = [messages.events.SensorStale(topic)]
+        if self._stale_sensor_action == 'turn_off':
+            for topic_devices in self._topics_to_devices_map[topic].values():
+                for device in topic_devices:
+                    inner_messages.extend(device.turn_off())
+        self.send_events(inner_messages)
+
+    def _on_sensor_recovered(self, topic: str) -> None:
+        self.send_event(messages.events.SensorRecovered(topic))
+
+    def _mark_dirty(self, device: devices.BaseDevice) -> None:
+        self._dirty_devices.setdefault(device, time.perf_counter())
 
     def tick(self) -> None:
-        # todo check all devices and send messages
-        pass
+        inner_messages = []
+        evaluation_stats = self.evaluation_stats
+        while self._dirty_devices:
+            # evaluated device can mark dependents dirty
+            device = next(iter(self._dirty_devices))
+            marked_at = self._dirty_devices.pop(device)
+
+            device_messages = device.evaluate()
+            evaluation_stats['evaluated'] += 1
+            if device_messages:
+                latency = time.perf_counter() - marked_at
+                evaluation_stats['commands'] += len(device_messages)
+                evaluation_stats['last_latency'] = latency
+                evaluation_stats['max_latency'] = max(evaluation_stats['max_latency'], latency)
+                inner_messages.extend(device_messages)
+
+            self._schedule_evaluation(device)
+
+        self.send_events(inner_messages)
+
+    def _schedule_evaluation(self, device: devices.BaseDevice) -> None:
+        timer = self._evaluation_timers.pop(device, None)
+        if timer is not None:
+            timer.cancel()
+
+        evaluation_time = device.next_evaluation_time()
+        if evaluation_time is not None:
+            self._evaluation_timers[device] = self.call_at(evaluation_time, self._mark_dirty, device)
 
     def stop(self):
-        for dv in self._plugin_devices:
-            self.send_events(dv.stop())
+        if not self.is_running:
+            return
 
+        # plugin thread is stopped and rest of events handled
         super(UnderFloorHeatingMixerPlugin, self).stop()
+
+        if self._keep_state_on_stop:
+            # warm restart: devices keep state, relays are on until restart
+            if not self._write_snapshot_on_stop():
+                logger.error('Devices are turned off, state is not kept without snapshot')
+                self._disable_devices()
+        else:
+            self._disable_devices()
+            if self._snapshot is not None:
+                # snapshot of turned off devices: restored state is real state of relays
+                self._write_snapshot_on_stop()
+        logger.info('Devices evaluation stats %s', self.evaluation_stats)
@@ -0,0 +1,76 @@
+import statistics
+import time
+from queue import Empty, Queue
+from typing import List
+
+import messages
+from plugins import BaseEventPlugin
+
+SENSOR_TOPIC = '/devices/wb-w1/controls/28-000005fb67b8'
+RELAY_TOPIC = '/devices/wb-gpio/controls/EXT1_K4/on'
+
+
+def percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def format_latency(name: str, values: List[float]) -> str:
+    values_ms = [v * 1000 for v in values]
+    return (
+        f'{name:<24} n={len(values_ms):<6} '
+        f'mean={statistics.mean(values_ms):9.3f}ms '
+        f'p50={percentile(values_ms, 50):9.3f}ms '
+        f'p99={percentile(values_ms, 99):9.3f}ms '
+        f'max={max(values_ms):9.3f}ms'
+    )
+
+
+def heating_settings(thermostats_count: int = 1) -> dict:
+    return {
+        f'{__name__}.SensorStubPlugin': {},
+        f'{__name__}.RelayRecorderPlugin': {},
+        'plugins.UnderFloorHeatingMixerPlugin': {
+            'devices': {
+                'devices.thermostat.Thermostat': [
+                    {
+                        'name': f'mixer_{i}',
+                        'sensor_topic': SENSOR_TOPIC,
+                        'hardware_topic': f'{RELAY_TOPIC}/{i}' if i else RELAY_TOPIC,
+                        'target_temperature': 22,
+                    }
+                    for i in range(thermostats_count)
+                ],
+            },
+        },
+    }
+
+
+class SensorStubPlugin(BaseEventPlugin):
+    """emulate MqttPlugin: sensor readings are injected by benchmark with send_event"""
+
+    def tick(self) -> None:
+        pass
+
+
+class RelayRecorderPlugin(BaseEventPlugin):
+    """record time of every relay command"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.relay_commands = Queue()
+        self.add_event_handler(messages.events.MqttMessageSend, self._on_relay_command)
+
+    def _on_relay_command(self, event):
+        self.relay_commands.put((time.perf_counter(), event))
+
+    def wait_command(self, timeout: float = 5):
+        try:
+            return self.relay_commands.get(timeout=timeout)
+        except Empty:
+            raise TimeoutError('Relay command not received') from None
+
+    def tick(self) -> None:
+        pass
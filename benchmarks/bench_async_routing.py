@@ -0,0 +1,74 @@
+"""
+Sensor-to-relay latency in asyncio runtime (AsyncPluginRunManager), one thread for all plugins.
+UnderFloorHeatingMixerPlugin runs through SyncPluginAdapter.
+
+run: PYTHONPATH=app python -m benchmarks.bench_async_routing
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+import messages
+import plugins
+
+from . import _helpers
+
+
+class AsyncSensorStubPlugin(plugins.AsyncBaseEventPlugin):
+    pass
+
+
+class AsyncRelayRecorderPlugin(plugins.AsyncBaseEventPlugin):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.relay_commands = asyncio.Queue()
+        self.add_event_handler(messages.events.MqttMessageSend, self._on_relay_command)
+
+    def _on_relay_command(self, event):
+        self.relay_commands.put_nowait((time.perf_counter(), event))
+
+
+async def measure(samples: int):
+    settings = _helpers.heating_settings()
+    settings.update({f'{__name__}.AsyncSensorStubPlugin': {}, f'{__name__}.AsyncRelayRecorderPlugin': {}})
+
+    manager = plugins.AsyncPluginRunManager(
+        plugins=[AsyncSensorStubPlugin, plugins.UnderFloorHeatingMixerPlugin, AsyncRelayRecorderPlugin],
+        plugins_settings=settings,
+    )
+    sensor, heating, recorder = manager.plugins
+    for device in heating.plugin._plugin_devices:
+        device.enable()
+
+    manager.start()
+    latencies = []
+    try:
+        for i in range(samples):
+            payload = '10' if i % 2 == 0 else '30'
+            await asyncio.sleep(0.001)
+
+            sent_at = time.perf_counter()
+            sensor.send_event(messages.events.MqttMessageReceived(_helpers.SENSOR_TOPIC, payload))
+            received_at, _ = await asyncio.wait_for(recorder.relay_commands.get(), timeout=5)
+            latencies.append(received_at - sent_at)
+    finally:
+        await manager.stop()
+
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--samples', type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    print(_helpers.format_latency('asyncio runtime', asyncio.run(measure(args.samples))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Startup time of DeviceLoader by devices count: every group is 5 thermostats and pump depending on them,
+groups are chained by dependency of next group first thermostat on previous pump (long dependencies path).
+Load time per device must not grow with devices count.
+
+run: PYTHONPATH=app python -m benchmarks.bench_device_loader
+"""
+
+import argparse
+import logging
+import time
+
+from devices import DeviceLoader
+
+GROUP_SIZE = 6
+
+
+def devices_settings(devices_count: int) -> dict:
+    thermostats, pumps = [], []
+    for group in range(devices_count // GROUP_SIZE):
+        mixers = [f'mixer_{group}_{i}' for i in range(GROUP_SIZE - 1)]
+        for i, name in enumerate(mixers):
+            thermostats.append(
+                {
+                    'name': name,
+                    'sensor_topic': f'/devices/wb-w1/controls/28-{group:012x}',
+                    'hardware_topic': f'/devices/wb-gpio/controls/EXT{group}_K{i}/on',
+                    'target_temperature': 22,
+                    'dependencies': [f'pump_{group - 1}'] if group and not i else [],
+                }
+            )
+        pumps.append({'name': f'pump_{group}', 'hardware_topic': f'/devices/pump/{group}/on', 'dependencies': mixers})
+
+    return {'devices.thermostat.Thermostat': thermostats, 'devices.pump.Pump': pumps}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--max-devices', type=int, default=10_000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+
+    devices_count = args.max_devices // 8
+    while devices_count <= args.max_devices:
+        settings = devices_settings(devices_count)
+        loader = DeviceLoader(settings)
+
+        started = time.perf_counter()
+        devices = loader.load_devices()
+        duration = time.perf_counter() - started
+
+        stages = ' '.join(f'{stage}={seconds * 1e3:7.1f}ms' for stage, seconds in loader.stage_timings.items())
+        print(
+            f'{len(devices):>6} devices {duration * 1e3:8.1f}ms {duration / len(devices) * 1e6:6.1f}us/device {stages}'
+        )
+        devices_count *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+End-to-end load: sensor messages from local broker stub -> MqttPlugin -> PluginRunManager
+-> UnderFloorHeatingMixerPlugin -> MqttPlugin -> relay publish to broker.
+Every reading toggles relay of its sensor thermostat, reports sensor-to-publish latency,
+throughput and CPU time per reading (whole process, broker stub included). Runs offline.
+Relay commands of one sensor in MqttPlugin publish window are coalesced to last one (or skipped,
+if relay already has this state), so publishes count is not readings count: run waits until every
+relay command is published, coalesced or skipped.
+
+run: PYTHONPATH=app python -m benchmarks.bench_e2e_load
+"""
+
+import argparse
+import logging
+import threading
+import time
+from collections import defaultdict
+
+import messages
+from plugins import MqttPlugin, PluginRunManager, UnderFloorHeatingMixerPlugin
+
+from . import _helpers
+from .mqtt_broker_stub import MqttBrokerStub
+
+SENSOR_TOPIC_TEMPLATE = '/devices/wb-w1/controls/28-{:012x}'
+RELAY_TOPIC_TEMPLATE = '/devices/wb-gpio/controls/EXT{}_K1/on'
+
+COLD, HOT = b'10', b'30'
+
+
+def e2e_settings(broker: MqttBrokerStub, sensors_count: int, publish_window: float = 0) -> dict:
+    return {
+        'plugins.MqttPlugin': {'mqtt_host': broker.host, 'mqtt_port': broker.port, 'publish_window': publish_window},
+        'plugins.UnderFloorHeatingMixerPlugin': {
+            'devices': {
+                'devices.thermostat.Thermostat': [
+                    {
+                        'name': f'mixer_{i}',
+                        'sensor_topic': SENSOR_TOPIC_TEMPLATE.format(i),
+                        'hardware_topic': RELAY_TOPIC_TEMPLATE.format(i),
+                        'target_temperature': 22,
+                    }
+                    for i in range(sensors_count)
+                ],
+            },
+        },
+    }
+
+
+class HeatingPipeline:
+    """broker stub and PluginRunManager with MqttPlugin and UnderFloorHeatingMixerPlugin"""
+
+    def __init__(self, sensors_count: int, on_publish=None, publish_window: float = 0):
+        self.sensors_count = sensors_count
+        self.broker = MqttBrokerStub(on_publish=on_publish)
+
+        self.manager = PluginRunManager(
+            plugins=[MqttPlugin, UnderFloorHeatingMixerPlugin],
+            plugins_settings=e2e_settings(self.broker, sensors_count, publish_window),
+        )
+        self.mqtt, self.heating = self.manager.plugins
+        for device in self.heating._plugin_devices:
+            device.enable()
+
+        self._manager_thread = threading.Thread(target=self.manager.run, daemon=True)
+
+    def start(self, timeout: float = 15) -> None:
+        self.broker.start()
+        self.manager.start()
+        self._manager_thread.start()
+
+        last_sensor_topic = SENSOR_TOPIC_TEMPLATE.format(self.sensors_count - 1)
+        if not self.broker.wait_subscribed(last_sensor_topic, timeout):
+            raise TimeoutError('Sensors not subscribed')
+
+    def send_reading(self, sensor: int, payload: bytes) -> None:
+        self.broker.publish(SENSOR_TOPIC_TEMPLATE.format(sensor), payload)
+
+    def stop(self) -> None:
+        self.manager.stop()
+        self._manager_thread.join()
+        self.broker.stop()
+
+
+def run_load(sensors_count: int, rate: float, duration: float) -> dict:
+    lock = threading.Lock()
+    sent_at = defaultdict(dict)  # relay topic -> expected payload -> time of reading
+    latencies = []
+    relay_states = dict()  # relay topic -> last published payload
+
+    def on_publish(topic, payload):
+        published_at = time.perf_counter()
+        with lock:
+            relay_states[topic] = payload
+            reading_time = sent_at[topic].pop(payload, None)
+            if reading_time is not None:
+                latencies.append(published_at - reading_time)
+
+    pipeline = HeatingPipeline(sensors_count, on_publish=on_publish)
+    pipeline.start()
+
+    readings = int(rate * duration)
+    relay_topics = [RELAY_TOPIC_TEMPLATE.format(i) for i in range(sensors_count)]
+    expected_relay_states = dict()
+    try:
+        started, cpu_started = time.perf_counter(), time.process_time()
+        for i in range(readings):
+            # pace readings, sleep only when ahead of schedule
+            delay = started + i / rate - time.perf_counter()
+            if delay > 0.001:
+                time.sleep(delay)
+
+            sensor, is_cold = i % sensors_count, (i // sensors_count) % 2 == 0
+            with lock:
+                # cold reading turn on relay, hot - turn off
+                sent_at[relay_topics[sensor]][b'1' if is_cold else b'0'] = time.perf_counter()
+            expected_relay_states[relay_topics[sensor]] = b'1' if is_cold else b'0'
+            pipeline.send_reading(sensor, COLD if is_cold else HOT)
+
+        def is_done():
+            # every reading is relay command
+            publish_stats = pipeline.mqtt.publish_stats
+            with lock:
+                return sum(publish_stats.values()) >= readings and relay_states == expected_relay_states
+
+        deadline = time.perf_counter() + 10
+        while not is_done() and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu_started
+    finally:
+        pipeline.stop()
+
+    return {
+        'readings': readings,
+        'published': len(latencies),
+        'publish_stats': pipeline.mqtt.publish_stats,
+        'relay_states': dict(relay_states),
+        'expected_relay_states': expected_relay_states,
+        'latencies': latencies,
+        'throughput': len(latencies) / elapsed,
+        'cpu_per_reading': cpu / readings,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sensors', type=int, default=50)
+    parser.add_argument('--rate', type=float, default=2000, help='sensor messages per second')
+    parser.add_argument('--duration', type=float, default=5)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+
+    result = run_load(args.sensors, args.rate, args.duration)
+    print(_helpers.format_latency('sensor to publish', result['latencies']))
+    print(
+        f'{"load":<24} {result["published"]}/{result["readings"]} relay publishes '
+        f'(coalesced {result["publish_stats"]["coalesced"]}, skipped {result["publish_stats"]["skipped"]}), '
+        f'{result["throughput"]:,.0f} msg/s, cpu {result["cpu_per_reading"] * 1e6:.1f}us/reading'
+    )
+
+
+if __name__ == '__main__':
+    main()
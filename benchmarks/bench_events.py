@@ -0,0 +1,103 @@
+"""
+Time and memory per event: legacy events with __dict__ (before) vs immutable tuple events (after),
+and whole pipeline sensor reading -> PluginRunManager -> thermostat -> relay command.
+
+run: PYTHONPATH=app python -m benchmarks.bench_events
+"""
+
+import argparse
+import logging
+import time
+import tracemalloc
+
+import messages
+from plugins import PluginRunManager, UnderFloorHeatingMixerPlugin
+
+from . import _helpers
+
+
+class LegacyMqttEvents(messages.BaseEvent):
+    # messages.events.MqttMessageReceived before immutable events
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+
+class LegacyMqttMessageReceived(LegacyMqttEvents):
+    def __init__(self, topic, payload, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.topic = topic
+        self.payload = payload
+
+
+def measure_create(event_class, count: int):
+    topic = _helpers.SENSOR_TOPIC
+
+    started = time.perf_counter()
+    for _ in range(count):
+        event_class(topic, '21.5')
+    duration = time.perf_counter() - started
+
+    tracemalloc.start()
+    events = [event_class(topic, '21.5') for _ in range(count)]
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del events
+
+    return duration / count, memory / count
+
+
+def measure_pipeline(count: int):
+    manager = PluginRunManager(
+        plugins=[_helpers.SensorStubPlugin, UnderFloorHeatingMixerPlugin, _helpers.RelayRecorderPlugin],
+        plugins_settings=_helpers.heating_settings(thermostats_count=5),
+    )
+    sensor, heating, recorder = manager.plugins
+    for device in heating._plugin_devices:
+        device.enable()
+
+    def run(n):
+        # plugins are not started, pipeline runs synchronously
+        for i in range(n):
+            sensor.send_event(messages.events.MqttMessageReceived(_helpers.SENSOR_TOPIC, '10' if i % 2 else '30'))
+            manager.step()
+            heating._before_tick()
+            manager.step()
+            recorder._before_tick()
+        while not recorder.relay_commands.empty():
+            recorder.relay_commands.get()
+
+    run(count)  # warm up
+
+    started = time.perf_counter()
+    run(count)
+    duration = time.perf_counter() - started
+
+    tracemalloc.start()
+    run(count)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return duration / count, peak / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=100_000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    for name, event_class in (
+        ('legacy event (before)', LegacyMqttMessageReceived),
+        ('tuple event (after)', messages.events.MqttMessageReceived),
+    ):
+        duration, memory = measure_create(event_class, args.count)
+        print(f'create {name:<24} {duration * 1e9:8.1f}ns/event {memory:8.1f}B/event')
+
+    duration, peak = measure_pipeline(args.count // 10)
+    print(f'pipeline, 5 thermostats on sensor {duration * 1e6:8.1f}us/reading peak {peak:8.1f}B/reading')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Wake ups of idle heating plugins: fixed tick_timeout sleep (before) vs deadline scheduler (after).
+
+run: PYTHONPATH=app python -m benchmarks.bench_idle_wakeups
+"""
+
+import argparse
+import logging
+import threading
+import time
+
+from plugins import PluginRunManager, UnderFloorHeatingMixerPlugin
+
+from . import _helpers
+
+
+def measure(tick_timeout, duration: float) -> dict:
+    manager = PluginRunManager(
+        plugins=[_helpers.SensorStubPlugin, UnderFloorHeatingMixerPlugin, _helpers.RelayRecorderPlugin],
+        plugins_settings=_helpers.heating_settings(),
+    )
+    for plugin in manager.plugins:
+        plugin.tick_timeout = tick_timeout
+
+    manager.start()
+    manager_thread = threading.Thread(target=manager.run, daemon=True)
+    manager_thread.start()
+
+    time.sleep(duration)
+    wakeups_per_second = {p.__class__.__name__: p.wakeups_per_second for p in manager.plugins}
+
+    manager.stop()
+    manager_thread.join()
+    return wakeups_per_second
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--duration', type=float, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    for name, tick_timeout in (('fixed sleep (before)', 0.1), ('deadline (after)', None)):
+        wakeups = measure(tick_timeout, args.duration)
+        print(f'{name:<24} ' + ' '.join(f'{k}={v:.2f}/s' for k, v in wakeups.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+MqttPlugin against local broker stub: MqttMessageSend to broker latency, inbound messages throughput
+and publishes saved by coalescing.
+
+run: PYTHONPATH=app python -m benchmarks.bench_mqtt_plugin
+"""
+
+import argparse
+import logging
+import random
+import threading
+import time
+from queue import Queue
+
+import messages
+from plugins import EventExchange, MqttPlugin
+
+from . import _helpers
+from .mqtt_broker_stub import MqttBrokerStub
+
+INBOUND_TOPIC = '/devices/bench/controls/inbound'
+
+
+def build_plugin(broker: MqttBrokerStub):
+    event_exchange = EventExchange(
+        incoming_message_queue=Queue(),
+        outgoing_message_queue=Queue(),
+        incoming_wakeup=threading.Event(),
+    )
+    plugin = MqttPlugin(
+        event_exchange=event_exchange,
+        settings={'plugins.MqttPlugin': {'mqtt_host': broker.host, 'mqtt_port': broker.port}},
+    )
+    return plugin, event_exchange
+
+
+def measure_publish_latency(samples: int):
+    published = Queue()
+    broker = MqttBrokerStub(on_publish=lambda topic, payload: published.put(time.perf_counter())).start()
+    plugin, event_exchange = build_plugin(broker)
+    plugin.start()
+
+    latencies = []
+    try:
+        # first message waits connect, every next toggles relay
+        event_exchange.put(messages.events.MqttMessageSend(_helpers.RELAY_TOPIC, '0'))
+        published.get(timeout=15)
+
+        for i in range(samples):
+            time.sleep(random.uniform(0, 0.05))
+            sent_at = time.perf_counter()
+            event_exchange.put(messages.events.MqttMessageSend(_helpers.RELAY_TOPIC, str((i + 1) % 2)))
+            latencies.append(published.get(timeout=5) - sent_at)
+    finally:
+        plugin.join()
+        broker.stop()
+
+    return latencies
+
+
+def measure_inbound_throughput(count: int) -> float:
+    broker = MqttBrokerStub().start()
+    plugin, event_exchange = build_plugin(broker)
+    plugin.start()
+
+    try:
+        event_exchange.put(messages.events.MqttSubscribe(INBOUND_TOPIC, 0))
+        if not broker.wait_subscribed(INBOUND_TOPIC, timeout=15):
+            raise TimeoutError('Plugin not subscribed')
+
+        start = time.perf_counter()
+        for i in range(count):
+            broker.publish(INBOUND_TOPIC, str(i).encode())
+
+        received = 0
+        while received < count:
+            event_exchange.outgoing_message_queue.get(timeout=5)
+            received += 1
+        return count / (time.perf_counter() - start)
+    finally:
+        plugin.join()
+        broker.stop()
+
+
+def measure_burst_publishes(topics: int) -> dict:
+    # every relay toggled off and on in one batch
+    published = Queue()
+    broker = MqttBrokerStub(on_publish=lambda topic, payload: published.put(topic)).start()
+    plugin, event_exchange = build_plugin(broker)
+    plugin.start()
+
+    try:
+        event_exchange.put(messages.events.MqttMessageSend(_helpers.RELAY_TOPIC, '0'))
+        published.get(timeout=15)
+
+        events = [messages.events.MqttMessageSend(f'{_helpers.RELAY_TOPIC}/{i}', p) for p in '01' for i in range(topics)]
+        event_exchange.put_batch(events)
+        for _ in range(topics):
+            published.get(timeout=5)
+        return dict(plugin.publish_stats, sent=len(events) + 1)
+    finally:
+        plugin.join()
+        broker.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--samples', type=int, default=50)
+    parser.add_argument('--messages', type=int, default=20000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    print(_helpers.format_latency('publish latency', measure_publish_latency(args.samples)))
+    print(f'{"inbound throughput":<24} {measure_inbound_throughput(args.messages):,.0f} msg/s')
+    print(f'{"burst publishes":<24} {measure_burst_publishes(100)}')
+
+
+if __name__ == '__main__':
+    main()
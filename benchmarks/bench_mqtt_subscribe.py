@@ -0,0 +1,71 @@
+"""
+Startup and reconnect subscription of 1000 device topics: SUBSCRIBE packets and time until broker has all of them.
+
+run: PYTHONPATH=app python -m benchmarks.bench_mqtt_subscribe
+"""
+
+import argparse
+import logging
+import time
+
+import messages
+
+from .bench_mqtt_plugin import build_plugin
+from .mqtt_broker_stub import MqttBrokerStub
+
+
+def wait_subscriptions(broker: MqttBrokerStub, count: int, timeout: float = 30) -> None:
+    deadline = time.perf_counter() + timeout
+    while len(broker.subscribed_topics) < count:
+        if time.perf_counter() > deadline:
+            raise TimeoutError('Not subscribed')
+        time.sleep(0.001)
+
+
+def measure(topics: int) -> None:
+    broker = MqttBrokerStub().start()
+    plugin, event_exchange = build_plugin(broker)
+    plugin.start()
+
+    try:
+        if not isinstance(event_exchange.outgoing_message_queue.get(timeout=15), messages.events.MqttConnected):
+            raise RuntimeError('Plugin not connected')
+
+        # every device plugin subscribes to its topics, sensors are shared by two devices
+        events = [messages.events.MqttSubscribe(f'/devices/bench/controls/{i // 2}', 1) for i in range(topics * 2)]
+        start = time.perf_counter()
+        event_exchange.put_batch(events)
+        wait_subscriptions(broker, topics)
+        print(
+            f'{"startup":<24} {topics} topics, {len(events)} MqttSubscribe: '
+            f'{broker.subscribe_packets} SUBSCRIBE packets, {(time.perf_counter() - start) * 1000:.1f}ms'
+        )
+
+        packets_before = broker.subscribe_packets
+        start = time.perf_counter()
+        broker.disconnect_client()
+        # old connection is dropped by broker on its close
+        while broker.subscribe_packets == packets_before:
+            time.sleep(0.001)
+        wait_subscriptions(broker, topics)
+        print(
+            f'{"reconnect":<24} {topics} topics: '
+            f'{broker.subscribe_packets - packets_before} SUBSCRIBE packets, '
+            f'{(time.perf_counter() - start) * 1000:.1f}ms (with reconnect backoff)'
+        )
+    finally:
+        plugin.join()
+        broker.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--topics', type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+    measure(args.topics)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Sensor-to-relay latency through PluginRunManager: polling (before) vs event driven routing (after).
+
+run: PYTHONPATH=app python -m benchmarks.bench_routing_latency
+"""
+
+import argparse
+import logging
+import random
+import threading
+import time
+
+import messages
+from plugins import PluginRunManager, UnderFloorHeatingMixerPlugin
+
+from . import _helpers
+
+
+def measure(event_driven: bool, samples: int):
+    manager = PluginRunManager(
+        plugins=[_helpers.SensorStubPlugin, UnderFloorHeatingMixerPlugin, _helpers.RelayRecorderPlugin],
+        plugins_settings=_helpers.heating_settings(),
+        event_driven=event_driven,
+    )
+    sensor, heating, recorder = manager.plugins
+    for device in heating._plugin_devices:
+        device.enable()
+
+    manager.start()
+    manager_thread = threading.Thread(target=manager.run, daemon=True)
+    manager_thread.start()
+
+    latencies = []
+    try:
+        for i in range(samples):
+            # cold / hot reading, every reading toggle relay
+            payload = '10' if i % 2 == 0 else '30'
+            time.sleep(random.uniform(0, 0.05))
+
+            sent_at = time.perf_counter()
+            sensor.send_event(messages.events.MqttMessageReceived(_helpers.SENSOR_TOPIC, payload))
+            received_at, _ = recorder.wait_command()
+            latencies.append(received_at - sent_at)
+    finally:
+        manager.stop()
+        manager_thread.join()
+
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--samples', type=int, default=30)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    print(_helpers.format_latency('polling (before)', measure(event_driven=False, samples=args.samples)))
+    print(_helpers.format_latency('event driven (after)', measure(event_driven=True, samples=args.samples)))
+
+
+if __name__ == '__main__':
+    main()
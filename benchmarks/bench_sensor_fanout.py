@@ -0,0 +1,63 @@
+"""
+Sensor reading fan-out in UnderFloorHeatingMixerPlugin with N thermostats on one sensor topic:
+every device parses payload and sends own messages (before) vs payload parsed once
+and commands of all devices sent in one batch (after).
+
+run: PYTHONPATH=app python -m benchmarks.bench_sensor_fanout
+"""
+
+import argparse
+import logging
+import time
+from queue import Queue
+
+import messages
+from plugins import EventExchange, UnderFloorHeatingMixerPlugin
+
+from . import _helpers
+
+
+def legacy_device_message_handler(plugin: UnderFloorHeatingMixerPlugin, event):
+    # UnderFloorHeatingMixerPlugin.device_message_handler before fan-out: every device parses payload
+    for device in plugin._plugin_devices:
+        plugin.send_events(device.on_sensor_value(device.parse_sensor_value(event)))
+
+
+def measure(thermostats_count: int, count: int, handler) -> float:
+    event_exchange = EventExchange(incoming_message_queue=Queue(), outgoing_message_queue=Queue())
+    plugin = UnderFloorHeatingMixerPlugin(
+        event_exchange=event_exchange,
+        settings=_helpers.heating_settings(thermostats_count),
+    )
+    for device in plugin._plugin_devices:
+        device.enable()
+
+    # cold reading turns relays on, hot - off (quick temp get up)
+    readings = [messages.events.MqttMessageReceived(_helpers.SENSOR_TOPIC, b'30' if i % 2 else b'10') for i in range(2)]
+
+    started = time.perf_counter()
+    for i in range(count):
+        handler(plugin, readings[i % 2])
+        event_exchange.get_batch(thermostats_count)
+    return (time.perf_counter() - started) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=10_000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+
+    for thermostats_count in (1, 5, 20, 100):
+        before = measure(thermostats_count, args.count, legacy_device_message_handler)
+        after = measure(thermostats_count, args.count, UnderFloorHeatingMixerPlugin.device_message_handler)
+        print(
+            f'{thermostats_count:>3} devices on topic '
+            f'before {before * 1e6:8.1f}us/reading after {after * 1e6:8.1f}us/reading '
+            f'speedup {before / after:5.2f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
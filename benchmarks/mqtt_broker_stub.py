@@ -0,0 +1,251 @@
+"""
+Minimal MQTT 3.1.1 broker for benchmarks and offline tests: one thread per client,
+CONNECT/SUBSCRIBE/UNSUBSCRIBE/PUBLISH (qos 0-2)/PINGREQ/DISCONNECT, messages are forwarded with qos 0.
+No sessions, retained messages and authentication.
+"""
+
+import logging
+import socket
+import struct
+import threading
+from typing import Callable, List, Optional
+
+from plugins._topic_trie import TopicTrie
+
+logger = logging.getLogger(__name__)
+
+CONNECT = 0x10
+CONNACK = 0x20
+PUBLISH = 0x30
+PUBACK = 0x40
+PUBREC = 0x50
+PUBREL = 0x60
+PUBCOMP = 0x70
+SUBSCRIBE = 0x80
+SUBACK = 0x90
+UNSUBSCRIBE = 0xA0
+UNSUBACK = 0xB0
+PINGREQ = 0xC0
+PINGRESP = 0xD0
+DISCONNECT = 0xE0
+
+
+def encode_packet(packet_type: int, body: bytes) -> bytes:
+    remaining_length = bytearray()
+    length = len(body)
+    while True:
+        byte, length = length % 128, length // 128
+        remaining_length.append(byte | 0x80 if length else byte)
+        if not length:
+            break
+    return bytes((packet_type,)) + bytes(remaining_length) + body
+
+
+def encode_string(value: bytes) -> bytes:
+    return struct.pack('!H', len(value)) + value
+
+
+class _ClientConnection:
+    def __init__(self, broker: 'MqttBrokerStub', sock: socket.socket):
+        self.broker = broker
+        self.sock = sock
+        self._send_lock = threading.Lock()
+        self._file = sock.makefile('rb')
+
+    def send(self, data: bytes) -> None:
+        with self._send_lock:
+            self.sock.sendall(data)
+
+    def _read_packet(self):
+        header = self._file.read(1)
+        if not header:
+            return None, None
+
+        length, multiplier = 0, 1
+        while True:
+            byte = self._file.read(1)[0]
+            length += (byte & 0x7F) * multiplier
+            multiplier *= 128
+            if not byte & 0x80:
+                break
+        return header[0], self._file.read(length)
+
+    def serve(self) -> None:
+        try:
+            while True:
+                packet_type, body = self._read_packet()
+                if packet_type is None or packet_type & 0xF0 == DISCONNECT:
+                    break
+                self._handle_packet(packet_type, body)
+        except (OSError, IndexError):
+            pass
+        finally:
+            self.broker._remove_client(self)
+            self.sock.close()
+
+    def _handle_packet(self, packet_type: int, body: bytes) -> None:
+        kind = packet_type & 0xF0
+        if kind == CONNECT:
+            self.send(encode_packet(CONNACK, b'\x00\x00'))
+        elif kind == PUBLISH:
+            self._handle_publish(packet_type, body)
+        elif kind == PUBREL:
+            self.send(encode_packet(PUBCOMP, body[:2]))
+        elif kind == SUBSCRIBE:
+            self._handle_subscribe(body)
+        elif kind == UNSUBSCRIBE:
+            self._handle_unsubscribe(body)
+        elif kind == PINGREQ:
+            self.send(encode_packet(PINGRESP, b''))
+
+    def _handle_publish(self, packet_type: int, body: bytes) -> None:
+        qos = (packet_type >> 1) & 0x03
+        (topic_length,) = struct.unpack_from('!H', body)
+        topic = body[2 : 2 + topic_length].decode()
+        offset = 2 + topic_length
+
+        if qos:
+            packet_id = body[offset : offset + 2]
+            offset += 2
+            self.send(encode_packet(PUBACK if qos == 1 else PUBREC, packet_id))
+
+        self.broker._on_client_publish(topic, body[offset:])
+
+    def _handle_subscribe(self, body: bytes) -> None:
+        packet_id, offset = body[:2], 2
+        granted_qos = bytearray()
+        topic_filters = []
+        while offset < len(body):
+            (topic_length,) = struct.unpack_from('!H', body, offset)
+            topic_filters.append(body[offset + 2 : offset + 2 + topic_length].decode())
+            granted_qos.append(0)
+            offset += 2 + topic_length + 1
+
+        self.broker._subscribe(self, topic_filters)
+        self.send(encode_packet(SUBACK, packet_id + bytes(granted_qos)))
+
+    def _handle_unsubscribe(self, body: bytes) -> None:
+        packet_id, offset = body[:2], 2
+        topic_filters = []
+        while offset < len(body):
+            (topic_length,) = struct.unpack_from('!H', body, offset)
+            topic_filters.append(body[offset + 2 : offset + 2 + topic_length].decode())
+            offset += 2 + topic_length
+
+        self.broker._unsubscribe(self, topic_filters)
+        self.send(encode_packet(UNSUBACK, packet_id))
+
+
+class MqttBrokerStub:
+    """
+    on_publish(topic, payload: bytes) - optional hook, called in client thread on every client publish.
+    subscribe_packets/subscribed_topics - for check client subscriptions
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, on_publish: Callable = None):
+        self.on_publish = on_publish
+
+        self._server = socket.create_server((host, port))
+        self.host, self.port = self._server.getsockname()[:2]
+
+        self._lock = threading.Lock()
+        self._subscriptions = TopicTrie()
+        self._filters_by_client = {}
+        self._subscribed = threading.Condition(self._lock)
+        self.subscribe_packets = 0
+
+        self._accept_thread: Optional[threading.Thread] = None
+
+    @property
+    def subscribed_topics(self) -> List[str]:
+        with self._lock:
+            return sorted({f for filters in self._filters_by_client.values() for f in filters})
+
+    def start(self) -> 'MqttBrokerStub':
+        self._accept_thread = threading.Thread(target=self._accept_clients, daemon=True)
+        self._accept_thread.start()
+        return self
+
+    def stop(self) -> None:
+        # close of listening socket does not wake up blocked accept, port accepts connections until shutdown
+        try:
+            self._server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._server.close()
+        if self._accept_thread is not None:
+            self._accept_thread.join()
+        with self._lock:
+            clients = list(self._filters_by_client)
+        for client in clients:
+            self.disconnect_client(client)
+
+    def disconnect_client(self, client: _ClientConnection = None) -> None:
+        # drop connection of client (all clients if None), as on network failure
+        with self._lock:
+            clients = [client] if client is not None else list(self._filters_by_client)
+        for c in clients:
+            try:
+                c.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def publish(self, topic: str, payload: bytes) -> int:
+        # send message to subscribed clients, returns count of receivers
+        packet = encode_packet(PUBLISH, encode_string(topic.encode()) + payload)
+        with self._lock:
+            clients = set(self._subscriptions.match(topic))
+
+        for client in clients:
+            try:
+                client.send(packet)
+            except OSError:
+                pass
+        return len(clients)
+
+    def wait_subscribed(self, topic_filter: str, timeout: float = 5) -> bool:
+        with self._subscribed:
+            return self._subscribed.wait_for(
+                lambda: any(topic_filter in filters for filters in self._filters_by_client.values()), timeout
+            )
+
+    def _accept_clients(self) -> None:
+        while True:
+            try:
+                sock, _ = self._server.accept()
+            except OSError:
+                break
+
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client = _ClientConnection(self, sock)
+            with self._lock:
+                self._filters_by_client[client] = set()
+            threading.Thread(target=client.serve, daemon=True).start()
+
+    def _on_client_publish(self, topic: str, payload: bytes) -> None:
+        if self.on_publish is not None:
+            self.on_publish(topic, payload)
+        self.publish(topic, payload)
+
+    def _subscribe(self, client: _ClientConnection, topic_filters: List[str]) -> None:
+        with self._subscribed:
+            self.subscribe_packets += 1
+            filters = self._filters_by_client.setdefault(client, set())
+            for topic_filter in topic_filters:
+                if topic_filter not in filters:
+                    filters.add(topic_filter)
+                    self._subscriptions.add(topic_filter, client)
+            self._subscribed.notify_all()
+
+    def _unsubscribe(self, client: _ClientConnection, topic_filters: List[str]) -> None:
+        with self._lock:
+            filters = self._filters_by_client.get(client, set())
+            for topic_filter in topic_filters:
+                if topic_filter in filters:
+                    filters.remove(topic_filter)
+                    self._subscriptions.remove(topic_filter, client)
+
+    def _remove_client(self, client: _ClientConnection) -> None:
+        with self._lock:
+            for topic_filter in self._filters_by_client.pop(client, ()):
+                self._subscriptions.remove(topic_filter, client)
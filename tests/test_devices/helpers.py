@@ -5,12 +5,17 @@ import unittest.mock
 class TimeModulePatcher:
     def __init__(self):
         self.start_test_time = self.current_test_time = time.time()
+        self.current_monotonic_time = time.monotonic()
 
     def time(self):
         return self.current_test_time
 
+    def monotonic(self):
+        return self.current_monotonic_time
+
     def sleep(self, seconds: float):
         self.current_test_time += seconds
+        self.current_monotonic_time += seconds
 
     @property
     def test_duration(self):
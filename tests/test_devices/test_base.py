@@ -47,15 +47,12 @@ class TestBaseDevice(TimeMockTestMixin, TestDeviceMixin, unittest.TestCase):
         device.turn_on()
         self.assert_device_turned_on(device, msg='Must be turned enabled device after turn_on() call')
 
-    def test_get_topics_subscriptions(self):
+    def test_sensor_topic(self):
         device_without_sensor = BaseDevice(name='test', hardware_topic='hardware_topic')
-        self.assertEqual(device_without_sensor.get_topics_subscriptions(), [])
+        self.assertIsNone(device_without_sensor.sensor_topic)
 
         device_with_sensor = BaseDevice(name='test', hardware_topic='hardware_topic', sensor_topic='sensor_topic')
-        self.assertEqual(
-            device_with_sensor.get_topics_subscriptions(),
-            [('sensor_topic', device_with_sensor.on_sensor_data_receive)],
-        )
+        self.assertEqual('sensor_topic', device_with_sensor.sensor_topic)
 
     def test_need_work(self):
         device = BaseDevice(name='without_dep', hardware_topic='hardware_topic')
@@ -92,13 +89,82 @@ class TestBaseDevice(TimeMockTestMixin, TestDeviceMixin, unittest.TestCase):
             device_with_dependencies_delay,
             msg='timeout has come')
 
-    def test_on_sensor_data_receive(self):
+    def test_on_sensor_value(self):
         device = BaseDevice(name='test', hardware_topic='hardware_topic', sensor_topic='sensor_topic')
-        device.on_sensor_data_receive(None)
+        device.on_sensor_value(None)
         self.assertEqual(self.time_mock.time(), device.last_sensor_time)
 
         self.time_mock.sleep(10)
         self.assertEqual(self.time_mock.time() - 10, device.last_sensor_time)
 
+    def test_dependencies_turned_on_pushed_to_dependents(self):
+        mixers = [BaseDevice(name=f'mixer_{i}', hardware_topic='hardware_topic') for i in range(3)]
+        pump = BaseDevice(name='pump', hardware_topic='hardware_topic', dependencies=mixers)
+        pump.on_dependencies_changed = unittest.mock.Mock()
+        for mixer in mixers:
+            mixer.enable()
+
+        mixers[0].turn_on()
+        mixers[1].turn_on()
+        self.assertTrue(pump.dependencies_turned_on)
+        pump.on_dependencies_changed.assert_called_once_with(pump)
+
+        mixers[0].turn_off()
+        self.assertTrue(pump.dependencies_turned_on)
+        mixers[1].disable()
+        self.assertFalse(pump.dependencies_turned_on)
+        self.assertEqual(2, pump.on_dependencies_changed.call_count)
+
+    def test_evaluate(self):
+        mixer = BaseDevice(name='mixer', hardware_topic='hardware_topic')
+        pump = BaseDevice(name='pump', hardware_topic='hardware_topic', dependencies=[mixer], state_changed_timeout=10)
+        mixer.enable()
+        pump.enable()
+        self.assertEqual([], pump.evaluate())
+
+        mixer.turn_on()
+        self.assert_messages_turn_on_device(pump.evaluate())
+        self.assertIsNone(pump.next_evaluation_time())
+
+        mixer.turn_off()
+        self.assertEqual([], pump.evaluate(), msg='Device wait state_changed_timeout')
+        self.assertEqual(self.time_mock.time() + 10, pump.next_evaluation_time())
 
-
+        self.time_mock.sleep(10)
+        self.assertIsNone(pump.next_evaluation_time())
+        self.assert_messages_turn_off_device(pump.evaluate())
+
+    def test_evaluate_on_clock_deadline(self):
+        now = [1.0]
+        mixer = BaseDevice(name='mixer', hardware_topic='hardware_topic')
+        pump = BaseDevice(name='pump', hardware_topic='hardware_topic', dependencies=[mixer], state_changed_timeout=0.2)
+        pump.clock = lambda: now[0]
+        mixer.enable()
+        pump.enable()
+        mixer.turn_on()
+        pump.evaluate()
+
+        mixer.turn_off()
+        deadline = pump.next_evaluation_time()
+        self.assertEqual(1.2, deadline)
+
+        # 1.2 - 1.0 < 0.2 by float
+        now[0] = deadline
+        self.assert_messages_turn_off_device(pump.evaluate(), msg='Device is evaluated by timer on deadline')
+
+    def test_state_times_by_time(self):
+        mixer = BaseDevice(name='mixer', hardware_topic='hardware_topic')
+        pump = BaseDevice(name='pump', hardware_topic='hardware_topic', dependencies=[mixer], state_changed_timeout=10)
+        pump.clock = lambda: 5.0
+        mixer.enable()
+        mixer.turn_on()
+        mixer.turn_off()
+
+        state = pump.get_state()
+        self.assertEqual(self.time_mock.time(), state.last_dependencies_turned_on_time)
+
+        restored_pump = BaseDevice(name='pump', hardware_topic='hardware_topic', state_changed_timeout=10)
+        restored_pump.clock = lambda: 100.0
+        restored_pump.enable()
+        restored_pump.restore_state(state)
+        self.assertEqual(110.0, restored_pump.next_evaluation_time())
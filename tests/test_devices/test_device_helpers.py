@@ -33,3 +33,43 @@ class TestDeviceLoader(unittest.TestCase):
 
         with self.assertRaisesRegex(ValueError, 'Not found device name "b" in devices'):
             loader.load_devices()
+
+    def test_dependencies_cycle(self):
+        self.devices_params['devices._base.BaseDevice'][1]['dependencies'] = ['a']
+        loader = helpers.DeviceLoader(self.devices_params)
+
+        with self.assertRaisesRegex(ValueError, 'cycle: a -> b -> a'):
+            loader.load_devices()
+
+    def test_params_not_modified(self):
+        loader = helpers.DeviceLoader(self.devices_params)
+        loader.load_devices()
+
+        self.assertEqual(['b'], self.devices_params['devices._base.BaseDevice'][0]['dependencies'])
+        self.assertEqual({'validate', 'resolve_classes', 'order', 'build'}, set(loader.stage_timings))
+
+    def test_long_dependencies_chain(self):
+        chain_length = 5000
+        self.devices_params = {
+            'devices._base.BaseDevice': [
+                {
+                    'name': f'd{i}',
+                    'hardware_topic': f'topic/{i}',
+                    'dependencies': [f'd{i + 1}'] if i + 1 < chain_length else [],
+                }
+                for i in range(chain_length)
+            ],
+        }
+
+        with unittest.mock.patch('common.load_module', wraps=helpers.common.load_module) as load_module:
+            devices = helpers.DeviceLoader(self.devices_params).load_devices()
+
+        load_module.assert_called_once_with('devices._base.BaseDevice')
+        self.assertEqual(chain_length, len(devices))
+        self.assertEqual([devices[1]], devices[0]._dependencies)
+
+    def test_device_without_name(self):
+        self.devices_params['devices._base.BaseDevice'][1].pop('name')
+
+        with self.assertRaisesRegex(ValueError, 'Device name is required'):
+            helpers.DeviceLoader(self.devices_params).load_devices()
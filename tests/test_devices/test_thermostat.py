@@ -34,7 +34,13 @@ class TestThermostatDevice(TimeMockTestMixin, TestDeviceMixin, unittest.TestCase
     def send_temp_to_device(self, temp: float, device=None, forward_seconds: float = 1):
         device = device or self.test_device
         self.time_mock.turn_time_forward(forward_seconds)
-        return device.on_sensor_data_receive(MqttMessageReceived(topic='test', payload=str(temp)))
+        event = MqttMessageReceived(topic='test', payload=str(temp).encode())
+        return device.on_sensor_value(device.parse_sensor_value(event))
+
+    def test_decoded_value(self):
+        value = self.test_device.parse_sensor_value(MqttMessageReceived('test', b'not parsed', 20.0))
+        messages = self.test_device.on_sensor_value(value)
+        self.assert_messages_turn_on_device(messages)
 
     def test_on_to_target(self):
         """ test up to target and turn off """
@@ -76,3 +82,19 @@ class TestThermostatDevice(TimeMockTestMixin, TestDeviceMixin, unittest.TestCase
         messages = self.send_temp_to_device(24)
         self.assert_messages_turn_on_device(messages)
         self.assert_device_turned_on()
+
+    def test_restore_state(self):
+        self.send_temp_to_device(21)
+        state = self.test_device.get_state()
+        self.assertEqual((True, 21.0, self.time_mock.time()), state[:3])
+
+        restored_device = thermostat.Thermostat(
+            name='test_thermo', hardware_topic='hw_topic', sensor_topic='sens_topic', target_temperature=23
+        )
+        restored_device.enable()
+        restored_device.restore_state(state)
+        self.assert_device_turned_on(restored_device)
+
+        # 0.5 degree in 10 seconds is not quick temp get up
+        messages = self.send_temp_to_device(21.5, device=restored_device, forward_seconds=10)
+        self.assert_messages_not_change_state_device(messages)
@@ -0,0 +1,70 @@
+import random
+import unittest
+
+from devices import Thermostat, ThermostatBank
+
+from .helpers import TimeMockTestMixin
+
+
+class TestThermostatBank(TimeMockTestMixin, unittest.TestCase):
+    module_reference = 'devices.thermostat.time'
+
+    def setUp(self):
+        super().setUp()
+        self.bank = ThermostatBank()
+
+    def build_thermostat(self, name, target_temperature, hysteresis):
+        thermostat = Thermostat(
+            name=name,
+            hardware_topic=f'{name}/hw',
+            sensor_topic=f'{name}/sensor',
+            target_temperature=target_temperature,
+            hysteresis=hysteresis,
+        )
+        thermostat.enable()
+        self.bank.add(name, target_temperature, hysteresis, now=self.time_mock.time())
+        return thermostat
+
+    def test_on_to_target(self):
+        self.build_thermostat('t', 23, 1)
+        now = self.time_mock.time()
+
+        self.assertEqual([(0, True)], self.bank.evaluate([(0, 21)], now))
+        self.assertEqual([], self.bank.evaluate([(0, 22)], now + 5))
+        self.assertEqual([(0, False)], self.bank.evaluate([(0, 23)], now + 10))
+
+    def test_quick_temp_get_up(self):
+        self.build_thermostat('t', 23, 1)
+        now = self.time_mock.time()
+        self.bank.evaluate([(0, 10)], now)
+
+        with self.assertLogs('devices.thermostat_bank', level='WARNING'):
+            self.assertEqual([(0, False)], self.bank.evaluate([(0, 10.5)], now + 1))
+
+    def test_disabled(self):
+        self.build_thermostat('t', 23, 1)
+        self.bank.evaluate([(0, 20)])
+
+        self.assertEqual([(0, False)], self.bank.disable(0))
+        self.assertEqual([], self.bank.evaluate([(0, 19)]))
+
+    def test_same_as_thermostat(self):
+        random_ = random.Random(42)
+        with self.assertLogs('devices', level='WARNING'):
+            thermostats = [
+                self.build_thermostat(f't{i}', random_.choice((20, 23)), random_.choice((0.5, 1, 2))) for i in range(20)
+            ]
+
+            for _ in range(200):
+                self.time_mock.turn_time_forward(random_.choice((1, 5, 30)))
+                now = self.time_mock.time()
+                readings = [(i, round(random_.uniform(18, 26), 1)) for i in random_.sample(range(20), 5)]
+
+                expected = []
+                for i, temperature in readings:
+                    thermostat = thermostats[i]
+                    if thermostat.on_sensor_value(temperature):
+                        expected.append((i, thermostat.turned_on))
+
+                self.assertEqual(expected, self.bank.evaluate(readings, now))
+            self.assertEqual([t.turned_on for t in thermostats], [bool(v) for v in self.bank.turned_on])
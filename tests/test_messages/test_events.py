@@ -0,0 +1,33 @@
+import pickle
+import unittest
+
+from messages.events import MqttMessageReceived, MqttMessageSend, MqttSubscribe
+
+
+class TestMqttEvents(unittest.TestCase):
+    def test_fields(self):
+        event = MqttMessageReceived(topic='topic', payload='1')
+        self.assertEqual(('topic', '1'), (event.topic, event.payload))
+
+        self.assertIsNone(event.value)
+
+        subscribe = MqttSubscribe('topic')
+        self.assertEqual(0, subscribe.qos)
+        self.assertIsNone(subscribe.codec)
+
+    def test_immutable(self):
+        event = MqttMessageSend('topic', '1')
+
+        with self.assertRaises(AttributeError):
+            event.payload = '0'
+        with self.assertRaises(AttributeError):
+            event.foo = 'bar'
+
+    def test_equal_only_same_type(self):
+        self.assertEqual(MqttMessageSend('topic', '1'), MqttMessageSend('topic', '1'))
+        self.assertNotEqual(MqttMessageSend('topic', '1'), MqttMessageReceived('topic', '1'))
+        self.assertNotEqual(MqttMessageSend('topic', '1'), ('topic', '1'))
+
+    def test_pickle(self):
+        event = MqttSubscribe('topic', 1)
+        self.assertEqual(event, pickle.loads(pickle.dumps(event, protocol=pickle.HIGHEST_PROTOCOL)))
@@ -0,0 +1,57 @@
+import asyncio
+import unittest
+
+import messages
+from plugins import AsyncEventExchange, AsyncMqttPlugin
+
+from benchmarks.mqtt_broker_stub import MqttBrokerStub
+
+TOPIC = '/devices/wb-w1/controls/28-000005fb67b8'
+
+
+class TestAsyncMqttPlugin(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.broker = MqttBrokerStub().start()
+        self.addCleanup(self.broker.stop)
+
+        self.event_exchange = AsyncEventExchange()
+        self.plugin = AsyncMqttPlugin(
+            event_exchange=self.event_exchange,
+            settings={'plugins.AsyncMqttPlugin': {'mqtt_host': self.broker.host, 'mqtt_port': self.broker.port}},
+        )
+
+    async def asyncTearDown(self):
+        self.plugin.stop()
+        await self.plugin.join()
+
+    async def test_subscribe_and_receive(self):
+        self.plugin.start()
+        self.event_exchange.put(messages.events.MqttSubscribe(TOPIC, codec='float'))
+
+        loop = asyncio.get_running_loop()
+        self.assertTrue(await loop.run_in_executor(None, self.broker.wait_subscribed, TOPIC))
+        self.broker.publish(TOPIC, b'21.5')
+
+        event = await asyncio.wait_for(self.event_exchange.get(), timeout=5)
+        self.assertEqual((TOPIC, b'21.5', 21.5), (event.topic, event.payload, event.value))
+
+    async def test_reconnect_after_broker_disconnect(self):
+        self.plugin._reconnect_timeout = 0.01
+        self.plugin.start()
+        self.event_exchange.put(messages.events.MqttSubscribe(TOPIC))
+
+        loop = asyncio.get_running_loop()
+        self.assertTrue(await loop.run_in_executor(None, self.broker.wait_subscribed, TOPIC))
+        with self.assertLogs(level='ERROR'):
+            self.broker.disconnect_client()
+            for _ in range(100):
+                if not self.plugin._client_connected:
+                    break
+                await asyncio.sleep(0.01)
+
+        # resubscribed on connect without waiting keepalive deadline
+        for _ in range(100):
+            if self.broker.subscribe_packets > 1:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(2, self.broker.subscribe_packets)
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import unittest
+import unittest.mock
+
+import messages
+from plugins import (AsyncBaseEventPlugin, AsyncPluginRunManager,
+                     BaseEventPlugin, UnderFloorHeatingMixerPlugin)
+
+
+class AsyncPluginWithReceiveMessage(AsyncBaseEventPlugin):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.handled = asyncio.Event()
+        self.add_event_handler(messages.BaseEvent, self.on_event)
+
+    def on_event(self, event):
+        self.settings['test_handler'](event)
+        self.handled.set()
+
+
+class SyncPluginWithResend(BaseEventPlugin):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.add_event_handler(messages.events.MqttMessageReceived, lambda event: self.send_event(messages.BaseEvent()))
+
+    def tick(self) -> None:
+        pass
+
+    def stop(self):
+        self.send_event(messages.BaseEvent())
+        super().stop()
+
+
+class TestAsyncPluginRunManager(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.event_handler_mock = unittest.mock.Mock()
+
+        self.test_manager = AsyncPluginRunManager(
+            plugins=[AsyncPluginWithReceiveMessage, SyncPluginWithResend],
+            plugins_settings={
+                '.AsyncPluginWithReceiveMessage': {'test_handler': self.event_handler_mock},
+                '.SyncPluginWithResend': {},
+            },
+        )
+        self.receiver, self.adapter = self.test_manager.plugins
+
+    async def test_route_through_sync_plugin(self):
+        self.test_manager.start()
+
+        self.receiver.send_event(messages.events.MqttMessageReceived('topic', '1'))
+        await asyncio.wait_for(self.receiver.handled.wait(), timeout=1)
+
+        self.event_handler_mock.assert_called_once()
+        await self.test_manager.stop()
+
+    async def test_stop(self):
+        self.test_manager.start()
+        await self.test_manager.stop()
+
+        self.event_handler_mock.assert_called_once()
+        self.assertFalse(self.receiver.is_running)
+        self.assertFalse(self.adapter.plugin.is_running)
+
+
+SENSOR_TOPIC = '/devices/wb-w1/controls/28-000005fb67b8'
+
+
+class TestAsyncPluginRunManagerWithHeatingPlugin(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.events = []
+
+        self.test_manager = AsyncPluginRunManager(
+            plugins=[AsyncPluginWithReceiveMessage, UnderFloorHeatingMixerPlugin],
+            plugins_settings={
+                '.AsyncPluginWithReceiveMessage': {'test_handler': self.events.append},
+                'plugins.UnderFloorHeatingMixerPlugin': {
+                    'devices': {
+                        'devices.thermostat.Thermostat': [
+                            {
+                                'name': 'mixer',
+                                'sensor_topic': SENSOR_TOPIC,
+                                'hardware_topic': '/devices/wb-gpio/controls/EXT1_K1/on',
+                                'target_temperature': 22,
+                            },
+                        ],
+                    },
+                },
+            },
+        )
+        self.receiver, self.adapter = self.test_manager.plugins
+
+    async def test_route_subscribe_sent_on_init(self):
+        self.test_manager.start()
+
+        await asyncio.wait_for(self.receiver.handled.wait(), timeout=1)
+        self.assertEqual([messages.events.MqttSubscribe(SENSOR_TOPIC, 1, 'float')], self.events)
+        await self.test_manager.stop()
+
+    async def test_forward_events_sent_from_other_thread(self):
+        self.test_manager.start()
+        await asyncio.wait_for(self.receiver.handled.wait(), timeout=1)
+        self.receiver.handled.clear()
+
+        thread = threading.Thread(target=self.adapter.plugin.send_event, args=(messages.BaseEvent(),))
+        thread.start()
+        thread.join()
+
+        await asyncio.wait_for(self.receiver.handled.wait(), timeout=1)
+        self.assertIsInstance(self.events[-1], messages.BaseEvent)
+        await self.test_manager.stop()
@@ -33,3 +33,38 @@ class TestBasePlugin(unittest.TestCase):
         log = logs[0]
         self.assertIn(f'On run tick:', log)
         self.assertIn(f'foo', log)
+
+
+class TestPluginTimers(unittest.TestCase):
+    def setUp(self):
+        self.test_plugin = BasePlugin(tick_timeout=None)
+        self.test_plugin.tick = unittest.mock.Mock()
+
+    def test_next_tick_timeout(self):
+        self.assertIsNone(self.test_plugin._next_tick_timeout())
+
+        self.test_plugin.call_later(10, unittest.mock.Mock())
+        self.assertAlmostEqual(10, self.test_plugin._next_tick_timeout(), delta=0.1)
+
+        self.test_plugin.tick_timeout = 1
+        self.assertEqual(1, self.test_plugin._next_tick_timeout())
+
+    def test_timer_run_before_tick(self):
+        calls = []
+        self.test_plugin.tick.side_effect = lambda: calls.append('tick')
+        self.test_plugin.call_later(0, calls.append, 'timer')
+        self.test_plugin.call_later(10, calls.append, 'late timer')
+
+        self.test_plugin.run_tick()
+
+        self.assertEqual(['timer', 'tick'], calls)
+        self.assertEqual(1, self.test_plugin.wakeups)
+
+    def test_error_in_timer(self):
+        self.test_plugin.call_later(0, unittest.mock.Mock(side_effect=KeyError('foo')))
+
+        with self.assertLogs(level='ERROR') as cm:
+            self.test_plugin.run_tick()
+
+        self.assertIn('On run timer', cm.output[0])
+        self.test_plugin.tick.assert_called_once()
@@ -0,0 +1,64 @@
+import unittest
+
+from plugins._codecs import PayloadDecoders, get_decoder
+
+
+class TestDecoders(unittest.TestCase):
+    def test_decoders(self):
+        self.assertEqual(21.5, get_decoder('float')(b'21.5'))
+        self.assertEqual(3, get_decoder('int')(b'3'))
+        self.assertEqual(True, get_decoder('bool')(b'ON '))
+        self.assertEqual(False, get_decoder('bool')(b'0'))
+        self.assertEqual({'t': 1}, get_decoder('json')(b'{"t": 1}'))
+        self.assertEqual('text', get_decoder('str')(b'text'))
+        self.assertIsNone(get_decoder(None))
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            get_decoder('yaml')
+
+
+class TestPayloadDecoders(unittest.TestCase):
+    def setUp(self):
+        self.decoders = PayloadDecoders()
+
+    def test_decode_by_filter(self):
+        self.decoders.add('/sensors/+', 'float')
+
+        self.assertEqual(21.5, self.decoders.decode('/sensors/floor', b'21.5'))
+        self.assertIsNone(self.decoders.decode('/relays/floor', b'1'), msg='Raw payload without codec')
+
+    def test_broken_payload(self):
+        self.decoders.add('/sensors/+', 'float')
+
+        with self.assertLogs(level='WARNING'):
+            self.assertIsNone(self.decoders.decode('/sensors/floor', b'error'))
+
+    def test_remove(self):
+        self.decoders.add('/sensors/+', 'float')
+        self.assertEqual(21.5, self.decoders.decode('/sensors/floor', b'21.5'))
+
+        self.decoders.remove('/sensors/+')
+        self.assertIsNone(self.decoders.decode('/sensors/floor', b'21.5'), msg='Cache must be dropped')
+
+    def test_same_codec_of_filter(self):
+        self.decoders.add('/sensors/+', 'float')
+        self.decoders.add('/sensors/+', 'float')
+
+        self.decoders.remove('/sensors/+')
+        self.assertIsNone(self.decoders.decode('/sensors/floor', b'21.5'))
+
+    def test_conflicting_codec_of_filter(self):
+        self.decoders.add('/sensors/+', 'float')
+
+        with self.assertRaises(ValueError):
+            self.decoders.add('/sensors/+', 'json')
+        self.assertEqual(21.5, self.decoders.decode('/sensors/floor', b'21.5'))
+
+    def test_topic_of_filters_with_different_codecs(self):
+        self.decoders.add('/sensors/+', 'float')
+        self.decoders.add('/sensors/#', 'str')
+
+        with self.assertLogs(level='ERROR'):
+            self.assertIsNone(self.decoders.decode('/sensors/floor', b'21.5'))
+        self.assertEqual('on', self.decoders.decode('/sensors/floor/state', b'on'))
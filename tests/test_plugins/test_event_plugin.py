@@ -1,3 +1,5 @@
+import threading
+import time
 import unittest
 import unittest.mock
 from queue import Queue
@@ -25,6 +27,21 @@ class TestEventPlugin(unittest.TestCase):
 
         handler.assert_called_once_with(event)
 
+    def test_handle_batch(self):
+        events = [BaseEvent() for _ in range(3)]
+        self.event_exchange.put_batch(events)
+
+        with unittest.mock.patch.object(self.test_plugin, 'handle_events') as handle_events_mock:
+            self.test_plugin._before_tick()
+
+        handle_events_mock.assert_called_once_with(events)
+
+    def test_send_events(self):
+        events = [BaseEvent() for _ in range(3)]
+        self.test_plugin.send_events(events)
+
+        self.assertEqual(events, self.event_exchange.get_batch(10))
+
     def test_send_message(self):
         event = BaseEvent()
         self.test_plugin.send_event(event)
@@ -79,11 +96,107 @@ class TestEventPlugin(unittest.TestCase):
         handler.assert_not_called()
 
 
+class TestEventExchangeWakeup(unittest.TestCase):
+    def setUp(self):
+        self.event_exchange = EventExchange(
+            incoming_message_queue=Queue(),
+            outgoing_message_queue=Queue(),
+            incoming_wakeup=threading.Event(),
+            outgoing_wakeup=threading.Event(),
+        )
+
+    def test_wake_on_put(self):
+        threading.Timer(0.01, self.event_exchange.put, args=(BaseEvent(),)).start()
+
+        start = time.monotonic()
+        self.event_exchange.wait_incoming(timeout=5)
+        self.assertLess(time.monotonic() - start, 1, msg='Must wake up on incoming message')
+        self.assertFalse(self.event_exchange.incoming_wakeup.is_set(), msg='Wakeup must be cleared after wait')
+
+    def test_wake_on_send(self):
+        self.event_exchange.send_message(BaseEvent())
+        self.assertTrue(self.event_exchange.outgoing_wakeup.is_set())
+
+    def test_plugin_wake_on_deadline_only(self):
+        test_plugin = BaseEventPlugin(event_exchange=self.event_exchange, tick_timeout=None)
+        test_plugin.tick = unittest.mock.Mock()
+        timer_fired = threading.Event()
+        test_plugin.call_later(0.05, timer_fired.set)
+
+        test_plugin.start()
+        fired = timer_fired.wait(timeout=5)
+        time.sleep(0.1)
+        test_plugin.join()
+
+        self.assertTrue(fired)
+        # first tick, tick on deadline and tick on stop wakeup
+        self.assertLessEqual(test_plugin.wakeups, 3)
+
+    def test_polling_with_distant_timer(self):
+        event_exchange = EventExchange(incoming_message_queue=Queue(), outgoing_message_queue=Queue())
+        test_plugin = BaseEventPlugin(event_exchange=event_exchange, tick_timeout=None)
+        test_plugin.tick = unittest.mock.Mock()
+        handled = threading.Event()
+        test_plugin.add_event_handler(BaseEvent, lambda event: handled.set())
+        test_plugin.call_later(3, unittest.mock.Mock())
+
+        test_plugin.start()
+        self.addCleanup(test_plugin.join)
+        time.sleep(0.05)
+        event_exchange.put(BaseEvent())
+
+        # without wakeup event incoming messages are polled, not after timer deadline
+        self.assertTrue(handled.wait(timeout=0.5))
+
+    def test_stop_timeout_on_stuck_tick(self):
+        test_plugin = BaseEventPlugin(event_exchange=self.event_exchange, tick_timeout=None)
+        test_plugin.stop_timeout = 0.05
+        release = threading.Event()
+        test_plugin.tick = lambda: release.wait(5)
+        self.addCleanup(release.set)
+        test_plugin.start()
+
+        started = time.monotonic()
+        with self.assertLogs(level='ERROR'):
+            test_plugin.stop()
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_stop_idempotent(self):
+        test_plugin = BaseEventPlugin(event_exchange=self.event_exchange, tick_timeout=None)
+        test_plugin.tick = unittest.mock.Mock()
+        test_plugin.start()
+
+        with unittest.mock.patch.object(test_plugin, '_before_tick') as before_tick:
+            test_plugin.stop()
+            test_plugin.stop()
+            test_plugin.join()
+
+        before_tick.assert_called_once()
+
+    def test_stop_handle_rest_events_after_thread_stopped(self):
+        test_plugin = BaseEventPlugin(event_exchange=self.event_exchange, tick_timeout=None)
+        test_plugin.tick = unittest.mock.Mock()
+        handled_with_plugin_thread_alive = []
+        test_plugin.add_event_handler(
+            BaseEvent, lambda event: handled_with_plugin_thread_alive.append(test_plugin.is_alive())
+        )
+        test_plugin.start()
+        while not test_plugin.wakeups:
+            time.sleep(0.01)
+        time.sleep(0.05)
+
+        # plugin thread waits wakeup, event is handled on stop
+        self.event_exchange.incoming_message_queue.put(BaseEvent())
+        test_plugin.stop()
+
+        self.assertEqual([False], handled_with_plugin_thread_alive)
+
+
 class DummyEventPlugin(BaseEventPlugin):
     def tick(self) -> None:
         pass
 
-    # @handle_event(BaseEvent)
+    @handle_event(BaseEvent)
     def resend_message(self, event):
         self.send_event(event)
 
@@ -93,7 +206,6 @@ class TestHandleEventDeco(unittest.TestCase):
         self.event_exchange = EventExchange(incoming_message_queue=Queue(), outgoing_message_queue=Queue())
         self.test_plugin = DummyEventPlugin(event_exchange=self.event_exchange)
 
-    @unittest.skip('before repair')
     def test_ok(self):
         event = BaseEvent()
         self.event_exchange.put(event)
@@ -102,3 +214,35 @@ class TestHandleEventDeco(unittest.TestCase):
 
         incoming_message = self.event_exchange.get()
         self.assertIs(event, incoming_message)
+
+    def test_handle_subclass_event(self):
+        event = TestEvent()
+        self.event_exchange.put(event)
+
+        self.test_plugin._before_tick()
+
+        self.assertIs(event, self.event_exchange.get())
+
+    def test_overridden_without_decorator(self):
+        class OverriddenPlugin(DummyEventPlugin):
+            def resend_message(self, event):
+                pass
+
+        plugin = OverriddenPlugin(event_exchange=self.event_exchange)
+        self.assertEqual(frozenset(), plugin.consumed_event_types)
+
+    def test_dispatch_cache_invalidated(self):
+        self.assertEqual(1, len(self.test_plugin.get_event_handlers(TestEvent)))
+
+        handler = unittest.mock.Mock()
+        self.test_plugin.add_event_handler(TestEvent, handler)
+
+        self.assertEqual((handler, self.test_plugin.resend_message), self.test_plugin.get_event_handlers(TestEvent))
+
+    def test_consumed_event_types_snapshot(self):
+        consumed_event_types = self.test_plugin.consumed_event_types
+        self.test_plugin.add_event_handler(TestEvent, unittest.mock.Mock())
+
+        self.assertEqual(frozenset([BaseEvent]), consumed_event_types, msg='Read types are not changed by add')
+        self.assertEqual(frozenset([BaseEvent, TestEvent]), self.test_plugin.consumed_event_types)
+        self.assertIs(self.test_plugin.consumed_event_types, self.test_plugin.consumed_event_types)
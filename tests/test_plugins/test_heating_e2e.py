@@ -0,0 +1,51 @@
+import unittest
+from queue import Queue
+
+from benchmarks.bench_e2e_load import (COLD, HOT, RELAY_TOPIC_TEMPLATE,
+                                       HeatingPipeline, run_load)
+
+
+class TestHeatingPipeline(unittest.TestCase):
+    def setUp(self):
+        self.published = Queue()
+        self.pipeline = HeatingPipeline(2, on_publish=lambda topic, payload: self.published.put((topic, payload)))
+        self.pipeline.start()
+        self.addCleanup(self.pipeline.stop)
+
+    def test_sensor_to_relay(self):
+        self.pipeline.send_reading(1, COLD)
+        self.assertEqual((RELAY_TOPIC_TEMPLATE.format(1), b'1'), self.published.get(timeout=5))
+
+        self.pipeline.send_reading(1, HOT)
+        self.assertEqual((RELAY_TOPIC_TEMPLATE.format(1), b'0'), self.published.get(timeout=5))
+
+
+class TestPublishWindow(unittest.TestCase):
+    def test_coalesce_readings_in_window(self):
+        published = Queue()
+        pipeline = HeatingPipeline(
+            2, on_publish=lambda topic, payload: published.put((topic, payload)), publish_window=0.5
+        )
+        pipeline.start()
+        self.addCleanup(pipeline.stop)
+
+        for payload in (COLD, HOT, COLD):
+            pipeline.send_reading(1, payload)
+
+        self.assertEqual((RELAY_TOPIC_TEMPLATE.format(1), b'1'), published.get(timeout=5), msg='Last command published')
+        self.assertTrue(published.empty())
+        self.assertEqual(2, pipeline.mqtt.publish_stats['coalesced'])
+
+
+class TestLoad(unittest.TestCase):
+    def test_load(self):
+        result = run_load(sensors_count=5, rate=500, duration=0.2)
+
+        # relay commands of one sensor in publish window are coalesced to last one or skipped (already published),
+        # so not every reading is published, but no command is lost and last reading of sensor drives relay
+        publish_stats = result['publish_stats']
+        self.assertEqual(
+            result['readings'], publish_stats['published'] + publish_stats['coalesced'] + publish_stats['skipped']
+        )
+        self.assertLessEqual(result['published'], result['readings'])
+        self.assertEqual(result['expected_relay_states'], result['relay_states'])
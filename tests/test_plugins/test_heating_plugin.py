@@ -0,0 +1,248 @@
+import os
+import tempfile
+import unittest
+import unittest.mock
+from queue import Queue
+
+import messages
+from devices import Thermostat
+from plugins import EventExchange, UnderFloorHeatingMixerPlugin
+
+from tests.test_devices.helpers import TimeMockTestMixin
+
+SENSOR_TOPIC = '/devices/wb-w1/controls/28-000005fb67b8'
+
+
+PUMP_TOPIC = '/devices/wb-mr6cu_47/controls/K2/on'
+
+
+def heating_settings(thermostats_count: int, pump_timeout: float = None) -> dict:
+    devices_settings = {
+        'devices.thermostat.Thermostat': [
+            {
+                'name': f'mixer_{i}',
+                'sensor_topic': SENSOR_TOPIC,
+                'hardware_topic': f'/devices/wb-gpio/controls/EXT1_K{i}/on',
+                'target_temperature': 22,
+            }
+            for i in range(thermostats_count)
+        ],
+    }
+    if pump_timeout is not None:
+        devices_settings['devices.pump.Pump'] = [
+            {
+                'name': 'pump',
+                'hardware_topic': PUMP_TOPIC,
+                'state_changed_timeout': pump_timeout,
+                'dependencies': [f'mixer_{i}' for i in range(thermostats_count)],
+            },
+        ]
+    return {'plugins.UnderFloorHeatingMixerPlugin': {'devices': devices_settings}}
+
+
+class TestUnderFloorHeatingMixerPlugin(TimeMockTestMixin, unittest.TestCase):
+    # plugin timers and device run-on deadlines
+    module_reference = 'plugins._timers.time'
+
+    def setUp(self):
+        super().setUp()
+        self.event_exchange = EventExchange(incoming_message_queue=Queue(), outgoing_message_queue=Queue())
+
+    def build_plugin(self, thermostats_count: int, pump_timeout: float = None) -> UnderFloorHeatingMixerPlugin:
+        return UnderFloorHeatingMixerPlugin(
+            event_exchange=self.event_exchange, settings=heating_settings(thermostats_count, pump_timeout)
+        )
+
+    def send_reading(self, plugin: UnderFloorHeatingMixerPlugin, payload: bytes):
+        self.event_exchange.put(messages.events.MqttMessageReceived(SENSOR_TOPIC, payload))
+        plugin.run_tick()
+        return [command for command in self.event_exchange.get_batch(100) if command.topic == PUMP_TOPIC]
+
+    def test_subscribe_once_for_shared_sensor(self):
+        self.build_plugin(5)
+
+        subscribes = self.event_exchange.get_batch(100)
+        self.assertEqual([messages.events.MqttSubscribe(SENSOR_TOPIC, 1, 'float')], subscribes)
+
+    def test_fan_out_shared_sensor(self):
+        parse_sensor_value = unittest.mock.Mock(side_effect=Thermostat.parse_sensor_value)
+        with unittest.mock.patch.object(Thermostat, 'parse_sensor_value', parse_sensor_value):
+            plugin = self.build_plugin(5)
+        self.event_exchange.get_batch(100)
+
+        with unittest.mock.patch.object(plugin, 'send_events', wraps=plugin.send_events) as send_events:
+            self.event_exchange.put(messages.events.MqttMessageReceived(SENSOR_TOPIC, b'10'))
+            plugin._before_tick()
+
+        parse_sensor_value.assert_called_once()
+        send_events.assert_called_once()
+        commands = self.event_exchange.get_batch(100)
+        self.assertEqual(5, len(commands))
+        self.assertEqual({'1'}, {command.payload for command in commands})
+        self.assertTrue(all(device.turned_on for device in plugin._plugin_devices))
+
+    def test_thermostats_of_sensor_evaluated_by_bank(self):
+        plugin = self.build_plugin(5)
+        self.event_exchange.get_batch(100)
+
+        bank = plugin._thermostat_bank
+        with unittest.mock.patch.object(bank, 'evaluate', wraps=bank.evaluate) as evaluate:
+            self.send_reading(plugin, b'10')
+            evaluate.assert_called_once()
+            self.assertEqual([(i, 10.0) for i in range(5)], evaluate.call_args.args[0])
+        self.assertTrue(all(device.turned_on for device in plugin._plugin_devices))
+
+        # devices turned off outside of bank (stale sensor) are turned on again by reading
+        for device in plugin._plugin_devices:
+            device.turn_off()
+        self.event_exchange.get_batch(100)
+        self.send_reading(plugin, b'9')
+        self.assertTrue(all(device.turned_on for device in plugin._plugin_devices))
+        self.assertEqual(9.0, plugin._plugin_devices[0].get_state().last_sensor_value)
+
+    def test_pump_driven_by_mixers(self):
+        plugin = self.build_plugin(2, pump_timeout=0)
+        plugin.run_tick()
+        self.event_exchange.get_batch(100)
+
+        self.assertEqual([messages.events.MqttMessageSend(PUMP_TOPIC, '1')], self.send_reading(plugin, b'10'))
+        # quick temp get up turns mixers off
+        self.assertEqual([messages.events.MqttMessageSend(PUMP_TOPIC, '0')], self.send_reading(plugin, b'30'))
+        self.assertEqual(2, plugin.evaluation_stats['commands'])
+        self.assertLess(plugin.evaluation_stats['max_latency'], 1)
+
+    def test_pump_off_after_state_changed_timeout(self):
+        plugin = self.build_plugin(1, pump_timeout=0.05)
+        self.send_reading(plugin, b'10')
+        self.assertEqual([], self.send_reading(plugin, b'30'), msg='Pump works state_changed_timeout')
+
+        self.assertIsNotNone(plugin.timers.next_deadline())
+        self.time_mock.sleep(0.04)
+        plugin.run_tick()
+        self.assertEqual([], self.event_exchange.get_batch(100))
+
+        self.time_mock.sleep(0.01)
+        self.assertEqual(plugin.timers.next_deadline(), plugin.timers.clock(), msg='Run-on deadline is timer deadline')
+        plugin.run_tick()
+        self.assertEqual([messages.events.MqttMessageSend(PUMP_TOPIC, '0')], self.event_exchange.get_batch(100))
+
+    def test_stale_sensor_turn_off(self):
+        settings = heating_settings(2, pump_timeout=0)
+        settings['plugins.UnderFloorHeatingMixerPlugin']['sensor_timeout'] = 0.05
+        plugin = UnderFloorHeatingMixerPlugin(event_exchange=self.event_exchange, settings=settings)
+        self.send_reading(plugin, b'10')
+
+        with self.assertLogs('plugins._watchdog', level='WARNING'):
+            self.time_mock.sleep(0.05)
+            plugin.run_tick()
+
+        events = self.event_exchange.get_batch(100)
+        self.assertEqual(messages.events.SensorStale(SENSOR_TOPIC), events[0])
+        self.assertEqual({'0'}, {event.payload for event in events[1:]})
+        self.assertEqual(4, len(events), msg='Mixers and pump are turned off')
+
+        self.event_exchange.put(messages.events.MqttMessageReceived(SENSOR_TOPIC, b'10'))
+        plugin.run_tick()
+        self.assertIn(messages.events.SensorRecovered(SENSOR_TOPIC), self.event_exchange.get_batch(100))
+
+    def test_warm_restart(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        settings = heating_settings(2, pump_timeout=0)
+        settings['plugins.UnderFloorHeatingMixerPlugin']['snapshot_path'] = os.path.join(tmp_dir.name, 'snapshot')
+        settings['plugins.UnderFloorHeatingMixerPlugin']['keep_state_on_stop'] = True
+
+        plugin = UnderFloorHeatingMixerPlugin(event_exchange=self.event_exchange, settings=settings)
+        self.send_reading(plugin, b'10')
+        plugin.stop()
+        self.assertEqual([], self.event_exchange.get_batch(100), msg='Devices keep state on stop')
+
+        restarted_plugin = UnderFloorHeatingMixerPlugin(event_exchange=self.event_exchange, settings=settings)
+        restarted_plugin.run_tick()
+        self.assertTrue(all(device.turned_on for device in restarted_plugin._plugin_devices))
+        self.assertEqual(
+            [messages.events.MqttSubscribe(SENSOR_TOPIC, 1, 'float')],
+            self.event_exchange.get_batch(100),
+            msg='No relay commands after restart',
+        )
+
+        # first reading is compared with last reading before restart
+        self.assertEqual(10.0, restarted_plugin._plugin_devices[0].get_state().last_sensor_value)
+
+    def test_turn_off_on_stop_with_snapshot(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        settings = heating_settings(2, pump_timeout=0)
+        settings['plugins.UnderFloorHeatingMixerPlugin']['snapshot_path'] = os.path.join(tmp_dir.name, 'snapshot')
+
+        plugin = UnderFloorHeatingMixerPlugin(event_exchange=self.event_exchange, settings=settings)
+        self.send_reading(plugin, b'10')
+        plugin.stop()
+        commands = [
+            event for event in self.event_exchange.get_batch(100) if isinstance(event, messages.events.MqttMessageSend)
+        ]
+        self.assertEqual({'0'}, {command.payload for command in commands}, msg='Relays are turned off by default')
+
+        restarted_plugin = UnderFloorHeatingMixerPlugin(event_exchange=self.event_exchange, settings=settings)
+        restarted_plugin.run_tick()
+        self.assertFalse(any(device.turned_on for device in restarted_plugin._plugin_devices))
+
+    def test_turn_off_on_failed_snapshot_write(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        settings = heating_settings(2, pump_timeout=0)
+        settings['plugins.UnderFloorHeatingMixerPlugin']['snapshot_path'] = os.path.join(tmp_dir.name, 'snapshot')
+        settings['plugins.UnderFloorHeatingMixerPlugin']['keep_state_on_stop'] = True
+
+        plugin = UnderFloorHeatingMixerPlugin(event_exchange=self.event_exchange, settings=settings)
+        self.send_reading(plugin, b'10')
+        with unittest.mock.patch.object(plugin._snapshot, 'write', side_effect=OSError('No space left on device')):
+            with self.assertLogs('plugins.underfloor_heating_mixer', 'ERROR'):
+                plugin.stop()
+
+        commands = [
+            event for event in self.event_exchange.get_batch(100) if isinstance(event, messages.events.MqttMessageSend)
+        ]
+        self.assertEqual(3, len(commands), msg='Relays are turned off without snapshot')
+        self.assertEqual({'0'}, {command.payload for command in commands})
+
+    def test_keep_state_on_stop_needs_snapshot(self):
+        settings = heating_settings(2)
+        settings['plugins.UnderFloorHeatingMixerPlugin']['keep_state_on_stop'] = True
+        with self.assertRaises(ValueError):
+            UnderFloorHeatingMixerPlugin(event_exchange=self.event_exchange, settings=settings)
+
+    def test_cold_restart_on_expired_snapshot(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        settings = heating_settings(2, pump_timeout=0)
+        plugin_settings = settings['plugins.UnderFloorHeatingMixerPlugin']
+        plugin_settings['snapshot_path'] = os.path.join(tmp_dir.name, 'snapshot')
+
+        plugin = UnderFloorHeatingMixerPlugin(event_exchange=self.event_exchange, settings=settings)
+        self.send_reading(plugin, b'10')
+        plugin.stop()
+        self.event_exchange.get_batch(100)
+
+        plugin_settings['snapshot_max_age'] = 0
+        restarted_plugin = UnderFloorHeatingMixerPlugin(event_exchange=self.event_exchange, settings=settings)
+        restarted_plugin.run_tick()
+
+        commands = [
+            event for event in self.event_exchange.get_batch(100) if isinstance(event, messages.events.MqttMessageSend)
+        ]
+        self.assertEqual(3, len(commands), msg='Relays left on by previous run are turned off')
+        self.assertEqual({'0'}, {command.payload for command in commands})
+
+    def test_stop_once(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        settings = heating_settings(2)
+        settings['plugins.UnderFloorHeatingMixerPlugin']['snapshot_path'] = os.path.join(tmp_dir.name, 'snapshot')
+        plugin = UnderFloorHeatingMixerPlugin(event_exchange=self.event_exchange, settings=settings)
+
+        with unittest.mock.patch.object(plugin, 'write_snapshot') as write_snapshot:
+            plugin.stop()
+            plugin.stop()
+
+        write_snapshot.assert_called_once()
@@ -0,0 +1,66 @@
+import queue
+import threading
+import unittest
+import unittest.mock
+
+import paho.mqtt.client
+from plugins._mqtt_connection import STATE_CONNECTED, MqttConnection
+
+
+class TestMqttConnection(unittest.TestCase):
+    def test_backoff_delay(self):
+        connection = MqttConnection(paho.mqtt.client.Client(), '127.0.0.1', min_backoff=1, max_backoff=10)
+
+        for failed_attempts, max_delay in ((0, 1), (1, 2), (3, 8), (4, 10), (100, 10)):
+            delay = connection.backoff_delay(failed_attempts)
+            self.assertLessEqual(max_delay / 2, delay)
+            self.assertLessEqual(delay, max_delay)
+
+    def test_lazy_connect(self):
+        connected = threading.Event()
+        # nobody listen port: start is not blocked, connect is retried
+        connection = MqttConnection(
+            paho.mqtt.client.Client(),
+            '127.0.0.1',
+            port=1,
+            min_backoff=0.01,
+            max_backoff=0.02,
+            on_connect=lambda *args: connected.set(),
+        )
+        with self.assertLogs(level='WARNING'):
+            connection.start()
+            for _ in range(100):
+                if connection.connect_attempts > 1:
+                    break
+                connected.wait(0.01)
+        connection.stop()
+
+        self.assertGreater(connection.connect_attempts, 1)
+        self.assertFalse(connected.is_set())
+        self.assertNotEqual(STATE_CONNECTED, connection.state)
+
+    def test_callback_error_in_loop(self):
+        client = unittest.mock.Mock(spec=paho.mqtt.client.Client)
+        disconnected = threading.Event()
+        looped_after_error = threading.Event()
+        client.socket.side_effect = lambda: None if disconnected.is_set() else object()
+        client.disconnect.side_effect = disconnected.set
+
+        def loop(timeout):
+            if client.loop.call_count == 1:
+                raise queue.Full
+            looped_after_error.set()
+            disconnected.wait(0.01)
+
+        client.loop.side_effect = loop
+        connection = MqttConnection(client, '127.0.0.1', min_backoff=10)
+        connection.state = STATE_CONNECTED
+        with self.assertLogs(level='ERROR'):
+            connection.start()
+            self.assertTrue(looped_after_error.wait(1))
+
+        # local error of callback does not drop connection
+        client.disconnect.assert_not_called()
+        self.assertEqual(STATE_CONNECTED, connection.state)
+        connection.stop()
+        self.assertFalse(connection._thread.is_alive())
@@ -0,0 +1,255 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from queue import Queue
+
+import messages
+from plugins import EventExchange, MqttPlugin
+from plugins._spool import MessageSpool
+
+from benchmarks.mqtt_broker_stub import MqttBrokerStub
+
+
+class TestMqttPlugin(unittest.TestCase):
+    def setUp(self):
+        self.published = Queue()
+        self.broker = MqttBrokerStub(on_publish=lambda topic, payload: self.published.put((topic, payload)))
+        self.broker.start()
+        self.addCleanup(self.broker.stop)
+
+        self.event_exchange = EventExchange(
+            incoming_message_queue=Queue(),
+            outgoing_message_queue=Queue(),
+            incoming_wakeup=threading.Event(),
+        )
+        self.test_plugin = MqttPlugin(
+            event_exchange=self.event_exchange,
+            settings={
+                'plugins.MqttPlugin': {
+                    'mqtt_host': self.broker.host,
+                    'mqtt_port': self.broker.port,
+                    'reconnect_min_timeout': 0.05,
+                },
+            },
+        )
+        self.test_plugin.start()
+        self.addCleanup(self.test_plugin.join)
+
+    def test_publish(self):
+        # can be handled before connect
+        self.event_exchange.put(messages.events.MqttMessageSend('/relay/on', '1'))
+        self.assertEqual(('/relay/on', b'1'), self.published.get(timeout=5))
+
+        self.event_exchange.put(messages.events.MqttMessageSend('/relay/on', '0'))
+        self.assertEqual(('/relay/on', b'0'), self.published.get(timeout=5))
+
+    def test_subscribe_and_receive(self):
+        self.event_exchange.put(messages.events.MqttSubscribe('/sensors/+', 1))
+        self.assertTrue(self.broker.wait_subscribed('/sensors/+'))
+
+        self.assertEqual(messages.events.MqttConnected('default'), self.event_exchange.outgoing_message_queue.get(timeout=5))
+
+        self.broker.publish('/sensors/floor', b'21.5')
+        event = self.event_exchange.outgoing_message_queue.get(timeout=5)
+        self.assertEqual(messages.events.MqttMessageReceived('/sensors/floor', b'21.5'), event)
+
+    def test_decode_payload_by_codec(self):
+        self.event_exchange.put(messages.events.MqttSubscribe('/sensors/+', 1, 'float'))
+        self.assertTrue(self.broker.wait_subscribed('/sensors/+'))
+        self.assertEqual(messages.events.MqttConnected('default'), self.event_exchange.outgoing_message_queue.get(timeout=5))
+
+        self.broker.publish('/sensors/floor', b'21.5')
+        event = self.event_exchange.outgoing_message_queue.get(timeout=5)
+        self.assertEqual(messages.events.MqttMessageReceived('/sensors/floor', b'21.5', 21.5), event)
+
+    def test_bulk_subscribe(self):
+        self.assertEqual(messages.events.MqttConnected('default'), self.event_exchange.outgoing_message_queue.get(timeout=5))
+
+        events = [messages.events.MqttSubscribe(f'/sensors/{i}', 1) for i in range(100)]
+        events.append(messages.events.MqttSubscribe('/sensors/0', 1))  # by other plugin
+        self.event_exchange.put_batch(events)
+        self.assertTrue(self.broker.wait_subscribed('/sensors/99'))
+        self.assertEqual(1, self.broker.subscribe_packets)
+
+        self.event_exchange.put(messages.events.MqttUnsubscribe('/sensors/0'))
+        self.event_exchange.put(messages.events.MqttUnsubscribe('/sensors/1'))
+        for _ in range(500):
+            if '/sensors/1' not in self.broker.subscribed_topics:
+                break
+            time.sleep(0.01)
+
+        self.assertNotIn('/sensors/1', self.broker.subscribed_topics)
+        self.assertIn('/sensors/0', self.broker.subscribed_topics)
+
+    def test_reconnect(self):
+        outgoing_message_queue = self.event_exchange.outgoing_message_queue
+        self.assertEqual(messages.events.MqttConnected('default'), outgoing_message_queue.get(timeout=5))
+
+        with self.assertLogs('plugins._mqtt_shards', level='ERROR'):
+            self.broker.disconnect_client()
+            self.assertIsInstance(outgoing_message_queue.get(timeout=5), messages.events.MqttDisconnected)
+
+        self.assertEqual(messages.events.MqttConnected('default'), outgoing_message_queue.get(timeout=5))
+        stats = self.test_plugin.connections_stats['default']
+        self.assertEqual(1, stats['reconnects'])
+        self.assertGreater(stats['last_time_to_reconnect'], 0)
+        self.assertGreaterEqual(stats['disconnected_time'], stats['last_time_to_reconnect'])
+
+        # subscriptions are restored
+        self.event_exchange.put(messages.events.MqttSubscribe('/sensors/+', 1))
+        self.broker.disconnect_client()
+        self.assertTrue(self.broker.wait_subscribed('/sensors/+'))
+
+    def test_coalesce_pending_publishes(self):
+        self.event_exchange.put_batch(
+            [
+                messages.events.MqttMessageSend('/relay/on', '0'),
+                messages.events.MqttMessageSend('/relay/on', '1'),
+                messages.events.MqttMessageSend('/pump/on', '1'),
+            ]
+        )
+
+        published = {self.published.get(timeout=5), self.published.get(timeout=5)}
+        self.assertEqual({('/relay/on', b'1'), ('/pump/on', b'1')}, published)
+        self.assertEqual(1, self.test_plugin.publish_stats['coalesced'])
+
+    def test_skip_confirmed_payload(self):
+        self.event_exchange.put(messages.events.MqttMessageSend('/relay/on', '1'))
+        self.assertEqual(('/relay/on', b'1'), self.published.get(timeout=5))
+        self._wait_confirmed('/relay/on')
+
+        self.event_exchange.put_batch(
+            [
+                messages.events.MqttMessageSend('/relay/on', '1'),
+                messages.events.MqttMessageSend('/pump/on', '1'),
+            ]
+        )
+        self.assertEqual(('/pump/on', b'1'), self.published.get(timeout=5))
+        self.assertEqual(1, self.test_plugin.publish_stats['skipped'])
+
+    def _wait_confirmed(self, topic):
+        shard = self.test_plugin.shards[0]
+        for _ in range(500):
+            with shard._lock:
+                if shard._published_payloads.get(topic, (None, False))[1]:
+                    return
+            time.sleep(0.01)
+        self.fail(f'Publish to {topic} not confirmed')
+
+
+class TestMqttPluginSpool(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.spool_path = os.path.join(tmp_dir.name, 'mqtt.spool')
+
+        self.published = Queue()
+        self.broker = MqttBrokerStub(on_publish=lambda topic, payload: self.published.put((topic, payload)))
+        self.broker.start()
+        self.addCleanup(self.broker.stop)
+
+    def test_spool_while_disconnected(self):
+        closed_port = self.broker.port
+        self.broker.stop()
+
+        event_exchange = EventExchange(incoming_message_queue=Queue(), outgoing_message_queue=Queue())
+        test_plugin = MqttPlugin(
+            event_exchange=event_exchange,
+            settings={
+                'plugins.MqttPlugin': {'mqtt_host': '127.0.0.1', 'mqtt_port': closed_port, 'spool_path': self.spool_path},
+            },
+        )
+        event_exchange.put(messages.events.MqttMessageSend('/relay/1', '1'))
+        test_plugin.run_tick()
+        test_plugin.stop()
+
+        spool = MessageSpool(self.spool_path)
+        self.addCleanup(spool.close)
+        self.assertEqual({'/relay/1': '1'}, spool.messages())
+
+    def test_replay_spool_on_connect(self):
+        # left by previous run
+        spool = MessageSpool(self.spool_path)
+        spool.append('/relay/1', '1')
+        spool.append('/relay/2', '1')
+        spool.append('/relay/1', '0')
+        spool.close()
+
+        test_plugin = MqttPlugin(
+            event_exchange=EventExchange(incoming_message_queue=Queue(), outgoing_message_queue=Queue()),
+            settings={
+                'plugins.MqttPlugin': {
+                    'mqtt_host': self.broker.host,
+                    'mqtt_port': self.broker.port,
+                    'spool_path': self.spool_path,
+                },
+            },
+        )
+        test_plugin.start()
+        self.addCleanup(test_plugin.join)
+
+        published = [self.published.get(timeout=5), self.published.get(timeout=5)]
+        self.assertEqual([('/relay/2', b'1'), ('/relay/1', b'0')], published)
+        self.assertEqual(0, len(test_plugin.shards[0]._spool), msg='Spool must be cleared after replay')
+
+
+class TestMqttPluginConnectionsPool(unittest.TestCase):
+    def setUp(self):
+        self.published = {'heating': Queue(), 'other': Queue()}
+        self.brokers = {}
+        for name, published in self.published.items():
+            broker = MqttBrokerStub(on_publish=lambda topic, payload, q=published: q.put((topic, payload)))
+            broker.start()
+            self.addCleanup(broker.stop)
+            self.brokers[name] = broker
+
+        self.event_exchange = EventExchange(
+            incoming_message_queue=Queue(),
+            outgoing_message_queue=Queue(),
+            incoming_wakeup=threading.Event(),
+        )
+        self.test_plugin = MqttPlugin(
+            event_exchange=self.event_exchange,
+            settings={
+                'plugins.MqttPlugin': {
+                    'mqtt_host': '127.0.0.1',
+                    'reconnect_min_timeout': 0.05,
+                    'connections': [
+                        {'name': 'heating', 'mqtt_port': self.brokers['heating'].port, 'prefixes': ['/heating/']},
+                        {'name': 'other', 'mqtt_port': self.brokers['other'].port},
+                    ],
+                },
+            },
+        )
+        self.test_plugin.start()
+        self.addCleanup(self.test_plugin.join)
+
+    def test_route_by_prefix(self):
+        connected = {self.event_exchange.outgoing_message_queue.get(timeout=5) for _ in range(2)}
+        self.assertEqual({messages.events.MqttConnected('heating'), messages.events.MqttConnected('other')}, connected)
+
+        self.event_exchange.put_batch(
+            [
+                messages.events.MqttSubscribe('/heating/sensors/+', 1),
+                messages.events.MqttSubscribe('/sensors/+', 1),
+                messages.events.MqttMessageSend('/heating/relay', '1'),
+                messages.events.MqttMessageSend('/relay', '1'),
+            ]
+        )
+        self.assertEqual(('/heating/relay', b'1'), self.published['heating'].get(timeout=5))
+        self.assertEqual(('/relay', b'1'), self.published['other'].get(timeout=5))
+        self.assertTrue(self.brokers['heating'].wait_subscribed('/heating/sensors/+'))
+        self.assertTrue(self.brokers['other'].wait_subscribed('/sensors/+'))
+        self.assertNotIn('/sensors/+', self.brokers['heating'].subscribed_topics)
+
+        self.brokers['heating'].publish('/heating/sensors/floor', b'21.5')
+        event = self.event_exchange.outgoing_message_queue.get(timeout=5)
+        self.assertEqual(messages.events.MqttMessageReceived('/heating/sensors/floor', b'21.5'), event)
+
+        stats = self.test_plugin.connections_stats
+        self.assertEqual(1, stats['heating']['published'])
+        self.assertEqual(1, stats['heating']['received'])
+        self.assertEqual(1, stats['other']['published'])
+        self.assertIn('in_flight', stats['other'])
@@ -0,0 +1,46 @@
+import unittest
+from queue import Queue
+
+import paho.mqtt.client
+from plugins import EventExchange
+from plugins._codecs import PayloadDecoders
+from plugins._mqtt_shards import MqttShard, TopicSharding
+from plugins._queues import OVERFLOW_BLOCK, BoundedEventQueue
+
+
+class TestTopicSharding(unittest.TestCase):
+    def test_longest_prefix(self):
+        sharding = TopicSharding([('boiler', ('/devices/',)), ('pump', ('/devices/pump/',)), ('main', ())])
+
+        self.assertEqual('pump', sharding.shard('/devices/pump/on'))
+        self.assertEqual('boiler', sharding.shard('/devices/boiler/on'))
+        self.assertEqual('main', sharding.shard('/sensors/floor'))
+
+    def test_hash_is_stable(self):
+        sharding = TopicSharding([('a', ()), ('b', ()), ('c', ())])
+        topics = [f'/sensors/{i}' for i in range(100)]
+
+        shards = [sharding.shard(topic) for topic in topics]
+        self.assertEqual({'a', 'b', 'c'}, set(shards))
+        self.assertEqual(shards, [TopicSharding([('a', ()), ('b', ()), ('c', ())]).shard(topic) for topic in topics])
+
+    def test_hash_by_all_if_all_have_prefixes(self):
+        sharding = TopicSharding([('a', ('/a/',)), ('b', ('/b/',))])
+
+        self.assertIn(sharding.shard('/sensors/floor'), ('a', 'b'))
+
+
+class TestMqttShard(unittest.TestCase):
+    def test_drop_received_on_full_exchange(self):
+        event_exchange = EventExchange(
+            incoming_message_queue=Queue(),
+            outgoing_message_queue=BoundedEventQueue(maxsize=1, overflow=OVERFLOW_BLOCK, put_timeout=0),
+        )
+        shard = MqttShard('default', {'mqtt_host': '127.0.0.1'}, event_exchange, PayloadDecoders())
+
+        with self.assertLogs(level='WARNING'):
+            for _ in range(2):
+                shard.on_message_receive(None, None, paho.mqtt.client.MQTTMessage(topic=b'/sensors/1'))
+
+        self.assertEqual(1, shard.stats['dropped'])
+        self.assertEqual(1, len(event_exchange.get_batch(10)))
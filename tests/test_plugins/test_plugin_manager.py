@@ -1,3 +1,4 @@
+import threading
 import unittest
 import unittest.mock
 
@@ -39,3 +40,60 @@ class TestPluginRunManager(unittest.TestCase):
         self.test_manager.stop()
 
         self.event_handler_mock.assert_called()
+
+    def test_not_send_to_not_consumer(self):
+        receiver, sender = self.test_manager.plugins
+
+        receiver.send_event(messages.BaseEvent())
+        self.test_manager.step()
+
+        self.assertTrue(sender.event_exchange.incoming_message_queue.empty(), msg='Sender not handle any event')
+
+    def test_exchange_settings(self):
+        manager = PluginRunManager(
+            plugins=[PluginWithReceiveMessage],
+            plugins_settings={
+                '.PluginWithReceiveMessage': {
+                    'test_handler': self.event_handler_mock,
+                    'exchange': {'capacity': 1, 'overflow': 'drop_oldest'},
+                },
+            },
+        )
+        (plugin,) = manager.plugins
+
+        plugin.event_exchange.put(messages.BaseEvent())
+        plugin.event_exchange.put(messages.BaseEvent())
+        self.assertEqual(1, plugin.event_exchange.stats['incoming']['dropped'])
+
+    def test_route_to_handler_added_after_start(self):
+        receiver, sender = self.test_manager.plugins
+        self.test_manager.start()
+        self.addCleanup(self.test_manager.stop)
+
+        receiver.send_event(messages.events.MqttMessageReceived('topic', '1'))
+        self.test_manager.step()
+        self.assertTrue(sender.event_exchange.incoming_message_queue.empty())
+
+        handler = unittest.mock.Mock()
+        sender.add_event_handler(messages.events.MqttMessageReceived, handler)
+        receiver.send_event(messages.events.MqttMessageReceived('topic', '2'))
+        self.test_manager.step()
+
+        self.assertEqual(1, sender.event_exchange.incoming_message_queue.qsize())
+
+    def test_event_driven_routing(self):
+        handled = threading.Event()
+        self.event_handler_mock.side_effect = lambda event: handled.set()
+        receiver, sender = self.test_manager.plugins
+
+        manager_thread = threading.Thread(target=self.test_manager.run)
+        self.test_manager.start()
+        manager_thread.start()
+
+        sender.send_event(messages.BaseEvent())
+        # much less than polling timeouts of manager and plugin
+        self.assertTrue(handled.wait(timeout=0.05), msg='Event must be delivered on wakeup')
+
+        self.test_manager.stop()
+        manager_thread.join(timeout=1)
+        self.assertFalse(manager_thread.is_alive(), msg='Manager must leave run loop after stop')
@@ -0,0 +1,120 @@
+import threading
+import time
+import unittest
+import unittest.mock
+
+import messages
+from plugins import BaseEventPlugin, PluginRunManager
+
+
+class EchoPlugin(BaseEventPlugin):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.add_event_handler(messages.events.MqttMessageReceived, self.echo)
+
+    def echo(self, event):
+        if event.topic == 'add_handler':
+            self.add_event_handler(messages.events.MqttUnsubscribe, self.echo_unsubscribe)
+        self.send_event(messages.events.MqttMessageSend(event.topic, event.payload))
+
+    def echo_unsubscribe(self, event):
+        self.send_event(messages.events.MqttMessageSend(event.topic, 'unsubscribe'))
+
+    def stop(self):
+        self.send_event(messages.events.MqttMessageSend('stop', 'stop'))
+        super().stop()
+
+    def tick(self) -> None:
+        pass
+
+
+class ReceiverPlugin(BaseEventPlugin):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.received = []
+        self.received_event = threading.Event()
+        self.add_event_handler(messages.events.MqttMessageSend, self.on_event)
+
+    def on_event(self, event):
+        self.received.append((event.topic, event.payload))
+        self.received_event.set()
+
+    def tick(self) -> None:
+        pass
+
+
+class SlowPlugin(BaseEventPlugin):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.add_event_handler(messages.events.MqttMessageReceived, lambda event: time.sleep(0.05))
+
+    def tick(self) -> None:
+        pass
+
+
+class TestProcessPlugin(unittest.TestCase):
+    def setUp(self):
+        self.test_manager = PluginRunManager(
+            plugins=[ReceiverPlugin, EchoPlugin],
+            plugins_settings={'.ReceiverPlugin': {}, '.EchoPlugin': {'process': True}},
+        )
+        self.receiver, self.echo = self.test_manager.plugins
+
+        self.manager_thread = threading.Thread(target=self.test_manager.run)
+        self.test_manager.start()
+        self.manager_thread.start()
+
+    def tearDown(self):
+        if self.manager_thread.is_alive():
+            self.test_manager.stop()
+            self.manager_thread.join()
+
+    def test_consumed_event_types(self):
+        self.assertEqual(frozenset([messages.events.MqttMessageReceived]), self.echo.consumed_event_types)
+
+    def test_exchange_events(self):
+        self.receiver.send_event(messages.events.MqttMessageReceived('topic', '1'))
+
+        self.assertTrue(self.receiver.received_event.wait(timeout=5))
+        self.assertEqual([('topic', '1')], self.receiver.received)
+
+    def test_stop_events_delivered(self):
+        self.test_manager.stop()
+        self.manager_thread.join()
+
+        self.assertIn(('stop', 'stop'), self.receiver.received, msg='Events sent on worker stop must be handled')
+        self.assertFalse(self.echo._process.is_alive())
+
+    def test_handler_added_in_worker(self):
+        self.receiver.send_event(messages.events.MqttMessageReceived('add_handler', '1'))
+        self.assertTrue(self.receiver.received_event.wait(timeout=5))
+
+        # worker sends consumed event types before echo
+        self.assertIn(messages.events.MqttUnsubscribe, self.echo.consumed_event_types)
+        self.receiver.received_event.clear()
+        self.receiver.send_event(messages.events.MqttUnsubscribe('topic'))
+
+        self.assertTrue(self.receiver.received_event.wait(timeout=5))
+        self.assertEqual(('topic', 'unsubscribe'), self.receiver.received[-1])
+
+
+class TestSlowProcessPlugin(unittest.TestCase):
+    def test_slow_worker_not_block_routing(self):
+        test_manager = PluginRunManager(
+            plugins=[SlowPlugin],
+            plugins_settings={'.SlowPlugin': {'process': True, 'exchange': {'capacity': 2, 'overflow': 'drop_oldest'}}},
+        )
+        (slow,) = test_manager.plugins
+        test_manager.start()
+        self.addCleanup(test_manager.stop)
+
+        started = time.monotonic()
+        for i in range(50):
+            # more than pipe buffer
+            slow.event_exchange.put(messages.events.MqttMessageReceived('topic', 'x' * 10000))
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertGreater(slow.event_exchange.stats['incoming']['dropped'], 0, msg='Exchange overflow policy')
@@ -0,0 +1,109 @@
+import threading
+import unittest
+from queue import Empty, Full, Queue
+
+from messages.events import MqttMessageReceived, MqttMessageSend
+from plugins._queues import (OVERFLOW_BLOCK, OVERFLOW_COALESCE,
+                             OVERFLOW_DROP_OLDEST, BoundedEventQueue,
+                             get_batch, put_batch)
+
+
+class TestBoundedEventQueue(unittest.TestCase):
+    def get_all(self, queue):
+        result = []
+        while True:
+            try:
+                result.append(queue.get(block=False))
+            except Empty:
+                return result
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            BoundedEventQueue(maxsize=1, overflow='foo')
+
+    def test_block(self):
+        queue = BoundedEventQueue(maxsize=1, overflow=OVERFLOW_BLOCK, put_timeout=0.001)
+        queue.put(1, block=False)
+
+        with self.assertRaises(Full):
+            queue.put(2, block=False)
+
+        self.assertEqual([1], self.get_all(queue))
+        self.assertEqual(1, queue.stats['dropped'])
+
+    def test_drop_oldest(self):
+        queue = BoundedEventQueue(maxsize=2, overflow=OVERFLOW_DROP_OLDEST)
+        for i in range(5):
+            queue.put(i, block=False)
+
+        self.assertEqual([3, 4], self.get_all(queue))
+        self.assertEqual(3, queue.stats['dropped'])
+
+    def test_coalesce_same_topic(self):
+        queue = BoundedEventQueue(maxsize=10, overflow=OVERFLOW_COALESCE)
+        queue.put(MqttMessageReceived('a', '1'))
+        queue.put(MqttMessageReceived('b', '1'))
+        queue.put(MqttMessageReceived('a', '2'))
+
+        events = self.get_all(queue)
+        self.assertEqual([('a', '2'), ('b', '1')], [(e.topic, e.payload) for e in events], msg='Keep first position')
+        self.assertEqual(1, queue.stats['coalesced'])
+
+        queue.put(MqttMessageReceived('a', '3'))
+        self.assertEqual('3', self.get_all(queue)[0].payload, msg='Received key must be released')
+
+    def test_coalesce_only_keyed_events(self):
+        queue = BoundedEventQueue(maxsize=10, overflow=OVERFLOW_COALESCE)
+        queue.put(MqttMessageSend('a', '0'))
+        queue.put(MqttMessageSend('a', '1'))
+
+        self.assertEqual(['0', '1'], [e.payload for e in self.get_all(queue)], msg='Commands must not be coalesced')
+
+    def test_coalesce_drop_oldest_when_full(self):
+        queue = BoundedEventQueue(maxsize=2, overflow=OVERFLOW_COALESCE)
+        for topic in 'abc':
+            queue.put(MqttMessageReceived(topic, '1'))
+
+        self.assertEqual(['b', 'c'], [e.topic for e in self.get_all(queue)])
+        self.assertEqual(1, queue.stats['dropped'])
+
+        queue.put(MqttMessageReceived('a', '2'))
+        queue.put(MqttMessageReceived('a', '3'))
+        self.assertEqual(['3'], [e.payload for e in self.get_all(queue)], msg='Dropped key must be released')
+
+
+class TestBatch(unittest.TestCase):
+    def test_plain_queue(self):
+        queue = Queue()
+        put_batch(queue, [1, 2, 3])
+
+        self.assertEqual([1, 2], get_batch(queue, 2))
+        self.assertEqual([3], get_batch(queue, 2))
+        self.assertEqual([], get_batch(queue, 2))
+
+    def test_bounded_queue_policy(self):
+        queue = BoundedEventQueue(maxsize=2, overflow=OVERFLOW_DROP_OLDEST)
+        put_batch(queue, [1, 2, 3])
+
+        self.assertEqual([2, 3], get_batch(queue, 10))
+        self.assertEqual(1, queue.stats['dropped'])
+
+    def test_bounded_queue_block_drop_all_not_placed(self):
+        queue = BoundedEventQueue(maxsize=2, overflow=OVERFLOW_BLOCK, put_timeout=0.01)
+        with self.assertRaises(Full):
+            put_batch(queue, list(range(10)))
+
+        self.assertEqual([0, 1], get_batch(queue, 10))
+        self.assertEqual(8, queue.stats['dropped'])
+
+    def test_bounded_queue_block_wait_consumer(self):
+        queue = BoundedEventQueue(maxsize=2, overflow=OVERFLOW_BLOCK, put_timeout=5)
+        received = []
+        consumer = threading.Thread(target=lambda: received.extend(queue.get() for _ in range(10)))
+        consumer.start()
+
+        put_batch(queue, list(range(10)))
+        consumer.join(5)
+
+        self.assertEqual(list(range(10)), received)
+        self.assertEqual(0, queue.stats['dropped'])
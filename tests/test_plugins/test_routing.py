@@ -0,0 +1,54 @@
+import unittest
+import unittest.mock
+from queue import Queue
+
+from messages import BaseEvent
+from plugins import BaseEventPlugin, EventExchange
+from plugins._routing import EventSubscriptions
+
+
+class ChildEvent(BaseEvent):
+    pass
+
+
+class OtherEvent(BaseEvent):
+    pass
+
+
+class TestEventSubscriptions(unittest.TestCase):
+    def setUp(self):
+        self.base_consumer = unittest.mock.Mock(consumed_event_types=frozenset([BaseEvent]))
+        self.child_consumer = unittest.mock.Mock(consumed_event_types=frozenset([ChildEvent]))
+        self.all_consumer = object()  # without consumed_event_types
+
+        self.subscriptions = EventSubscriptions([self.base_consumer, self.child_consumer, self.all_consumer])
+
+    def test_exact_type(self):
+        self.assertEqual(
+            (self.base_consumer, self.child_consumer, self.all_consumer),
+            self.subscriptions.subscribers(ChildEvent),
+        )
+
+    def test_base_type_handler_consume_child_event(self):
+        self.assertEqual((self.base_consumer, self.all_consumer), self.subscriptions.subscribers(OtherEvent))
+
+    def test_child_type_handler_not_consume_base_event(self):
+        self.assertNotIn(self.child_consumer, self.subscriptions.subscribers(BaseEvent))
+
+    def test_invalidate(self):
+        self.assertNotIn(self.child_consumer, self.subscriptions.subscribers(OtherEvent))
+
+        self.child_consumer.consumed_event_types = frozenset([ChildEvent, OtherEvent])
+        self.assertNotIn(self.child_consumer, self.subscriptions.subscribers(OtherEvent), msg='Index is cached')
+
+        self.subscriptions.invalidate()
+        self.assertIn(self.child_consumer, self.subscriptions.subscribers(OtherEvent))
+
+    def test_invalidate_on_handler_added(self):
+        plugin = BaseEventPlugin(event_exchange=EventExchange(Queue(), Queue()))
+        plugin.add_event_handler(ChildEvent, unittest.mock.Mock())
+        subscriptions = EventSubscriptions([plugin])
+        self.assertEqual((), subscriptions.subscribers(OtherEvent))
+
+        plugin.add_event_handler(OtherEvent, unittest.mock.Mock())
+        self.assertEqual((plugin,), subscriptions.subscribers(OtherEvent))
@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+
+from devices import DeviceState
+from plugins._snapshot import DeviceStateSnapshot
+
+
+class TestDeviceStateSnapshot(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = os.path.join(tmp_dir.name, 'devices.snapshot')
+        self.snapshot = DeviceStateSnapshot(self.path)
+
+    def test_write_read(self):
+        states = {
+            'mixer': DeviceState(True, 21.5, 1000.0, None),
+            'pump': DeviceState(False, last_dependencies_turned_on_time=990.0),
+        }
+        self.snapshot.write(states)
+
+        self.assertEqual(states, DeviceStateSnapshot(self.path).read())
+        self.assertFalse(os.path.exists(f'{self.path}.tmp'))
+
+    def test_not_found(self):
+        self.assertEqual({}, self.snapshot.read())
+
+    def test_broken(self):
+        self.snapshot.write({'mixer': DeviceState(True)})
+        with open(self.path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b'\xff')
+
+        with self.assertLogs('plugins._snapshot', level='WARNING'):
+            self.assertEqual({}, self.snapshot.read())
+
+    def test_max_age(self):
+        self.snapshot.write({'mixer': DeviceState(True)}, now=0)
+
+        self.assertEqual({}, self.snapshot.read(max_age=600))
+        self.assertEqual({'mixer': DeviceState(True)}, self.snapshot.read())
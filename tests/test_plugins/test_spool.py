@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+from plugins._spool import MessageSpool
+
+
+class TestMessageSpool(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = os.path.join(tmp_dir.name, 'mqtt.spool')
+
+    def open_spool(self, size=4096):
+        spool = MessageSpool(self.path, size)
+        self.addCleanup(spool.close)
+        return spool
+
+    def test_last_message_of_topic(self):
+        spool = self.open_spool()
+        spool.append('/relay/1', '0')
+        spool.append('/relay/2', '1')
+        spool.append('/relay/1', '1')
+
+        self.assertEqual(3, len(spool))
+        self.assertEqual([('/relay/2', '1'), ('/relay/1', '1')], list(spool.messages().items()))
+
+    def test_reopen(self):
+        spool = self.open_spool()
+        spool.append('/relay/1', '1')
+        spool.close()
+
+        self.assertEqual({'/relay/1': '1'}, self.open_spool().messages())
+
+    def test_clear(self):
+        spool = self.open_spool()
+        spool.append('/relay/1', '1')
+        spool.clear()
+        spool.append('/relay/2', '0')
+        spool.close()
+
+        self.assertEqual({'/relay/2': '0'}, self.open_spool().messages())
+
+    def test_broken_record(self):
+        spool = self.open_spool()
+        spool.append('/relay/1', '1')
+        spool.append('/relay/2', '1')
+        spool.close()
+
+        # crash on write of last record: its last byte is not written
+        with open(self.path, 'r+b') as f:
+            data_end = len(f.read().rstrip(b'\x00'))
+            f.seek(data_end - 1)
+            f.write(b'\x00')
+
+        spool = self.open_spool()
+        self.assertEqual({'/relay/1': '1'}, spool.messages())
+        spool.append('/relay/3', '0')
+        self.assertEqual({'/relay/1': '1', '/relay/3': '0'}, spool.messages())
+
+    def test_compact_on_full(self):
+        spool = self.open_spool(size=256)
+        for i in range(100):
+            self.assertTrue(spool.append('/relay/1', str(i % 2)))
+        spool.append('/relay/2', '1')
+
+        self.assertEqual({'/relay/1': '1', '/relay/2': '1'}, spool.messages())
+        self.assertLess(len(spool), 100)
+
+    def test_drop_on_full(self):
+        spool = self.open_spool(size=128)
+        with self.assertLogs(level='WARNING'):
+            results = [spool.append(f'/relay/{i}', '1') for i in range(10)]
+
+        self.assertFalse(all(results))
+        self.assertEqual(results.count(False), spool.dropped)
@@ -0,0 +1,54 @@
+import unittest
+
+from plugins._subscriptions import SubscriptionRegistry
+
+
+class TestSubscriptionRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = SubscriptionRegistry()
+
+    def test_ref_count(self):
+        self.assertTrue(self.registry.add('/sensors/1', 1))
+        self.assertFalse(self.registry.add('/sensors/1', 1), msg='Already subscribed')
+        self.assertEqual(([('/sensors/1', 1)], []), self.registry.pop_changes())
+
+        self.assertFalse(self.registry.remove('/sensors/1'), msg='Subscribed by other plugin')
+        self.assertTrue(self.registry.remove('/sensors/1'))
+        self.assertEqual(([], ['/sensors/1']), self.registry.pop_changes())
+        self.assertNotIn('/sensors/1', self.registry)
+
+    def test_greater_qos(self):
+        self.registry.add('/sensors/1', 0)
+        self.assertTrue(self.registry.add('/sensors/1', 1))
+        self.assertEqual(([('/sensors/1', 1)], []), self.registry.pop_changes())
+        self.assertEqual([('/sensors/1', 1)], self.registry.topics())
+
+    def test_changes_collapsed(self):
+        self.registry.add('/sensors/1')
+        self.registry.add('/sensors/2')
+        self.registry.remove('/sensors/1')
+
+        self.assertEqual(([('/sensors/2', 0)], []), self.registry.pop_changes())
+        self.assertEqual(([], []), self.registry.pop_changes())
+
+    def test_remove_unknown(self):
+        self.assertFalse(self.registry.remove('/sensors/1'))
+        self.assertEqual(([], []), self.registry.pop_changes())
+
+    def test_remove_with_pending_greater_qos(self):
+        self.registry.add('/sensors/1', 0)
+        self.registry.pop_changes()
+        self.registry.add('/sensors/1', 1)
+
+        self.registry.remove('/sensors/1')
+        self.assertTrue(self.registry.remove('/sensors/1'))
+        self.assertEqual(([], ['/sensors/1']), self.registry.pop_changes(), msg='Broker subscription must not leak')
+
+    def test_pop_all_topics(self):
+        self.registry.add('/sensors/1')
+        self.registry.add('/sensors/2')
+
+        self.assertEqual([('/sensors/1', 0), ('/sensors/2', 0)], self.registry.pop_all_topics())
+        self.assertEqual(([], []), self.registry.pop_changes())
+        self.registry.remove('/sensors/1')
+        self.assertEqual(([], ['/sensors/1']), self.registry.pop_changes())
@@ -0,0 +1,29 @@
+import unittest
+import unittest.mock
+
+from plugins._timers import TimerHeap
+
+
+class TestTimerHeap(unittest.TestCase):
+    def setUp(self):
+        self.now = 100.0
+        self.timers = TimerHeap(clock=lambda: self.now)
+
+    def test_pop_due_in_deadline_order(self):
+        self.timers.call_later(3, 'c')
+        self.timers.call_later(1, 'a')
+        self.timers.call_later(1, 'b')
+        self.assertEqual(101, self.timers.next_deadline())
+
+        self.now = 102
+        self.assertEqual(['a', 'b'], [t.callback for t in self.timers.pop_due()])
+        self.assertEqual(103, self.timers.next_deadline())
+
+    def test_cancel(self):
+        timer = self.timers.call_at(101, 'a')
+        self.timers.call_at(102, 'b')
+        timer.cancel()
+
+        self.assertEqual(102, self.timers.next_deadline())
+        self.assertEqual(['b'], [t.callback for t in self.timers.pop_due(now=105)])
+        self.assertIsNone(self.timers.next_deadline())
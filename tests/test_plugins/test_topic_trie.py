@@ -0,0 +1,87 @@
+import unittest
+import unittest.mock
+from queue import Queue
+
+import messages
+from plugins import EventExchange
+from plugins._base_message_handlers import BaseMqttMessagePlugin
+from plugins._topic_trie import TopicTrie
+
+
+class TestTopicTrie(unittest.TestCase):
+    def setUp(self):
+        self.trie = TopicTrie()
+
+    def assert_match(self, topic_filter, topic, is_match=True):
+        trie = TopicTrie()
+        trie.add(topic_filter, 'value')
+        self.assertEqual(['value'] if is_match else [], trie.match(topic), msg=f'{topic_filter} ~ {topic}')
+
+    def test_exact(self):
+        self.assert_match('/devices/wb-w1/controls/28-1', '/devices/wb-w1/controls/28-1')
+        self.assert_match('/devices/wb-w1/controls/28-1', '/devices/wb-w1/controls/28-2', is_match=False)
+        self.assert_match('/devices/wb-w1/controls', '/devices/wb-w1/controls/28-1', is_match=False)
+
+    def test_single_level(self):
+        self.assert_match('/devices/wb-w1/controls/+', '/devices/wb-w1/controls/28-1')
+        self.assert_match('/devices/+/controls/+', '/devices/wb-w1/controls/28-1')
+        self.assert_match('/devices/wb-w1/controls/+', '/devices/wb-w1/controls/28-1/meta', is_match=False)
+        self.assert_match('+/+', '/finance')
+
+    def test_multi_level(self):
+        self.assert_match('/devices/#', '/devices/wb-w1/controls/28-1')
+        self.assert_match('/devices/#', '/devices')
+        self.assert_match('#', '/devices/wb-w1')
+        self.assert_match('/devices/#', '/other/wb-w1', is_match=False)
+
+    def test_dollar_topics(self):
+        self.assert_match('#', '$SYS/broker', is_match=False)
+        self.assert_match('+/broker', '$SYS/broker', is_match=False)
+        self.assert_match('$SYS/#', '$SYS/broker')
+
+    def test_invalid_filter(self):
+        for topic_filter in ('a/#/b', 'a/b#', 'a/b+'):
+            with self.assertRaises(ValueError, msg=topic_filter):
+                self.trie.add(topic_filter, 'value')
+
+    def test_all_matches(self):
+        for topic_filter in ('a/b', 'a/+', 'a/#', '#', 'a/c'):
+            self.trie.add(topic_filter, topic_filter)
+
+        self.assertCountEqual(['a/b', 'a/+', 'a/#', '#'], self.trie.match('a/b'))
+
+    def test_add_remove(self):
+        self.assertTrue(self.trie.add('a/+', 1))
+        self.assertFalse(self.trie.add('a/+', 2), msg='Filter is already added')
+
+        self.assertFalse(self.trie.remove('a/+', 1))
+        self.assertTrue(self.trie.remove('a/+', 2), msg='Last value of filter')
+        self.assertEqual([], self.trie.match('a/b'))
+
+        with self.assertRaises(KeyError):
+            self.trie.remove('a/+', 2)
+
+
+class DummyMqttMessagePlugin(BaseMqttMessagePlugin):
+    def tick(self) -> None:
+        pass
+
+
+class TestBaseMqttMessagePlugin(unittest.TestCase):
+    def setUp(self):
+        self.event_exchange = EventExchange(incoming_message_queue=Queue(), outgoing_message_queue=Queue())
+        self.test_plugin = DummyMqttMessagePlugin(event_exchange=self.event_exchange)
+
+    def test_wildcard_subscription(self):
+        handler = unittest.mock.Mock()
+        self.test_plugin.subscribe_to_topic('/devices/wb-w1/controls/+', handler)
+        self.test_plugin.subscribe_to_topic('/devices/wb-w1/controls/+', handler)
+
+        subscribe_events = self.event_exchange.get_batch(10)
+        self.assertEqual([messages.events.MqttSubscribe('/devices/wb-w1/controls/+', 1)], subscribe_events)
+
+        event = messages.events.MqttMessageReceived('/devices/wb-w1/controls/28-000005fb67b8', '21.5')
+        self.event_exchange.put(event)
+        self.test_plugin._before_tick()
+
+        self.assertEqual([unittest.mock.call(event)] * 2, handler.call_args_list)
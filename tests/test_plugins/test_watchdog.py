@@ -0,0 +1,57 @@
+import unittest
+import unittest.mock
+
+from plugins._timers import TimerHeap
+from plugins._watchdog import SensorWatchdog
+
+
+class TestSensorWatchdog(unittest.TestCase):
+    def setUp(self):
+        self.now = 100.0
+        self.timers = TimerHeap(clock=lambda: self.now)
+        self.on_stale = unittest.mock.Mock()
+        self.on_recovered = unittest.mock.Mock()
+        self.watchdog = SensorWatchdog(self.timers, 10, self.on_stale, self.on_recovered)
+
+    def run_timers(self, now: float):
+        self.now = now
+        for timer in self.timers.pop_due():
+            timer.callback(*timer.args)
+
+    def test_stale_on_deadline(self):
+        with self.assertLogs('plugins._watchdog', level='WARNING'):
+            self.watchdog.watch('a')
+            self.watchdog.watch('b')
+
+            self.run_timers(105)
+            self.watchdog.feed('a')
+            self.run_timers(110)
+            self.on_stale.assert_called_once_with('b')
+
+            self.run_timers(114.9)
+            self.assertEqual({'b'}, self.watchdog.stale)
+            self.run_timers(115)
+            self.assertEqual({'a', 'b'}, self.watchdog.stale)
+
+    def test_feed_not_push_timers(self):
+        self.watchdog.watch('a')
+        for i in range(100):
+            self.now += 0.5
+            self.watchdog.feed('a')
+
+        self.assertEqual(1, len(self.timers))
+        self.run_timers(150)
+        self.on_stale.assert_not_called()
+
+    def test_recovered(self):
+        self.watchdog.watch('a')
+        with self.assertLogs('plugins._watchdog', level='WARNING'):
+            self.run_timers(110)
+
+        self.watchdog.feed('a')
+        self.on_recovered.assert_called_once_with('a')
+        self.assertEqual(set(), self.watchdog.stale)
+
+        with self.assertLogs('plugins._watchdog', level='WARNING'):
+            self.run_timers(120)
+        self.assertEqual(2, self.on_stale.call_count)